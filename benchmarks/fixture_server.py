@@ -0,0 +1,552 @@
+"""
+Local stand-in for the Mapbox and census.gov endpoints used by the wrappers.
+
+The server answers on the same paths as the real services and
+`make_fixture_session` returns a pooled session that rewrites every https
+request to the server, so the wrappers run unchanged and offline.
+
+Usage:
+
+    from api_wrapper.base_api import set_shared_session
+    from benchmarks.fixture_server import FixtureServer, make_fixture_session
+
+    with FixtureServer() as server:
+        set_shared_session(make_fixture_session(server.url))
+        ...
+"""
+
+import io
+import os
+import json
+import math
+import random
+import tempfile
+import time
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+
+import pandas as pd
+import geopandas as gpd
+from requests.adapters import HTTPAdapter
+from shapely.geometry import Polygon, box
+
+from api_wrapper.base_api import make_session
+
+FIPS_COLUMNS = [
+    "Summary Level",
+    "State Code (FIPS)",
+    "County Code (FIPS)",
+    "County Subdivision Code (FIPS)",
+    "Place Code (FIPS)",
+    "Consolidtated City Code (FIPS)",
+    "Area Name (including legal/statistical area description)",
+]
+
+STATES = {
+    "08": "Colorado",
+    "22": "Louisiana",
+    "36": "New York",
+    "48": "Texas",
+}
+
+
+class FixtureData(object):
+    """
+    Canned responses generated once and kept in memory.
+
+    Attributes
+    ----------
+    n_counties: int
+        Counties per state.
+    n_tracts: int
+        Tracts per county. Block groups and blocks are 3 per parent.
+    n_seq_files: int
+        Number of seq*.xlsx workbooks in the summary templates zip.
+    iso_quota: tuple
+        (limit, interval seconds) of isochrone requests made with the
+        `RATE_LIMITED_TOKEN` access token, answered like Mapbox with
+        X-Rate-Limit-* headers and 429s above the quota.
+    """
+
+    RATE_LIMITED_TOKEN = "rate-limited-token"
+
+    def __init__(
+        self,
+        n_counties=5,
+        n_tracts=40,
+        n_seq_files=20,
+        seed=0,
+        iso_quota=(60, 1),
+    ):
+
+        self.n_counties = n_counties
+        self.n_tracts = n_tracts
+        self.n_seq_files = n_seq_files
+        self.iso_quota = iso_quota
+        self.random = random.Random(seed)
+
+        self._window = (0, 0)
+
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def get(self, name, build_func):
+        """Return cached bytes of `name` or build them with `build_func()`"""
+
+        with self._lock:
+            if name not in self._cache:
+                self._cache[name] = build_func()
+
+        return self._cache[name]
+
+    def take_iso_quota(self):
+        """Count a rate limited request, return (allowed, window reset time)"""
+
+        limit, interval = self.iso_quota
+        now = time.time()
+
+        with self._lock:
+            window_start, n_requests = self._window
+            if now >= window_start + interval:
+                window_start, n_requests = now, 0
+
+            self._window = (window_start, n_requests + 1)
+
+        return n_requests < limit, window_start + interval
+
+    def counties(self, state_fip):
+        """Return county FIP codes of a state"""
+
+        return [f"{2 * n + 1:03d}" for n in range(self.n_counties)]
+
+    def isochrone_json(self, lng, lat, contours):
+        """Return a Mapbox isochrone FeatureCollection around (lng, lat)"""
+
+        features = []
+        for minutes in contours:
+            radius = 0.002 * minutes
+            ring = [
+                (lng + radius * dx, lat + radius * dy)
+                for dx, dy in [(-1, -1), (1, -1), (1, 1), (-1, 1), (-1, -1)]
+            ]
+            features.append(
+                {
+                    "type": "Feature",
+                    "properties": {"contour": minutes, "metric": "time"},
+                    "geometry": {"type": "Polygon", "coordinates": [ring]},
+                }
+            )
+
+        return json.dumps(
+            {"type": "FeatureCollection", "features": features}
+        ).encode()
+
+    def geocodes_xlsx(self):
+        """Return an all-geocodes workbook, 4 title rows above the header"""
+
+        rows = []
+        for state_fip, state_name in STATES.items():
+            rows.append(
+                [
+                    "040",
+                    state_fip,
+                    "000",
+                    "00000",
+                    "00000",
+                    "00000",
+                    state_name,
+                ]
+            )
+
+            for county_fip in self.counties(state_fip):
+                rows.append(
+                    [
+                        "050",
+                        state_fip,
+                        county_fip,
+                        "00000",
+                        "00000",
+                        "00000",
+                        f"County {county_fip} County",
+                    ]
+                )
+
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer) as writer:
+            pd.DataFrame(rows, columns=FIPS_COLUMNS).to_excel(
+                writer, index=False, startrow=4
+            )
+
+        return buffer.getvalue()
+
+    def summary_templates_zip(self):
+        """Return a zip of seq*.xlsx table metadata workbooks"""
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zip_file:
+            for seq in range(1, self.n_seq_files + 1):
+                header = {
+                    col: [col]
+                    for col in [
+                        "FILEID",
+                        "FILETYPE",
+                        "STUSAB",
+                        "CHARITER",
+                        "SEQUENCE",
+                        "LOGRECNO",
+                    ]
+                }
+                for table in range(5):
+                    table_id = f"B{seq:02d}{table:03d}"
+                    header[f"{table_id}_001"] = [f"TABLE {table_id}%Total:"]
+                    for line in range(2, 10):
+                        subtitles = "%".join(
+                            f"Subtitle {n}:" for n in range(line % 8 + 1)
+                        )
+                        header[f"{table_id}_{line:03d}"] = [
+                            f"TABLE {table_id}%{subtitles}"
+                        ]
+
+                seq_buffer = io.BytesIO()
+                pd.DataFrame(header).to_excel(seq_buffer, index=False)
+                zip_file.writestr(f"seq{seq}.xlsx", seq_buffer.getvalue())
+
+        return buffer.getvalue()
+
+    def tiger_zip(self, filename):
+        """Return a TIGER/Line style zipped shapefile for `filename`"""
+
+        _, year, state_fip, level = os.path.splitext(filename)[0].split("_")[
+            :4
+        ]
+
+        if state_fip == "us":
+            state_fips = list(STATES)
+        else:
+            state_fips = [state_fip]
+
+        # features below the tract are laid out on a grid inside the tract
+        suffixes = _get_geoid_suffixes(level)
+        side = math.ceil(math.sqrt(len(suffixes)))
+        size = 0.1 / side
+
+        rows = []
+        for state_n, state_fip in enumerate(state_fips):
+            for county_n, county_fip in enumerate(self.counties(state_fip)):
+                for tract_n in range(
+                    self.n_tracts if level != "county" else 1
+                ):
+                    x = -110 + 5 * state_n + county_n + (tract_n % 10) * 0.1
+                    y = 35 + (tract_n // 10) * 0.1
+                    tract_geoid = f"{state_fip}{county_fip}"
+                    if level != "county":
+                        tract_geoid += f"{tract_n:06d}"
+
+                    for n, suffix in enumerate(suffixes):
+                        geoid = tract_geoid + suffix
+                        geometry = _jagged_box(
+                            x + (n % side) * size,
+                            y + (n // side) * size,
+                            size,
+                            n_vertices=64,
+                        )
+
+                        rows.append(
+                            {
+                                "STATEFP": state_fip,
+                                "COUNTYFP": county_fip,
+                                "GEOID": geoid,
+                                "NAME": geoid,
+                                "ALAND": self.random.randint(10**5, 10**8),
+                                "AWATER": self.random.randint(0, 10**6),
+                                "geometry": geometry,
+                            }
+                        )
+
+        gdf = gpd.GeoDataFrame(rows, crs="EPSG:4269")
+        if level.startswith("tabblock"):
+            gdf = gdf.rename(columns={"GEOID": "GEOID10"})
+
+        layer_name = os.path.splitext(filename)[0]
+        buffer = io.BytesIO()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            gdf.to_file(os.path.join(tmp_dir, f"{layer_name}.shp"))
+
+            with zipfile.ZipFile(
+                buffer, "w", zipfile.ZIP_DEFLATED
+            ) as zip_file:
+                for file in os.listdir(tmp_dir):
+                    zip_file.write(os.path.join(tmp_dir, file), file)
+                zip_file.writestr(f"{layer_name}.shp.iso.xml", "<xml/>")
+
+        return buffer.getvalue()
+
+    def census_data_json(self, query):
+        """Return a Census Data API json table of a `get`/`for`/`in` query"""
+
+        variables = query["get"][0].split(",")
+        for_level, for_value = query["for"][0].split(":")
+        in_levels = dict(
+            part.split(":")
+            for part in " ".join(query.get("in", [])).split()
+            if part
+        )
+
+        state_fips = [
+            in_levels.get("state", for_value if for_level == "state" else "*")
+        ]
+        if state_fips == ["*"]:
+            state_fips = list(STATES)
+
+        geo_rows = self._get_geo_rows(
+            state_fips, for_level, in_levels.get("county", "*")
+        )
+
+        geo_levels = ["state", "county", "tract", "block group"]
+        geo_levels = geo_levels[: geo_levels.index(for_level) + 1]
+
+        table = [variables + geo_levels]
+        for geo_row in geo_rows:
+            values = [
+                (
+                    ", ".join(geo_row)
+                    if var == "NAME"
+                    else str(self.random.randint(0, 5000))
+                )
+                for var in variables
+            ]
+            table.append(values + geo_row)
+
+        return json.dumps(table).encode()
+
+    def _get_geo_rows(self, state_fips, for_level, county="*"):
+        """Return FIPS rows of `for_level` geographies in `state_fips`"""
+
+        if for_level == "state":
+            return [[state_fip] for state_fip in state_fips]
+
+        geo_rows = []
+        for state_fip in state_fips:
+            counties = self.counties(state_fip) if county == "*" else [county]
+
+            for county_fip in counties:
+                if for_level == "county":
+                    geo_rows.append([state_fip, county_fip])
+                    continue
+
+                for tract_n in range(self.n_tracts):
+                    tract = f"{tract_n:06d}"
+                    if for_level == "tract":
+                        geo_rows.append([state_fip, county_fip, tract])
+                        continue
+
+                    for block_group in "123":
+                        geo_rows.append(
+                            [state_fip, county_fip, tract, block_group]
+                        )
+
+        return geo_rows
+
+
+def _get_geoid_suffixes(level):
+    """
+    Return GEOID suffixes of the features of a TIGER level in each tract:
+    3 block groups per tract and 3 blocks per block group
+    """
+
+    if level == "bg":
+        return list("123")
+
+    if level.startswith("tabblock"):
+        return [f"{bg}{n:03d}" for bg in "123" for n in range(3)]
+
+    return [""]
+
+
+def _jagged_box(x, y, size, n_vertices=64):
+    """Return a square polygon with `n_vertices` vertices per side"""
+
+    step = size / n_vertices
+    ring = (
+        [(x + i * step, y) for i in range(n_vertices)]
+        + [(x + size, y + i * step) for i in range(n_vertices)]
+        + [(x + size - i * step, y + size) for i in range(n_vertices)]
+        + [(x, y + size - i * step) for i in range(n_vertices)]
+    )
+
+    return Polygon(ring) if n_vertices > 1 else box(x, y, x + size, y + size)
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Route requests on real service paths to `FixtureData` responses"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+
+        path, _, query_str = self.path.partition("?")
+        query = parse_qs(query_str)
+        data = self.server.fixture_data
+
+        headers = {}
+        if query.get("access_token") == [data.RATE_LIMITED_TOKEN]:
+            allowed, reset = data.take_iso_quota()
+            headers = {
+                "X-Rate-Limit-Limit": data.iso_quota[0],
+                "X-Rate-Limit-Interval": data.iso_quota[1],
+                "X-Rate-Limit-Reset": math.ceil(reset),
+            }
+
+            if not allowed:
+                body = json.dumps({"message": "Too Many Requests"}).encode()
+                self._send(429, body, "application/json", headers)
+                return
+
+        try:
+            body, content_type = self._route(path, query, data)
+        except Exception as error:
+            self._send(
+                404,
+                json.dumps({"message": str(error)}).encode(),
+                "application/json",
+            )
+            return
+
+        self._send(200, body, content_type, headers)
+
+    def _route(self, path, query, data):
+        """Return (body, content_type) for a request path"""
+
+        if path.startswith("/isochrone/v1/mapbox/"):
+            lng, lat = map(
+                float, path.rsplit("/", 1)[-1].replace("%2C", ",").split(",")
+            )
+            contours = [
+                int(c) for c in query["contours_minutes"][0].split(",")
+            ]
+            return data.isochrone_json(lng, lat, contours), "application/json"
+
+        if path.endswith(".xlsx") and "all-geocodes" in path:
+            return (
+                data.get("geocodes", data.geocodes_xlsx),
+                "application/vnd.ms-excel",
+            )
+
+        if path.endswith("Summary_FileTemplates.zip"):
+            return (
+                data.get("templates", data.summary_templates_zip),
+                "application/zip",
+            )
+
+        if path.startswith("/geo/tiger/") and path.endswith(".zip"):
+            filename = path.rsplit("/", 1)[-1]
+            return (
+                data.get(filename, lambda: data.tiger_zip(filename)),
+                "application/zip",
+            )
+
+        if path.startswith("/data/"):
+            return data.census_data_json(query), "application/json"
+
+        raise KeyError(f"No fixture for {path}")
+
+    def _send(self, status, body, content_type, headers=None):
+        """Send a complete response with Content-Length for keep-alive"""
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer(object):
+    """
+    Threaded fixture HTTP server running in a background thread.
+
+    Attributes
+    ----------
+    url: str
+        Base url of the running server Ex: 'http://127.0.0.1:53211'
+    fixture_data: FixtureData
+        Generator of the canned responses.
+    """
+
+    def __init__(self, fixture_data=None, host="127.0.0.1", port=0):
+
+        self.fixture_data = fixture_data or FixtureData()
+        self.httpd = ThreadingHTTPServer((host, port), FixtureHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.fixture_data = self.fixture_data
+        self.url = f"http://{host}:{self.httpd.server_port}"
+        self._thread = None
+
+    def start(self):
+        """Start serving in a daemon thread"""
+
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, daemon=True
+        )
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket"""
+
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class FixtureAdapter(HTTPAdapter):
+    """HTTPAdapter sending every request to the fixture server (same path)"""
+
+    def __init__(self, server_url, **kwargs):
+
+        self.server_url = urlsplit(server_url)
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+
+        _, _, path, query, fragment = urlsplit(request.url)
+        request.url = urlunsplit(
+            (
+                self.server_url.scheme,
+                self.server_url.netloc,
+                path,
+                query,
+                fragment,
+            )
+        )
+
+        return super().send(request, **kwargs)
+
+
+def make_fixture_session(server_url, pool_maxsize=32):
+    """Return a pooled session routing all http(s) requests to `server_url`"""
+
+    session = make_session(pool_maxsize=pool_maxsize)
+    adapter = FixtureAdapter(
+        server_url,
+        pool_connections=4,
+        pool_maxsize=pool_maxsize,
+        max_retries=0,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
@@ -0,0 +1,593 @@
+"""
+Offline benchmarks for the api wrappers.
+
+Every case runs in a fresh process against the local fixture server (see
+`fixture_server.py`), so timings and peak RSS don't leak between cases and no
+network access or api keys are needed.
+
+Usage:
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --cases mapbox_batch boundaries \
+        --json bench.json
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import argparse
+import resource
+import tempfile
+import statistics
+import multiprocessing
+
+from benchmarks.fixture_server import (
+    FixtureData,
+    FixtureServer,
+    make_fixture_session,
+)
+
+CASES = {}
+
+
+def benchmark(func):
+    """Register a benchmark case under its function name"""
+
+    CASES[func.__name__] = func
+
+    return func
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Return {'p50': ..} of `values` in milliseconds"""
+
+    if len(values) < 2:
+        return (
+            {f"p{point}_ms": 1000 * values[0] for point in points}
+            if values
+            else {}
+        )
+
+    quantiles = statistics.quantiles(values, n=100, method="inclusive")
+
+    return {f"p{point}_ms": 1000 * quantiles[point - 1] for point in points}
+
+
+def timed(func, *args, **kwargs):
+    """Return (result, seconds) of func(*args, **kwargs)"""
+
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+
+    return result, time.perf_counter() - start
+
+
+@benchmark
+def mapbox_batch(options):
+    """Concurrent isochrone fetches through MapboxAPI.iso_batch"""
+
+    from api_wrapper.geo_api import MapboxAPI
+
+    mapbox_api = MapboxAPI("fixture-token", rate_limit=None)
+
+    latencies = []
+    get_response = mapbox_api.iso_api.get_response
+
+    def timed_get_response(*args, **kwargs):
+        response, seconds = timed(get_response, *args, **kwargs)
+        latencies.append(seconds)
+        return response
+
+    mapbox_api.iso_api.get_response = timed_get_response
+
+    origins = [
+        (-105 + 0.001 * (n % 100), 39 + 0.001 * (n // 100))
+        for n in range(options.origins)
+    ]
+    results, seconds = timed(
+        mapbox_api.iso_batch, origins, max_workers=options.workers
+    )
+
+    return dict(
+        requests=len(origins),
+        failures=sum(result.error is not None for result in results),
+        seconds=seconds,
+        throughput_rps=len(origins) / seconds,
+        **percentiles(latencies),
+    )
+
+
+@benchmark
+def mapbox_batch_iso_cache(options):
+    """MapboxAPI.iso_batch of dense origins (10 per address), IsochroneCache"""
+
+    from api_wrapper.cache import IsochroneCache
+    from api_wrapper.geo_api import MapboxAPI
+
+    # jitter of up to ~5m around every address
+    origins = [
+        (
+            -105 + 0.001 * (n // 10 % 100) + 0.00001 * (n % 5),
+            39 + 0.001 * (n // 1000) + 0.00001 * (n % 3),
+        )
+        for n in range(options.origins)
+    ]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        mapbox_api = MapboxAPI(
+            "fixture-token",
+            iso_cache=IsochroneCache(cache_dir, tolerance=10),
+            rate_limit=None,
+        )
+
+        n_requests = []
+        get_response = mapbox_api.iso_api.get_response
+
+        def counted_get_response(*args, **kwargs):
+            n_requests.append(1)
+            return get_response(*args, **kwargs)
+
+        mapbox_api.iso_api.get_response = counted_get_response
+
+        results, cold_seconds = timed(
+            mapbox_api.iso_batch, origins, max_workers=options.workers
+        )
+        _, warm_seconds = timed(
+            mapbox_api.iso_batch, origins, max_workers=options.workers
+        )
+
+    return dict(
+        origins=len(origins),
+        requests=len(n_requests),
+        failures=sum(result.error is not None for result in results),
+        cold_s=cold_seconds,
+        warm_s=warm_seconds,
+    )
+
+
+@benchmark
+def mapbox_rate_limited(options):
+    """MapboxAPI.iso_batch against a 60 requests/s quota, limited or not"""
+
+    from api_wrapper.geo_api import MapboxAPI
+    from benchmarks.fixture_server import FixtureData
+
+    origins = [
+        (-105 + 0.001 * n, 39) for n in range(min(options.origins, 600))
+    ]
+    metrics = {}
+
+    # the limiter starts at Mapbox's default 5/s and adapts to quota headers
+    for name, rate_limit in [("limited", 5), ("unlimited", None)]:
+        mapbox_api = MapboxAPI(
+            FixtureData.RATE_LIMITED_TOKEN, rate_limit=rate_limit
+        )
+
+        statuses = []
+        session_get = mapbox_api.iso_api.session.get
+
+        def counted_get(*args, **kwargs):
+            response = session_get(*args, **kwargs)
+            statuses.append(response.status_code)
+            return response
+
+        mapbox_api.iso_api.session = copy.copy(mapbox_api.iso_api.session)
+        mapbox_api.iso_api.session.get = counted_get
+
+        time.sleep(1)
+        results, seconds = timed(
+            mapbox_api.iso_batch, origins, max_workers=options.workers
+        )
+
+        metrics[f"{name}_ok"] = sum(result.error is None for result in results)
+        metrics[f"{name}_429s"] = statuses.count(429)
+        metrics[f"{name}_ok_per_s"] = metrics[f"{name}_ok"] / seconds
+
+    return metrics
+
+
+@benchmark
+def mapbox_batch_to_file(options):
+    """
+    MapboxAPI.iso_batch_to_file into GeoJSONSeq and GeoParquet vs one
+    GeoJSON per origin
+    """
+
+    import warnings
+    from api_wrapper.geo_api import MapboxAPI
+
+    mapbox_api = MapboxAPI("fixture-token", rate_limit=None)
+    origins = [
+        (-105 + 0.001 * (n % 100), 39 + 0.001 * (n // 100))
+        for n in range(options.origins)
+    ]
+    metrics = {}
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for name in ["geojsonl", "parquet"]:
+            filepath = os.path.join(output_dir, f"isochrones.{name}")
+            failures, seconds = timed(
+                mapbox_api.iso_batch_to_file,
+                origins,
+                filepath,
+                max_workers=options.workers,
+            )
+            metrics[f"{name}_s"] = seconds
+            metrics[f"{name}_failures"] = len(failures)
+            metrics[f"{name}_mb"] = os.path.getsize(filepath) / 2**20
+
+        # previous approach: one request_to_geojson file per origin
+        n_origins = min(len(origins), 200)
+        start = time.perf_counter()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for n, (lng, lat) in enumerate(origins[:n_origins]):
+                mapbox_api.iso_to_geojson(
+                    os.path.join(output_dir, f"{n}.geojson"),
+                    str(lng),
+                    str(lat),
+                )
+        metrics["geojson_per_origin_s"] = (
+            (time.perf_counter() - start) * len(origins) / n_origins
+        )
+
+    return metrics
+
+
+@benchmark
+def census_api_construct(options):
+    """CensusAPI construction plus metadata access, cold and warm cache"""
+
+    from api_wrapper.census_api.census_api import CensusAPI
+
+    def construct(cache_dir):
+        census_api = CensusAPI(2018, cache_dir=cache_dir)
+        census_api.table_meta_data
+        census_api.state_fips
+        return census_api
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        census_api, cold_seconds = timed(construct, cache_dir)
+        _, warm_seconds = timed(construct, cache_dir)
+        _, lazy_seconds = timed(CensusAPI, 2018, cache_dir=cache_dir)
+
+    return dict(
+        tables=len(census_api.table_meta_data),
+        cold_s=cold_seconds,
+        warm_s=warm_seconds,
+        constructor_only_s=lazy_seconds,
+    )
+
+
+@benchmark
+def boundaries(options):
+    """CensusBoundaries.get_boundaries_gdf of a state, cold and warm cache"""
+
+    from api_wrapper.census_api.census_boundaries import CensusBoundaries
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        census_boundaries, constructor_seconds = timed(
+            CensusBoundaries,
+            2018,
+            cache_dir=os.path.join(cache_dir, "meta"),
+            boundary_cache_dir=os.path.join(cache_dir, "boundaries"),
+        )
+        gdf, cold_seconds = timed(
+            census_boundaries.get_boundaries_gdf, "Colorado", "tract"
+        )
+        _, warm_seconds = timed(
+            census_boundaries.get_boundaries_gdf, "Colorado", "tract"
+        )
+        _, warm_geoid_seconds = timed(
+            census_boundaries.get_boundaries_gdf,
+            "Colorado",
+            "tract",
+            columns=["GEOID"],
+        )
+        low_gdf, lod_cold_seconds = timed(
+            census_boundaries.get_boundaries_gdf,
+            "Colorado",
+            "tract",
+            lod="low",
+        )
+        _, lod_warm_seconds = timed(
+            census_boundaries.get_boundaries_gdf,
+            "Colorado",
+            "tract",
+            lod="low",
+        )
+
+    return dict(
+        features=len(gdf),
+        constructor_s=constructor_seconds,
+        cold_s=cold_seconds,
+        warm_s=warm_seconds,
+        warm_geoid_only_s=warm_geoid_seconds,
+        vertices=int(gdf.count_coordinates().sum()),
+        lod_low_vertices=int(low_gdf.count_coordinates().sum()),
+        lod_low_cold_s=lod_cold_seconds,
+        lod_low_warm_s=lod_warm_seconds,
+        geojson_mb=len(gdf.to_json()) / 2**20,
+        lod_low_geojson_mb=len(low_gdf.to_json()) / 2**20,
+    )
+
+
+@benchmark
+def boundaries_all_states(options):
+    """CensusBoundaries.get_boundaries_gdf('all', 'tract') on a cold cache"""
+
+    from api_wrapper.census_api.census_boundaries import CensusBoundaries
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        census_boundaries = CensusBoundaries(
+            2018,
+            cache_dir=os.path.join(cache_dir, "meta"),
+            boundary_cache_dir=os.path.join(cache_dir, "boundaries"),
+        )
+        gdf, seconds = timed(
+            census_boundaries.get_boundaries_gdf,
+            "all",
+            "tract",
+            max_workers=options.workers,
+        )
+
+    return dict(
+        features=len(gdf), seconds=seconds, features_per_s=len(gdf) / seconds
+    )
+
+
+@benchmark
+def boundaries_formats(options):
+    """Write, read and bbox read tracts as GeoJSON, GeoParquet, FlatGeobuf"""
+
+    import warnings
+    from api_wrapper.census_api.census_boundaries import CensusBoundaries
+
+    metrics = {}
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        census_boundaries = CensusBoundaries(
+            2018,
+            cache_dir=os.path.join(cache_dir, "meta"),
+            boundary_cache_dir=os.path.join(cache_dir, "boundaries"),
+        )
+        gdf = census_boundaries.get_boundaries_gdf(
+            "all", "tract", max_workers=options.workers
+        )
+
+        # a bbox around ~1% of the features
+        minx, miny, maxx, maxy = gdf.total_bounds
+        bbox = (
+            minx,
+            miny,
+            minx + (maxx - minx) / 10,
+            miny + (maxy - miny) / 10,
+        )
+        metrics["features"] = len(gdf)
+
+        for ext in ["geojson", "parquet", "fgb"]:
+            filepath = os.path.join(cache_dir, f"tracts.{ext}")
+
+            if ext == "geojson":
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    _, seconds = timed(gdf.to_file, filepath, driver="GeoJSON")
+            else:
+                _, seconds = timed(
+                    census_boundaries.boundaries_to_file,
+                    filepath,
+                    "all",
+                    "tract",
+                    max_workers=options.workers,
+                )
+
+            metrics[f"{ext}_write_s"] = seconds
+            metrics[f"{ext}_mb"] = os.path.getsize(filepath) / 2**20
+            _, metrics[f"{ext}_read_s"] = timed(
+                census_boundaries.read_boundaries, filepath
+            )
+            bbox_gdf, metrics[f"{ext}_bbox_read_s"] = timed(
+                census_boundaries.read_boundaries, filepath, bbox=bbox
+            )
+            metrics[f"{ext}_bbox_features"] = len(bbox_gdf)
+
+    return metrics
+
+
+@benchmark
+def get_data(options):
+    """CensusDataAPI.get_data for block groups of a whole state (sharded)"""
+
+    from api_wrapper.census_api.census_api import CensusDataAPI
+
+    tables = {f"B01001_{n:03d}E": f"SEX BY AGE!!{n}" for n in range(1, 121)}
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        census_data = CensusDataAPI("acs5", 2018, cache_dir=cache_dir)
+        # the geo_hierarchies csv is project data outside this repo
+        census_data.hierarchies_dict = {
+            "county": ["state", "county"],
+            "census_tract": ["state", "county", "census_tract"],
+            "block_group": ["state", "county", "census_tract", "block_group"],
+        }
+
+        tract_df, tract_seconds = timed(
+            census_data.get_data,
+            [tables],
+            state="Colorado",
+            county="*",
+            census_tract="*",
+        )
+        df, seconds = timed(
+            census_data.get_data,
+            [tables],
+            max_workers=options.workers,
+            labels="attrs",
+            state="Colorado",
+            county="*",
+            census_tract="*",
+            block_group="*",
+        )
+
+    return dict(
+        tract_rows=len(tract_df),
+        tract_s=tract_seconds,
+        tract_row_labels_frame_mb=tract_df.memory_usage(deep=True).sum()
+        / 2**20,
+        block_group_rows=len(df),
+        block_group_s=seconds,
+        block_group_rows_per_s=len(df) / seconds,
+        frame_mb=df.memory_usage(deep=True).sum() / 2**20,
+    )
+
+
+@benchmark
+def geo_data(options):
+    """CensusGeoDataAPI.get_geo_data of tracts, cold and warm cache"""
+
+    from api_wrapper.census_api.census_geo_data import CensusGeoDataAPI
+
+    tables = {f"B01001_{n:03d}E": f"SEX BY AGE!!{n}" for n in range(1, 50)}
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        census_geo_data = CensusGeoDataAPI(
+            "acs5",
+            2018,
+            cache_dir=os.path.join(cache_dir, "meta"),
+            geo_data_cache_dir=os.path.join(cache_dir, "geo_data"),
+            boundary_kwargs=dict(
+                boundary_cache_dir=os.path.join(cache_dir, "boundaries")
+            ),
+        )
+        census_geo_data.hierarchies_dict = {
+            "county": ["state", "county"],
+            "census_tract": ["state", "county", "census_tract"],
+            "block_group": ["state", "county", "census_tract", "block_group"],
+        }
+
+        gdf, cold_seconds = timed(
+            census_geo_data.get_geo_data,
+            [tables],
+            "Colorado",
+            "tract",
+            max_workers=options.workers,
+        )
+        _, warm_seconds = timed(
+            census_geo_data.get_geo_data, [tables], "Colorado", "tract"
+        )
+        bg_gdf, bg_seconds = timed(
+            census_geo_data.get_geo_data,
+            [tables],
+            "Colorado",
+            "bg",
+            max_workers=options.workers,
+        )
+
+    return dict(
+        features=len(gdf),
+        columns=len(gdf.columns),
+        cold_s=cold_seconds,
+        warm_s=warm_seconds,
+        bg_features=len(bg_gdf),
+        bg_cold_s=bg_seconds,
+    )
+
+
+def _run_case(name, server_url, options, queue):
+    """Run one case in this (fresh) process and put its metrics on `queue`"""
+
+    from api_wrapper.base_api import set_shared_session
+    from api_wrapper.instrumentation import (
+        MetricsRecorder,
+        set_instrumentation,
+    )
+
+    set_shared_session(
+        make_fixture_session(server_url, pool_maxsize=options.workers)
+    )
+
+    if options.instrument:
+        recorder = set_instrumentation(MetricsRecorder())
+
+    try:
+        metrics = CASES[name](options)
+    except Exception as error:
+        metrics = dict(error=repr(error))
+
+    if options.instrument:
+        metrics["instrumentation"] = recorder.snapshot()
+
+    metrics["peak_rss_mb"] = (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    )
+
+    queue.put(metrics)
+
+
+def run(case_names, options):
+    """Run `case_names` against a fixture server, return {case: metrics}"""
+
+    context = multiprocessing.get_context("spawn")
+    fixture_data = FixtureData(
+        n_counties=options.counties, n_tracts=options.tracts
+    )
+    results = {}
+
+    with FixtureServer(fixture_data) as server:
+        for name in case_names:
+            queue = context.Queue()
+            process = context.Process(
+                target=_run_case, args=(name, server.url, options, queue)
+            )
+            process.start()
+            results[name] = queue.get()
+            process.join()
+
+    return results
+
+
+def print_results(results):
+    """Print metrics of every case"""
+
+    for name, metrics in results.items():
+        print(f"\n{name}")
+        for key, value in metrics.items():
+            if isinstance(value, dict):
+                value = f"{len(value)} groups, see --json"
+            elif isinstance(value, float):
+                value = f"{value:.4f}"
+            print(f"    {key:<28}{value}")
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--cases", nargs="+", default=list(CASES), choices=list(CASES)
+    )
+    parser.add_argument("--origins", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--counties", type=int, default=5)
+    parser.add_argument("--tracts", type=int, default=40)
+    parser.add_argument("--json", help="Write results to this json file")
+    parser.add_argument(
+        "--instrument",
+        action="store_true",
+        help="Record request metrics and spans (api_wrapper.instrumentation)",
+    )
+    options = parser.parse_args(argv)
+
+    results = run(options.cases, options)
+    print_results(results)
+
+    if options.json:
+        with open(options.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
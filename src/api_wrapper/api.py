@@ -1,3 +1,6 @@
-from base_api import API
-from geo_api import MapboxAPI
-from census_api import CensusBoundaries
+from api_wrapper.base_api import API
+from api_wrapper.geo_api import MapboxAPI
+from api_wrapper.census_api.census_boundaries import CensusBoundaries
+from api_wrapper.census_api.census_geo_data import CensusGeoDataAPI
+
+__all__ = ["API", "MapboxAPI", "CensusBoundaries", "CensusGeoDataAPI"]
@@ -1,12 +1,112 @@
 import requests
 import dotenv
 import os
+import re
+import time
+import logging
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from api_wrapper.instrumentation import get_endpoint, get_instrumentation
+
+DEFAULT_TIMEOUT = (3.05, 30)
+SECRET_PARAMS_RE = re.compile(r"((?:access_token|key)=)[^&]*")
+
+logger = logging.getLogger(__name__)
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def make_session(
+    pool_connections=10,
+    pool_maxsize=10,
+    host_pool_sizes=None,
+    retries=3,
+    backoff_factor=0.5,
+    status_forcelist=(500, 502, 503, 504),
+):
+    """
+    Return a requests Session with pooled keep-alive connections and retries.
+
+    Parameters
+    ----------
+    pool_connections: int
+        Number of per-host connection pools to keep.
+    pool_maxsize: int
+        Maximum number of connections kept alive in each host's pool.
+    host_pool_sizes: dict
+        Pool sizes for specific hosts, keys are url prefixes.
+        Example: {'https://api.mapbox.com': 32}
+    retries: int
+        Number of retries on connection errors and `status_forcelist`
+        responses.
+    backoff_factor: float
+        Exponential backoff factor between retries (0.5 -> 0.5s, 1s, 2s...).
+    status_forcelist: tuple
+        HTTP status codes that are retried.
+
+    Returns
+    ---------
+    session: requests.Session
+    """
+
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+
+    session = requests.Session()
+
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    host_pool_sizes = host_pool_sizes or {}
+    for host, maxsize in host_pool_sizes.items():
+        host_adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=maxsize, max_retries=retry
+        )
+        session.mount(host, host_adapter)
+
+    return session
+
+
+def get_shared_session():
+    """Return the process wide session shared by all API instances"""
+
+    global _shared_session
+
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = make_session()
+
+    return _shared_session
+
+
+def set_shared_session(session):
+    """Replace the process wide session, i.e. make_session(pool_maxsize=64)"""
+
+    global _shared_session
+
+    with _shared_session_lock:
+        _shared_session = session
 
 
 class API(object):
     """A simple wrapper to interact with web apis
 
-    Usage: 
+    Usage:
     mapbox_api= API('https://api.mapbox.com/isochrone/v1/mapbox')
     options = {'/driving':None,
             '%2C':[lng, lat],
@@ -17,11 +117,43 @@ class API(object):
     request_str = mapbox_api.get_request_str(options)
 
     mapbox_api.get_json(request_str)
+
+    Requests go through a pooled keep-alive `requests.Session` that retries
+    connection errors and 5xx responses. By default every API instance shares
+    one session, pass `session=make_session(...)` to tune pool sizes.
+
+    Pass `cache=ResponseCache(...)` (see `api_wrapper.cache`) to serve repeated
+    `get_json` requests from disk.
+
+    Pass `rate_limiter=RateLimiter(...)` (see `api_wrapper.rate_limit`) to
+    space requests to the provider's quota. 429 responses are then retried
+    up to `max_rate_limit_retries` times after the `Retry-After` delay.
+
+    Requests and cache lookups are reported to `instrumentation`, by default
+    the process wide one (see `api_wrapper.instrumentation`), under the
+    endpoint 'host/path' of `base_url`. Request urls are logged at DEBUG level
+    with api keys redacted.
     """
 
-    def __init__(self, base_url):
+    def __init__(
+        self,
+        base_url,
+        session=None,
+        timeout=DEFAULT_TIMEOUT,
+        cache=None,
+        rate_limiter=None,
+        max_rate_limit_retries=5,
+        instrumentation=None,
+    ):
 
         self.base_url = base_url.strip("/")
+        self.session = session if session is not None else get_shared_session()
+        self.timeout = timeout
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.instrumentation = instrumentation
+        self.endpoint = get_endpoint(self.base_url)
 
     def get_request_str(self, options):
 
@@ -42,24 +174,97 @@ class API(object):
 
         request_str = self.base_url + "".join(options_list)
 
-        print(request_str)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(SECRET_PARAMS_RE.sub(r"\1***", request_str))
+
         return request_str
 
-    def get_response(self, request_str):
+    def get_response(self, request_str, **kwargs):
+
+        kwargs.setdefault("timeout", self.timeout)
+        instrumentation = self.instrumentation or get_instrumentation()
+
+        if self.rate_limiter is None:
+            return self._get(request_str, instrumentation, kwargs)
 
-        response = requests.get(request_str)
+        for attempt in range(self.max_rate_limit_retries + 1):
+            self.rate_limiter.acquire(request_str)
+            response = self._get(request_str, instrumentation, kwargs)
+            self.rate_limiter.update(response, request_str)
+
+            if (
+                response.status_code != 429
+                or attempt == self.max_rate_limit_retries
+            ):
+                break
+
+            # only responses that are retried are closed, the last 429 is
+            # returned readable (i.e. for raise_for_status)
+            response.close()
+
+        return response
+
+    def _get(self, request_str, instrumentation, kwargs):
+        """Send a GET request, report it to `instrumentation` when enabled"""
+
+        if not instrumentation.enabled:
+            return self.session.get(request_str, **kwargs)
+
+        start = time.perf_counter()
+
+        try:
+            response = self.session.get(request_str, **kwargs)
+        except requests.RequestException:
+            instrumentation.request(
+                self.endpoint, time.perf_counter() - start, "error"
+            )
+            raise
+
+        if kwargs.get("stream"):
+            n_bytes = int(response.headers.get("Content-Length", 0))
+        else:
+            n_bytes = len(response.content)
+
+        retry = getattr(response.raw, "retries", None)
+
+        instrumentation.request(
+            self.endpoint,
+            time.perf_counter() - start,
+            response.status_code,
+            n_bytes=n_bytes,
+            retries=len(retry.history) if retry is not None else 0,
+        )
 
         return response
 
     def get_json(self, get_object):
 
+        if isinstance(get_object, str) and self.cache is not None:
+            json = self.cache.get(get_object)
+
+            instrumentation = self.instrumentation or get_instrumentation()
+            if instrumentation.enabled:
+                instrumentation.cache(self.endpoint, json is not None)
+
+            if json is not None:
+                return json
+
         if isinstance(get_object, str):
             response = self.get_response(get_object)
 
         else:
             response = get_object
 
-        return response.json()
+        json = response.json()
+
+        if (
+            isinstance(get_object, str)
+            and self.cache is not None
+            and response.ok
+        ):
+            self.cache.set(get_object, json)
+
+        return json
 
 
 if __name__ == "__main__":
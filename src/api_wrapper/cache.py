@@ -0,0 +1,647 @@
+"""
+Local caches shared by the api wrappers.
+
+Usage:
+
+    from api_wrapper.base_api import API
+    from api_wrapper.geo_api import MapboxAPI
+    from api_wrapper.cache import ResponseCache, IsochroneCache
+
+    cache = ResponseCache(ttl=7 * 24 * 3600, max_size=2 * 2 ** 30)
+    mapbox_api = API('https://api.mapbox.com/isochrone/v1/mapbox', cache=cache)
+
+    iso_cache = IsochroneCache(tolerance=25, grid_size=50)
+    mapbox_api = MapboxAPI(key, iso_cache=iso_cache)
+"""
+
+import os
+import json
+import math
+import time
+import sqlite3
+import hashlib
+import shutil
+import tempfile
+import threading
+from contextlib import ExitStack, contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+METRES_PER_DEGREE_LAT = 110574.0
+METRES_PER_DEGREE_LNG = 111320.0
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "API_WRAPPER_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "api_wrapper"),
+)
+# expired isochrones are deleted once every this many inserts
+EXPIRE_EVERY_N_SETS = 1000
+
+
+def atomic_write(filepath, write_func):
+    """Call `write_func(tmp_path)`, then atomically move it to `filepath`"""
+
+    directory = os.path.dirname(filepath) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=".tmp_", suffix=os.path.splitext(filepath)[1]
+    )
+    os.close(fd)
+
+    try:
+        write_func(tmp_path)
+        os.replace(tmp_path, filepath)
+
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return filepath
+
+
+class ResponseCache(object):
+    """
+    On-disk LRU cache of json responses with a time to live.
+
+    Entries are keyed by a normalized request url: query parameters are sorted
+    and `ignore_params` (i.e. `access_token`) are dropped, so api keys never
+    split the key space or get written to disk.
+
+    Attributes
+    ----------
+    cache_dir: str
+        Directory holding the sqlite database `responses.sqlite`.
+    ttl: float
+        Seconds an entry stays valid. None never expires.
+    max_size: int
+        Maximum bytes of stored responses before least recently used entries
+        are evicted.
+    ignore_params: tuple
+        Query parameters left out of the cache key.
+
+    Methods
+    ---------
+    get(request_str)
+        Return cached json for `request_str` or None.
+    set(request_str, json_obj)
+        Store json for `request_str` and evict entries above `max_size`.
+    normalize(request_str)
+        Return `request_str` with sorted query and `ignore_params` removed.
+    clear()
+        Remove all entries.
+    """
+
+    def __init__(
+        self,
+        cache_dir=None,
+        ttl=24 * 3600,
+        max_size=512 * 2**20,
+        ignore_params=("access_token",),
+    ):
+        """Initiate ResponseCache in `cache_dir`"""
+
+        self.cache_dir = cache_dir or os.path.join(
+            DEFAULT_CACHE_DIR, "responses"
+        )
+        self.ttl = ttl
+        self.max_size = max_size
+        self.ignore_params = set(ignore_params)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(self.cache_dir, "responses.sqlite"),
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                body TEXT,
+                size INTEGER,
+                created REAL,
+                accessed REAL
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed "
+            "ON responses (accessed)"
+        )
+        # in WAL mode commits are durable at checkpoints, not fsynced each
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+        # running total of stored bytes, so inserts don't scan the table
+        (self._total_size,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+    def normalize(self, request_str):
+        """Return `request_str`, query sorted and `ignore_params` removed"""
+
+        scheme, netloc, path, query, _ = urlsplit(request_str)
+
+        params = [
+            (k.lstrip("&?"), v)
+            for k, v in parse_qsl(query, keep_blank_values=True)
+            if k.lstrip("&?") not in self.ignore_params
+        ]
+
+        return urlunsplit(
+            (scheme, netloc, path, urlencode(sorted(params)), "")
+        )
+
+    def get(self, request_str):
+        """Return cached json for `request_str` or None"""
+
+        url = self.normalize(request_str)
+        key = self._hash(url)
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, size, created FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            body, size, created = row
+
+            if self.ttl is not None and now - created > self.ttl:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key = ?", (key,)
+                )
+                self._total_size -= size
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+
+        return json.loads(body)
+
+    def set(self, request_str, json_obj):
+        """Store json for `request_str` and evict entries above `max_size`"""
+
+        url = self.normalize(request_str)
+        body = json.dumps(json_obj, separators=(",", ":"))
+        now = time.time()
+
+        key = self._hash(url)
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            row = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, url, body, len(body), now, now),
+            )
+            self._total_size += len(body) - (row[0] if row else 0)
+            self._evict()
+            self._conn.execute("COMMIT")
+
+    def clear(self):
+        """Remove all entries"""
+
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.execute("VACUUM")
+            self._total_size = 0
+
+    def _evict(self):
+        """
+        Delete least recently used entries until under `max_size`.
+
+        Only the oldest entries are read, from the `accessed` index, so an
+        insert into a full cache costs a few index lookups.
+        """
+
+        if self.max_size is None or self._total_size <= self.max_size:
+            return
+
+        evict_keys = []
+        cursor = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed"
+        )
+        for key, size in cursor:
+            if self._total_size <= self.max_size:
+                break
+            evict_keys.append((key,))
+            self._total_size -= size
+        cursor.close()
+
+        self._conn.executemany(
+            "DELETE FROM responses WHERE key = ?", evict_keys
+        )
+
+    def _hash(self, url):
+        """Return the sha256 hex digest of a normalized url"""
+
+        return hashlib.sha256(url.encode()).hexdigest()
+
+
+class IsochroneCache(object):
+    """
+    On-disk cache of isochrones served for nearby origins.
+
+    Entries are keyed by (travel_type, contours_minutes, polygons) and origin
+    point, and indexed with an sqlite R*Tree, so finding cached origins within
+    `tolerance` metres of a new origin is a logarithmic index lookup. With
+    `grid_size` origins are first snapped to a grid of that many metres, so
+    origins in the same cell share one request and one entry.
+
+    Attributes
+    ----------
+    cache_dir: str
+        Directory holding the sqlite database `isochrones.sqlite`.
+    tolerance: float
+        Maximum distance in metres between an origin and a cached origin.
+    grid_size: float
+        Grid cell size in metres origins are snapped to. None doesn't snap.
+    ttl: float
+        Seconds an entry stays valid. None never expires.
+    max_size: int
+        Maximum bytes of stored isochrones before least recently used entries
+        are evicted.
+
+    Methods
+    ---------
+    snap(lng, lat)
+        Return (lng, lat) snapped to the grid.
+    get(lng, lat, profile)
+        Return json of the nearest cached origin within `tolerance` or None.
+    set(lng, lat, profile, json_obj)
+        Store json for an origin and evict entries above `max_size`.
+    lock(lng, lat, profile)
+        Context manager serializing requests of origins within `tolerance`.
+    clear()
+        Remove all entries.
+    """
+
+    def __init__(
+        self,
+        cache_dir=None,
+        tolerance=25.0,
+        grid_size=None,
+        ttl=30 * 24 * 3600,
+        max_size=512 * 2**20,
+    ):
+        """Initiate IsochroneCache in `cache_dir`"""
+
+        self.cache_dir = cache_dir or os.path.join(
+            DEFAULT_CACHE_DIR, "isochrones"
+        )
+        self.tolerance = tolerance
+        self.grid_size = grid_size
+        self.ttl = ttl
+        self.max_size = max_size
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._cell_locks = [threading.Lock() for _ in range(1024)]
+        self._conn = sqlite3.connect(
+            os.path.join(self.cache_dir, "isochrones.sqlite"),
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS isochrones (
+                id INTEGER PRIMARY KEY,
+                profile TEXT,
+                lng REAL,
+                lat REAL,
+                body TEXT,
+                size INTEGER,
+                created REAL,
+                accessed REAL
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS isochrones_accessed "
+            "ON isochrones (accessed)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS isochrones_created "
+            "ON isochrones (created)"
+        )
+        self._conn.execute(
+            """CREATE VIRTUAL TABLE IF NOT EXISTS isochrones_rtree USING rtree(
+                id, min_lng, max_lng, min_lat, max_lat
+            )"""
+        )
+        # in WAL mode commits are durable at checkpoints, not fsynced each
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+        # running total of stored bytes, so inserts don't scan the table
+        (self._total_size,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM isochrones"
+        ).fetchone()
+        self._n_sets = 0
+
+    def snap(self, lng, lat):
+        """Return (lng, lat) snapped to the grid"""
+
+        lng, lat = float(lng), float(lat)
+
+        if self.grid_size is None:
+            return lng, lat
+
+        lat_step = self.grid_size / METRES_PER_DEGREE_LAT
+        lat = round(lat / lat_step) * lat_step
+
+        lng_step = self.grid_size / (
+            METRES_PER_DEGREE_LNG * math.cos(math.radians(lat))
+        )
+        lng = round(lng / lng_step) * lng_step
+
+        return round(lng, 6), round(lat, 6)
+
+    def get(self, lng, lat, profile):
+        """Return json of the nearest cached origin within tolerance or None"""
+
+        lng, lat = float(lng), float(lat)
+        d_lng, d_lat = self._tolerance_degrees(lat)
+        now = time.time()
+
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT i.id, i.lng, i.lat, i.created
+                FROM isochrones_rtree r JOIN isochrones i ON i.id = r.id
+                WHERE r.min_lng <= ? AND r.max_lng >= ?
+                AND r.min_lat <= ? AND r.max_lat >= ?
+                AND i.profile = ?""",
+                (lng + d_lng, lng - d_lng, lat + d_lat, lat - d_lat, profile),
+            ).fetchall()
+
+            rows = [
+                (self._distance(lng, lat, row_lng, row_lat), row_id, created)
+                for row_id, row_lng, row_lat, created in rows
+                if self.ttl is None or now - created <= self.ttl
+            ]
+            rows = [row for row in rows if row[0] <= self.tolerance]
+
+            if not rows:
+                return None
+
+            _, row_id, _ = min(rows)
+
+            (body,) = self._conn.execute(
+                "SELECT body FROM isochrones WHERE id = ?", (row_id,)
+            ).fetchone()
+            self._conn.execute(
+                "UPDATE isochrones SET accessed = ? WHERE id = ?",
+                (now, row_id),
+            )
+
+        return json.loads(body)
+
+    def set(self, lng, lat, profile, json_obj):
+        """Store json for an origin and evict entries above `max_size`"""
+
+        lng, lat = float(lng), float(lat)
+        body = json.dumps(json_obj, separators=(",", ":"))
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            cursor = self._conn.execute(
+                "INSERT INTO isochrones "
+                "(profile, lng, lat, body, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (profile, lng, lat, body, len(body), now, now),
+            )
+            self._conn.execute(
+                "INSERT INTO isochrones_rtree VALUES (?, ?, ?, ?, ?)",
+                (cursor.lastrowid, lng, lng, lat, lat),
+            )
+            self._total_size += len(body)
+            self._n_sets += 1
+            self._evict()
+            self._conn.execute("COMMIT")
+
+    @contextmanager
+    def lock(self, lng, lat, profile):
+        """
+        Context manager locking the tolerance cell of an origin and its
+        neighbours, so requests of origins within `tolerance` are serialized.
+        """
+
+        with ExitStack() as stack:
+            for stripe in self._lock_stripes(lng, lat, profile):
+                stack.enter_context(self._cell_locks[stripe])
+
+            yield
+
+    def _lock_stripes(self, lng, lat, profile):
+        """
+        Return the sorted lock stripes of the 3x3 tolerance cells around an
+        origin.
+
+        Cells are `tolerance` high and, per row, `tolerance` wide at the row's
+        latitude, so origins within tolerance share a row and, in that row,
+        are at most two columns apart: their neighbourhoods share a lock.
+        Locks are striped, so memory doesn't grow with the number of origins,
+        and taken in order (no deadlocks).
+        """
+
+        _, d_lat = self._tolerance_degrees(0.0)
+        row = round(float(lat) / d_lat)
+
+        cells = set()
+        for cell_row in (row - 1, row, row + 1):
+            d_lng, _ = self._tolerance_degrees(cell_row * d_lat)
+            col = round(float(lng) / d_lng)
+            cells.update((col + d_col, cell_row) for d_col in (-1, 0, 1))
+
+        return sorted(
+            {hash((profile,) + cell) % len(self._cell_locks) for cell in cells}
+        )
+
+    def clear(self):
+        """Remove all entries"""
+
+        with self._lock:
+            self._conn.execute("DELETE FROM isochrones")
+            self._conn.execute("DELETE FROM isochrones_rtree")
+            self._conn.execute("VACUUM")
+            self._total_size = 0
+
+    def _evict(self):
+        """
+        Delete least recently used entries above `max_size`, and expired
+        entries every `EXPIRE_EVERY_N_SETS` inserts.
+
+        Only the oldest entries are read, from the `accessed` index, so an
+        insert into a full cache costs a few index lookups.
+        """
+
+        if self.ttl is not None and self._n_sets % EXPIRE_EVERY_N_SETS == 1:
+            expired = self._conn.execute(
+                "SELECT id, size FROM isochrones WHERE created < ?",
+                (time.time() - self.ttl,),
+            ).fetchall()
+            self._delete(expired)
+
+        if self.max_size is None or self._total_size <= self.max_size:
+            return
+
+        total_size = self._total_size
+        evict_rows = []
+        cursor = self._conn.execute(
+            "SELECT id, size FROM isochrones ORDER BY accessed"
+        )
+        for row_id, size in cursor:
+            if total_size <= self.max_size:
+                break
+            evict_rows.append((row_id, size))
+            total_size -= size
+        cursor.close()
+
+        self._delete(evict_rows)
+
+    def _delete(self, rows):
+        """Delete entries of [(id, size), ...] from the table and R*Tree"""
+
+        ids = [(row_id,) for row_id, _ in rows]
+
+        self._conn.executemany("DELETE FROM isochrones WHERE id = ?", ids)
+        self._conn.executemany(
+            "DELETE FROM isochrones_rtree WHERE id = ?", ids
+        )
+        self._total_size -= sum(size for _, size in rows)
+
+    def _tolerance_degrees(self, lat):
+        """Return `tolerance` as (degrees lng, degrees lat) at `lat`"""
+
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        tolerance = max(self.tolerance, 0.01)
+
+        return (
+            tolerance / (METRES_PER_DEGREE_LNG * cos_lat),
+            tolerance / METRES_PER_DEGREE_LAT,
+        )
+
+    def _distance(self, lng, lat, other_lng, other_lat):
+        """Return the approximate distance in metres of two nearby points"""
+
+        dx = (
+            (other_lng - lng)
+            * METRES_PER_DEGREE_LNG
+            * math.cos(math.radians(lat))
+        )
+        dy = (other_lat - lat) * METRES_PER_DEGREE_LAT
+
+        return math.hypot(dx, dy)
+
+
+class FileCache(object):
+    """
+    Directory of cached files keyed by tuples with a size cap and LRU eviction.
+
+    A key like (2018, 'tract', '08') maps to `cache_dir/2018/tract/08<ext>`.
+    Files are written atomically, so concurrent writers never see or leave
+    partial files, and reading a file marks it as recently used.
+
+    Attributes
+    ----------
+    cache_dir: str
+        Root directory of the cache.
+    max_size: int
+        Maximum total bytes of cached files. None disables eviction.
+
+    Methods
+    ---------
+    get(key, ext=".parquet")
+        Return the cached filepath of `key` or None.
+    put(key, write_func, ext=".parquet")
+        Write `key` with `write_func(filepath)` and return its filepath.
+    evict()
+        Remove least recently used files until under `max_size`.
+    clear()
+        Remove all cached files.
+    """
+
+    def __init__(self, cache_dir, max_size=None):
+        """Initiate FileCache in `cache_dir`"""
+
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def get_path(self, key, ext=".parquet"):
+        """Return the filepath of `key`"""
+
+        return os.path.join(self.cache_dir, *map(str, key)) + ext
+
+    def get(self, key, ext=".parquet"):
+        """Return the cached filepath of `key` or None"""
+
+        filepath = self.get_path(key, ext)
+
+        try:
+            os.utime(filepath)
+        except FileNotFoundError:
+            return None
+
+        return filepath
+
+    def put(self, key, write_func, ext=".parquet"):
+        """Write `key` with `write_func(filepath)` and return its filepath"""
+
+        filepath = atomic_write(self.get_path(key, ext), write_func)
+        self.evict(keep=filepath)
+
+        return filepath
+
+    def evict(self, keep=None):
+        """Remove least recently used files until under `max_size`"""
+
+        if self.max_size is None:
+            return
+
+        files = self._list_files()
+        total_size = sum(size for _, size, _ in files)
+
+        for _, size, filepath in sorted(files):
+            if total_size <= self.max_size:
+                break
+            if filepath == keep:
+                continue
+
+            try:
+                os.remove(filepath)
+            except FileNotFoundError:
+                pass
+
+            total_size -= size
+
+    def _list_files(self):
+        """Return (mtime, size, filepath) of cached files, tmp files skipped"""
+
+        files = []
+        for root, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if filename.startswith(".tmp_"):
+                    continue
+
+                filepath = os.path.join(root, filename)
+                try:
+                    stat = os.stat(filepath)
+                except FileNotFoundError:
+                    continue
+
+                files.append((stat.st_mtime, stat.st_size, filepath))
+
+        return files
+
+    def clear(self):
+        """Remove all cached files"""
+
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
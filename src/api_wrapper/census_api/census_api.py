@@ -10,17 +10,98 @@ Usage:
     block_gdf = census_bondaries.get_boundaries_gdf('Colorado', 'block')
 """
 
+import numpy as np
 import pandas as pd
 import geopandas as gpd
 import os
 import shutil
 import censusdata
-import re
 import zipfile
 import io
-import requests
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from itertools import chain
+
+from api_wrapper.base_api import API, DEFAULT_TIMEOUT
+from api_wrapper.cache import DEFAULT_CACHE_DIR, atomic_write
+from api_wrapper.census_api.table_catalog import TableCatalog
+from api_wrapper.census_api.fips_resolver import FipsResolver
+
+logger = logging.getLogger(__name__)
+
+GEO_LEVEL_COLUMNS = {"block group": "block_group"}
+GEO_LEVEL_COLUMNS_ORDER = ["state", "county", "tract", "block_group", "block"]
+SHARDED_LEVELS = ("census_tract", "block_group", "block")
+MAX_REQUEST_VARIABLES = 49
+# Census API annotation values used in place of estimates/MOEs
+ANNOTATION_VALUES = [
+    -999999999,
+    -888888888,
+    -666666666,
+    -555555555,
+    -333333333,
+    -222222222,
+]
+
+
+def _parse_seq_excel(seq_excel_file):
+    """
+    Parse seq.xlsx files into (table_id, labels) records.
+
+    Module level so it can run in a process pool.
+    """
+
+    df = pd.read_excel(seq_excel_file, nrows=1)
+    table_data = df.iloc[0, 6:]
+
+    return [
+        (table_id, labels.split("%") if isinstance(labels, str) else [labels])
+        for table_id, labels in table_data.items()
+    ]
+
+
+class lazy_property(object):
+    """
+    Decorator for attributes computed on first access, once per instance.
+
+    The value is stored in the instance __dict__, which shadows this non-data
+    descriptor, so later accesses are plain attribute lookups. Computation is
+    guarded by the instance's reentrant `_lazy_lock` so concurrent first
+    accesses from several threads compute the value only once.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        with instance._lazy_lock:
+            if self.name not in instance.__dict__:
+                instance.__dict__[self.name] = self.func(instance)
+
+        return instance.__dict__[self.name]
 
-from proj_paths.paths import Paths
+    @staticmethod
+    def names(cls):
+        """Return names of the lazy properties of `cls` and its bases"""
+
+        return {
+            name
+            for klass in cls.__mro__
+            for name, attr in vars(klass).items()
+            if isinstance(attr, lazy_property)
+        }
 
 
 class CensusAPI(object):
@@ -31,83 +112,264 @@ class CensusAPI(object):
     ----------
     year: int
         The year of census data to be accessed.
+    table_meta_data: DataFrame
+        Table metadata parsed from the ACS summary file templates (lazy).
+    table_catalog: TableCatalog
+        Searchable index of `table_meta_data` (lazy).
+    fips_df: DataFrame
+        All-geocodes sheet for `year` (lazy).
     state_fips: dict
         Dictionary with keys='state', values='FIP code'
         Example: {'Colorado':'08'}
     county_fips: dict
         Dictionary with keys=('state', 'county'), values='FIP code'
         Example: {('Colorado', 'Jefferson County', :'059'}
+    fips_resolver: FipsResolver
+        Batch resolver of free text state/county names to FIP codes (lazy).
+    web_api: API
+        API object used for downloads from census.gov (pooled session).
+    cache_dir: str
+        Directory of the parsed metadata cache for `year`.
 
     Methods
     -------
-    None
+    clear_cache()
+        Remove cached metadata files for `year`.
+    refresh()
+        Clear cached metadata so it is downloaded and parsed again on next
+        access.
     """
 
-    def __init__(self, year=2018, table_data_dir=None, fips_sheet=None):
-        """Initiate CensusAPI object for a given year"""
+    def __init__(
+        self,
+        year=2018,
+        table_data_dir=None,
+        fips_sheet=None,
+        session=None,
+        timeout=DEFAULT_TIMEOUT,
+        cache_dir=None,
+        refresh=False,
+        n_workers=None,
+    ):
+        """
+        Initiate CensusAPI object for a given year
 
-        self.year = int(year)
+        Metadata attributes (`table_meta_data`, `fips_df`, the FIPS dicts) are
+        computed lazily on first access. Parsed table metadata and FIPS sheets
+        are stored as parquet files in `cache_dir` (default
+        ~/.cache/api_wrapper/census/<year>) and loaded from there on later
+        constructions. Pass `refresh=True` or call `refresh()` to download and
+        parse them again.
 
-        if table_data_dir is None:
-            table_data_dir = self._parse_table_zip(
-                "https://www2.census.gov/programs-surveys/acs/summary_file/2018/data/2018_5yr_Summary_FileTemplates.zip?#",
-                "summary_table_metadata",
-            )
+        On a cold cache the summary file template workbooks are parsed on
+        `n_workers` processes (default: number of CPUs, 1 parses in process).
+        """
 
-        self.table_meta_data = self._parse_table_data(table_data_dir)
+        self.year = int(year)
+        self.web_api = API(
+            "https://www2.census.gov", session=session, timeout=timeout
+        )
+        self.cache_dir = cache_dir or os.path.join(
+            DEFAULT_CACHE_DIR, "census", str(self.year)
+        )
 
         if fips_sheet is None:
             fips_sheet = f"https://www2.census.gov/programs-surveys/popest/geographies/{year}/all-geocodes-v{year}.xlsx"
 
-        self.fips_df = self._parse_sheet(fips_sheet, header=4, dtype=str)
-        self.state_fips, self.county_fips = self._get_fips(f"{self.year}")
+        self.n_workers = n_workers
+        self.table_data_dir = table_data_dir
+        self.fips_sheet = fips_sheet
+        self._lazy_lock = threading.RLock()
+
+        if refresh:
+            self.clear_cache()
+
+    @lazy_property
+    def paths(self):
+        """Project Paths, only needed to find the geo_hierarchies csv"""
 
-        self.state_names = {
-            fip: name for name, fip in self.state_fips.items() if not name.isnumeric()
+        from proj_paths.paths import Paths
+
+        return Paths(current_dir=os.path.dirname(__file__))
+
+    @lazy_property
+    def table_meta_data(self):
+        """Dataframe of table metadata parsed from summary file templates"""
+
+        return self._load_cached_df(
+            "table_meta_data",
+            self.table_data_dir,
+            lambda: self._parse_table_data(
+                self._get_table_data_dir(self.table_data_dir)
+            ),
+        )
+
+    @lazy_property
+    def fips_df(self):
+        """Dataframe of the all-geocodes sheet for self.year"""
+
+        return self._load_cached_df(
+            "fips_df",
+            self.fips_sheet,
+            lambda: self._parse_sheet(self.fips_sheet, header=4, dtype=str),
+        )
+
+    @lazy_property
+    def state_fips(self):
+        """Dictionary with keys='state', values='FIP code'"""
+
+        return self._get_state_fips_dict(self.fips_df)
+
+    @lazy_property
+    def county_fips(self):
+        """Dictionary with keys=('state', 'county'), values='FIP code'"""
+
+        return self._get_county_fips_dict(self.fips_df)
+
+    @lazy_property
+    def state_names(self):
+        """Dictionary with keys='FIP code', values='state'"""
+
+        return {
+            fip: name
+            for name, fip in self.state_fips.items()
+            if not name.isnumeric()
         }
+
+    @lazy_property
+    def county_names(self):
+        """Dictionary with keys='state FIP + county FIP', values='county'"""
+
         # TODO remove state fip in name tuple self.county_fips dict
-        self.county_names = {
+        return {
             f"{name[0]}{fip}": name[1]
             for name, fip in self.county_fips.items()
             if not name[1].isnumeric()
         }
 
-        self.paths = Paths(current_dir=os.path.dirname(__file__))
+    @lazy_property
+    def fips_resolver(self):
+        """FipsResolver of free text state/county names built on fips_df"""
+
+        return FipsResolver(self.fips_df)
+
+    @lazy_property
+    def table_catalog(self):
+        """Searchable TableCatalog of table_meta_data, persisted next to it"""
+
+        cache_file = self._get_cache_file(
+            "table_catalog", self.table_data_dir, ".pickle"
+        )
+
+        if os.path.isfile(cache_file):
+            return TableCatalog.load(cache_file)
+
+        table_catalog = TableCatalog.from_table_meta_data(self.table_meta_data)
+        atomic_write(cache_file, table_catalog.save)
+
+        return table_catalog
+
+    def _get_state_county_fips(self, state_fip):
+        """Return sorted county FIP codes of a state"""
+
+        return sorted(
+            fip
+            for key, fip in self.county_fips.items()
+            if isinstance(key, tuple) and key[0] == state_fip
+        )
+
+    def refresh(self):
+        """Clear cached metadata, it is downloaded and parsed on next access"""
+
+        self.clear_cache()
+
+        with self._lazy_lock:
+            for name in lazy_property.names(type(self)):
+                self.__dict__.pop(name, None)
+
+    def clear_cache(self):
+        """Remove cached metadata files for self.year"""
+
+        if os.path.isdir(self.cache_dir):
+            for file in os.listdir(self.cache_dir):
+                if file.endswith((".parquet", ".pickle", ".json")):
+                    os.remove(os.path.join(self.cache_dir, file))
+
+    def _load_cached_df(self, name, source, parse_func):
+        """Return dataframe `name` from the parquet cache or `parse_func()`"""
+
+        cache_file = self._get_cache_file(name, source)
+
+        if os.path.isfile(cache_file):
+            return pd.read_parquet(cache_file)
+
+        df = parse_func()
+        atomic_write(cache_file, df.to_parquet)
+
+        return df
+
+    def _get_cache_file(self, name, source, ext=".parquet"):
+        """Return cache filepath of `name`, other sources get their own file"""
+
+        if source is not None and not str(source).startswith(
+            "https://www2.census.gov"
+        ):
+            source_hash = hashlib.sha1(str(source).encode()).hexdigest()[:10]
+            name = f"{name}_{source_hash}"
+
+        return os.path.join(self.cache_dir, f"{name}{ext}")
+
+    def _get_table_data_dir(self, table_data_dir):
+        """Return `table_data_dir` or download the summary file templates"""
+
+        if table_data_dir is None:
+            table_data_dir = self._parse_table_zip(
+                "https://www2.census.gov/programs-surveys/acs/summary_file/"
+                "2018/data/2018_5yr_Summary_FileTemplates.zip?#",
+                "summary_table_metadata",
+            )
+
+        return table_data_dir
 
     def _parse_table_data(self, table_metadata_dir):
-        """Get dataframe for table metadata"""
+        """
+        Get dataframe for table metadata
+
+        seq*.xlsx workbooks are parsed on a pool of `self.n_workers` processes.
+        Each worker returns (table_id, labels) records that are collected into
+        a single dataframe, instead of building one dataframe per workbook.
+        """
 
         seq_files = [
             os.path.join(table_metadata_dir, file)
             for file in os.listdir(table_metadata_dir)
             if file.endswith(".xlsx") and "seq" in file
         ]
-        seq_df_lst = [self._parse_seq_excel(file) for file in seq_files]
 
-        table_metadata_df = pd.concat(seq_df_lst, axis=0)
+        if self.n_workers == 1:
+            seq_records = map(_parse_seq_excel, seq_files)
+
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+                seq_records = list(
+                    executor.map(_parse_seq_excel, seq_files, chunksize=4)
+                )
+
+        table_ids, table_labels = zip(*chain.from_iterable(seq_records))
+
+        table_metadata_df = pd.DataFrame(
+            list(table_labels), index=list(table_ids)
+        )
         table_metadata_df.columns = ["overall_category"] + [
             f"subtitle_{n}" for n in range(8)
         ]
         return table_metadata_df
 
-    def _parse_seq_excel(self, seq_excel_file):
-        """Parse seq.xlsx files"""
-
-        df = pd.read_excel(seq_excel_file)
-        df = df.drop(df.columns[:6], axis=1)
-
-        df = df.T
-        df.columns = ["table_data"]
-
-        df["table_data"] = df.table_data.str.split("%")
-        df = pd.DataFrame(df["table_data"].to_list(), index=df.index)
-
-        return df
-
     def _parse_table_zip(self, table_data, dirname):
         """Get local directory from zip file url"""
 
-        r = requests.get(table_data, stream=True)
+        r = self.web_api.get_response(table_data, stream=True)
+        r.raise_for_status()
 
         with zipfile.ZipFile(io.BytesIO(r.content)) as summary_zip:
             temp_directory = f"/tmp/{dirname}"
@@ -121,13 +383,21 @@ class CensusAPI(object):
         return temp_directory
 
     def _parse_sheet(self, sheet, **kwargs):
-        """Get dataframe from sheet file (.xlsx, .csv)"""
+        """Get dataframe from sheet file or url (.xlsx, .csv)"""
+
+        if sheet.startswith(("http://", "https://")):
+            r = self.web_api.get_response(sheet)
+            r.raise_for_status()
+            sheet_data = io.BytesIO(r.content)
+
+        else:
+            sheet_data = sheet
 
         if sheet.endswith(".xlsx"):
-            df = pd.read_excel(sheet, **kwargs)
+            df = pd.read_excel(sheet_data, **kwargs)
 
         if sheet.endswith("csv"):
-            df = pd.read_csv(sheet, **kwargs)
+            df = pd.read_csv(sheet_data, **kwargs)
 
         return df
 
@@ -187,6 +457,10 @@ class CensusDataAPI(CensusAPI):
     to get useful information. See the underlying API docs for details:
     https://jtleider.github.io/censusdata/
 
+    By default data is requested from the Census Data API json endpoints
+    directly over the pooled session (`native=True`), pass `native=False` to
+    download through `censusdata.download` instead.
+
     Attributes
     ----------
     year: int
@@ -196,18 +470,50 @@ class CensusDataAPI(CensusAPI):
         Ex: 'acs5', 'acs3', acs1', 'acsse', 'sf1'
     tables_dict: dict
         Dictionary of str representions of census tables
+    table_variables: dict
+        Variable definitions of base table ids from `censusdata.censustable`,
+        persisted in the metadata cache per survey and year (lazy).
+    data_api: API
+        API object for https://api.census.gov/data used by the native client.
+    native: bool
+        Whether data is requested by the native client or `censusdata`.
 
     Methods
     ---------
     get_data(tables, state, level)
         method description
+    prefetch_tables(tables, max_workers=8)
+        Fetch and persist variable definitions of `tables` not cached yet.
     """
 
-    def __init__(self, survey="acs5", year=2018):
-        """Initiate CensusDataAPI object for a specific `survey` and `year`"""
+    def __init__(
+        self,
+        survey="acs5",
+        year=2018,
+        prefetch=None,
+        native=True,
+        key=None,
+        **kwargs,
+    ):
+        """
+        Initiate CensusDataAPI object for a specific `survey` and `year`
+
+        Table variable definitions are cached on disk, pass a list of tables
+        as `prefetch` to warm the cache at construction. `key` is an optional
+        Census API key (default: $CENSUS_API_KEY).
+        """
 
-        super().__init__(year=year)
+        super().__init__(year=year, **kwargs)
         self.survey = survey
+        self.native = native
+        self.key = key or os.environ.get("CENSUS_API_KEY")
+        self._table_variables_lock = threading.Lock()
+
+        self.data_api = API(
+            "https://api.census.gov/data",
+            session=self.web_api.session,
+            timeout=self.web_api.timeout,
+        )
 
         self.tables_dict = {
             "pop": "B01003",
@@ -217,23 +523,127 @@ class CensusDataAPI(CensusAPI):
             "age": "B01001",
         }
 
+        if prefetch is not None:
+            self.prefetch_tables(prefetch)
+
+    @lazy_property
+    def table_variables(self):
+        """Variable definitions of base table ids loaded from the cache"""
+
+        cache_file = self._get_table_variables_file()
+
+        if os.path.isfile(cache_file):
+            with open(cache_file) as f:
+                return json.load(f)
+
+        return {}
+
+    def prefetch_tables(self, tables, max_workers=8):
+        """Fetch and persist variable definitions of `tables` not cached yet"""
+
+        base_table_ids = {
+            self.tables_dict.get(table_str, table_str)
+            for table_str in tables
+            if not isinstance(table_str, dict)
+        }
+        missing_table_ids = [
+            base_table_id
+            for base_table_id in base_table_ids
+            if base_table_id not in self.table_variables
+        ]
+
+        if not missing_table_ids:
+            return
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            variables = list(
+                executor.map(
+                    lambda base_table_id: censusdata.censustable(
+                        self.survey, self.year, base_table_id
+                    ),
+                    missing_table_ids,
+                )
+            )
+
+        self._update_table_variables(dict(zip(missing_table_ids, variables)))
+
+    def _get_table_variables(self, base_table_id):
+        """Return variable definitions of a base table id, fetched on a miss"""
+
+        if base_table_id not in self.table_variables:
+            variables = censusdata.censustable(
+                self.survey, self.year, base_table_id
+            )
+            self._update_table_variables({base_table_id: variables})
+
+        return self.table_variables[base_table_id]
+
+    def _update_table_variables(self, new_table_variables):
+        """Add variable definitions and persist them merged with the file"""
+
+        cache_file = self._get_table_variables_file()
+
+        with self._table_variables_lock:
+            self.table_variables.update(new_table_variables)
+
+            table_variables = {}
+            if os.path.isfile(cache_file):
+                with open(cache_file) as f:
+                    table_variables = json.load(f)
+
+            table_variables.update(self.table_variables)
+
+            def write_json(filepath):
+                with open(filepath, "w") as f:
+                    json.dump(table_variables, f)
+
+            atomic_write(cache_file, write_json)
+
+    def _get_table_variables_file(self):
+        """Return the cache file of table variable definitions of the survey"""
+
+        return self._get_cache_file(
+            f"table_variables_{self.survey}", None, ".json"
+        )
+
+    @lazy_property
+    def hierarchies_dict(self):
+        """Geographical hierarchies dict, see `_get_hierarchies`"""
+
         hierarchies_csv = self.paths.data.search_files("geo_hierarchies")
 
-        self.hierarchies_dict = self._get_hierarchies(hierarchies_csv)
+        return self._get_hierarchies(hierarchies_csv)
 
-    def get_data(self, tables=None, **kwargs):
+    def get_data(self, tables=None, max_workers=8, labels="row", **kwargs):
         """
         Get data from survey and year of class for given tables and geoids
-        
-        Access census data for given year and survey from class. Only data for 
+
+        Access census data for given year and survey from class. Only data for
         given state and level.
-        TODO may need to download less data if block level gets too unwieldy.
-        
+
+        Requests are sharded into chunks of at most 49 variables (the API's
+        per-request limit) and, for tract, block group and block levels across
+        all counties of a state, into one request per county. Shards are
+        downloaded on `max_workers` threads and joined as they complete.
+
         Parameters
         ----------
         tables : list
-            List of tables to be requested. Some string representations are supported.
-        
+            List of tables to be requested. Some string representations are
+            supported,
+            as are base table ids (i.e. from `self.table_catalog.search`).
+        max_workers : int
+            Maximum number of shards downloaded concurrently.
+        labels : str
+            Where table labels go:
+            'row' - a "table_labels" first row (object dtype columns).
+            'columns' - a (table_id, table_label) column MultiIndex.
+            'attrs' - a {table_id: table_label} dict in
+            `df.attrs["table_labels"]`.
+            With 'columns' and 'attrs' estimates and MOEs are downcast numeric
+            columns, annotation values (i.e. -666666666) are NaN and geo_names
+            is categorical, see `_compact_df`.
+
         Returns
         ---------
         df : DataFrame
@@ -243,11 +653,146 @@ class CensusDataAPI(CensusAPI):
         table_label_dict = self._get_table_label_dict(tables)
         table_ids = list(table_label_dict.keys())
 
-        df = self._get_acs_dfs(table_ids, **kwargs)
-        df = self._add_table_labels_row(df, table_label_dict)
+        df = self._get_sharded_acs_dfs(table_ids, max_workers, **kwargs)
+
+        if labels == "row":
+            return self._add_table_labels_row(df, table_label_dict)
+
+        df = self._compact_df(df, table_ids)
+
+        if labels == "columns":
+            df.columns = pd.MultiIndex.from_tuples(
+                [(col, table_label_dict.get(col, "")) for col in df.columns],
+                names=["table_id", "table_label"],
+            )
+
+        elif labels == "attrs":
+            df.attrs["table_labels"] = table_label_dict
+
+        else:
+            raise ValueError(
+                f"labels must be 'row', 'columns' or 'attrs', not {labels!r}"
+            )
 
         return df
 
+    def _compact_df(self, df, table_ids):
+        """
+        Return `df` with numeric table columns downcast and annotations as NaN
+
+        Census annotation values (`ANNOTATION_VALUES`) become NaN. Integer
+        columns become the smallest nullable integer dtype, others the smallest
+        float dtype that holds them. geo_names becomes categorical.
+        """
+
+        compact_columns = {}
+        for col in table_ids:
+            values = pd.to_numeric(df[col], errors="coerce")
+            values = values.mask(values.isin(ANNOTATION_VALUES))
+
+            non_null = values.dropna()
+            if len(non_null) and (non_null % 1 == 0).all():
+                int_dtype = pd.to_numeric(
+                    non_null.astype("int64"), downcast="integer"
+                ).dtype
+                values = values.astype(int_dtype.name.capitalize())
+            else:
+                values = pd.to_numeric(values, downcast="float")
+
+            compact_columns[col] = values
+
+        df = df.assign(**compact_columns)
+
+        if "geo_names" in df.columns:
+            df["geo_names"] = df["geo_names"].astype("category")
+
+        return df
+
+    def _get_sharded_acs_dfs(self, tables, max_workers, **kwargs):
+        """Get American Community Survey data in geography/variable shards"""
+
+        geo_shards = self._get_geo_shards(kwargs)
+        var_chunks = [
+            tables[start:start + MAX_REQUEST_VARIABLES]
+            for start in range(0, len(tables), MAX_REQUEST_VARIABLES)
+        ]
+
+        chunk_dfs = [[None] * len(var_chunks) for _ in geo_shards]
+        geo_dfs = [None] * len(geo_shards)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._get_acs_dfs, var_chunk, **geo_shard): (
+                    geo_n,
+                    var_n,
+                )
+                for geo_n, geo_shard in enumerate(geo_shards)
+                for var_n, var_chunk in enumerate(var_chunks)
+            }
+
+            for future in as_completed(futures):
+                geo_n, var_n = futures[future]
+                chunk_dfs[geo_n][var_n] = future.result()
+
+                # join the variable chunks of a geography as soon as all arrive
+                if all(chunk_df is not None for chunk_df in chunk_dfs[geo_n]):
+                    geo_dfs[geo_n] = self._join_var_chunks(
+                        chunk_dfs[geo_n], var_chunks
+                    )
+                    chunk_dfs[geo_n] = None
+
+        if len(geo_dfs) == 1:
+            return geo_dfs[0]
+
+        df = pd.concat(geo_dfs, axis=0)
+
+        for col in GEO_LEVEL_COLUMNS_ORDER:
+            if col in df.columns:
+                df[col] = df[col].astype("category")
+
+        return df
+
+    def _join_var_chunks(self, chunk_dfs, var_chunks):
+        """Join dataframes of one geography downloaded in variable chunks"""
+
+        if len(chunk_dfs) == 1:
+            return chunk_dfs[0]
+
+        var_dfs = [
+            chunk_df[var_chunk]
+            for chunk_df, var_chunk in zip(chunk_dfs[1:], var_chunks[1:])
+        ]
+
+        return pd.concat([chunk_dfs[0]] + var_dfs, axis=1)
+
+    def _get_geo_shards(self, kwargs):
+        """
+        Split hierarchy kwargs into one kwargs dict per county for levels below
+        county requested for every county (county='*') of a single state
+        """
+
+        levels = set(kwargs) - {"state", "county"}
+        is_all_counties = (
+            kwargs.get("county") == "*" and kwargs.get("state", "*") != "*"
+        )
+
+        if not (is_all_counties and levels.intersection(SHARDED_LEVELS)):
+            return [kwargs]
+
+        state_fip = self._resolve_state_fip(kwargs["state"])
+        county_fips = self._get_state_county_fips(state_fip)
+
+        if not county_fips:
+            raise ValueError(
+                f"No counties found for state {kwargs['state']!r} "
+                f"in {self.year}"
+            )
+
+        return [
+            dict(kwargs, state=state_fip, county=county_fip)
+            for county_fip in county_fips
+        ]
+
     def _get_table_label_dict(self, tables):
         """Get dictionary of table_ids and table_labels from `tables` input"""
 
@@ -264,7 +809,7 @@ class CensusDataAPI(CensusAPI):
         table_labels_row = pd.DataFrame.from_dict(
             table_label_dict, orient="index", columns=["table_labels"]
         ).T
-        df = table_labels_row.append(df)
+        df = pd.concat([table_labels_row, df])
 
         return df
 
@@ -286,9 +831,9 @@ class CensusDataAPI(CensusAPI):
         if isinstance(table_str, dict):
             return table_str
 
-        base_table_id = self.tables_dict[table_str]
+        base_table_id = self.tables_dict.get(table_str, table_str)
 
-        tables_dict = censusdata.censustable(self.survey, self.year, base_table_id)
+        tables_dict = self._get_table_variables(base_table_id)
 
         final_table_dict = {}
         for table_id, table_dict in tables_dict.items():
@@ -308,6 +853,9 @@ class CensusDataAPI(CensusAPI):
 
         hierarchy = self._parse_hierarchy(kwargs)
 
+        if self.native:
+            return self._get_native_acs_df(tables, hierarchy)
+
         df = censusdata.download(
             self.survey, self.year, censusdata.censusgeo(hierarchy), tables,
         )
@@ -316,19 +864,111 @@ class CensusDataAPI(CensusAPI):
 
         return df
 
+    def _get_native_acs_df(self, tables, hierarchy):
+        """Get data from the Census Data API json endpoint for `hierarchy`"""
+
+        request_str = self.data_api.get_request_str(
+            self._get_data_options(tables, hierarchy)
+        )
+
+        response = self.data_api.get_response(request_str)
+        response.raise_for_status()
+
+        # 204 No Content: no geographies match the request
+        if response.status_code == 204:
+            return pd.DataFrame(columns=list(tables))
+
+        return self._parse_data_json(response.json(), tables)
+
+    def _get_data_options(self, tables, hierarchy):
+        """Return API.get_request_str options of a Census Data API request"""
+
+        (for_level, for_fip), in_hierarchy = hierarchy[-1], hierarchy[:-1]
+
+        options = {
+            f"/{self.year}/{self._get_survey_path()}": None,
+            "?get": ",".join(["NAME"] + list(tables)),
+            "&for": f"{for_level}:{for_fip}".replace(" ", "%20"),
+        }
+
+        if in_hierarchy:
+            options["&in"] = "%20".join(
+                f"{level}:{fip}".replace(" ", "%20")
+                for level, fip in in_hierarchy
+            )
+
+        if self.key is not None:
+            options["&key"] = self.key
+
+        return options
+
+    def _get_survey_path(self):
+        """Return endpoint path of self.survey (i.e. 'acs/acs5', 'dec/sf1')"""
+
+        if self.survey.startswith("acs"):
+            return f"acs/{self.survey}"
+
+        if self.survey.startswith("sf"):
+            return f"dec/{self.survey}"
+
+        return self.survey
+
+    def _parse_data_json(self, data_json, tables):
+        """
+        Parse a Census Data API json table into numeric columns indexed by
+        GEOID
+
+        Every column that is neither NAME nor a requested variable is a
+        geography level, in hierarchy order.
+        """
+
+        header, rows = data_json[0], data_json[1:]
+        raw_df = pd.DataFrame(rows, columns=header)
+
+        df = pd.DataFrame(
+            {
+                table: pd.to_numeric(raw_df[table], errors="coerce")
+                for table in tables
+            }
+        )
+
+        geo_levels = [
+            col for col in header if col != "NAME" and col not in tables
+        ]
+
+        return self._add_geo_columns(df, raw_df[geo_levels], raw_df["NAME"])
+
+    def _resolve_state_fip(self, state):
+        """Return the FIP code of a state name, abbreviation or FIP code"""
+
+        if state.isdigit():
+            return state
+
+        resolved = self.fips_resolver.resolve([state]).iloc[0]
+        if resolved["state_match"] == "unmatched":
+            logger.warning("Didn't match %s", state)
+            return state
+
+        return resolved["state_fip"]
+
     def _parse_hierarchy(self, kwargs):
         """Parse **kwargs (i.e. state='Colorado', county='Jefferson County')
         into [('state', '08'), ('county', '059')]"""
 
-        if re.fullmatch(r"[A-Za-z]+", kwargs.get("state", "")):
-            kwargs["state"] = self.state_fips[kwargs["state"]]
-        elif "state" in kwargs and kwargs.get("state", "") != "*":
-            print(f"Didn't match {kwargs['state']}")
+        state = kwargs.get("state", "*")
+        county = kwargs.get("county", "*")
 
-        if re.fullmatch(r"[A-Za-z\s]+", kwargs.get("county", "")):
-            kwargs["county"] = self.county_fips[kwargs["state"], kwargs["county"]]
-        elif "county" in kwargs and kwargs.get("county", "") != "*":
-            print(f"Didn't match {kwargs['county']}")
+        if state != "*":
+            kwargs["state"] = self._resolve_state_fip(state)
+
+        if county != "*" and not county.isdigit():
+            resolved = self.fips_resolver.resolve(
+                [kwargs["state"]], [county]
+            ).iloc[0]
+            if resolved["county_match"] == "unmatched":
+                logger.warning("Didn't match %s", county)
+            else:
+                kwargs["county"] = resolved["county_fip"]
 
         for level_key, hierarchy_list in self.hierarchies_dict.items():
 
@@ -340,6 +980,9 @@ class CensusDataAPI(CensusAPI):
             if are_all_kwargs_in_list and is_hierachy_correct_length:
                 break
 
+        else:
+            raise ValueError(f"No geographic hierarchy matches {list(kwargs)}")
+
         hierarchy_fips = [(level, kwargs[level]) for level in hierarchy_list]
 
         hierarchy_fips = self._rename_levels(hierarchy_fips)
@@ -347,24 +990,48 @@ class CensusDataAPI(CensusAPI):
         return hierarchy_fips
 
     def _parse_geo_index(self, df):
-        """Convert index to GEOIDs and add geo_label column"""
+        """
+        Convert censusgeo index to GEOIDs, add geo_names and FIPS level columns
 
-        parsed_index_tuples = [self._parse_geo_single_index(index) for index in df.index]
+        The FIPS codes of every row are pulled out in one pass and the GEOID is
+        concatenated column-wise, see `_add_geo_columns`.
+        """
 
-        geo_ids, geo_names = list(zip(*parsed_index_tuples)) # unzip index tuples
+        geo_tuples = [geo_index.geo for geo_index in df.index]
+        geo_names = [geo_index.name for geo_index in df.index]
 
-        df['geo_names'] = geo_names
-        df.index = geo_ids
+        if not geo_tuples:
+            return df
 
-        return df
+        levels = [level for level, _ in geo_tuples[0]]
+        fips = np.array(geo_tuples, dtype=object)[:, :, 1]
+
+        geo_df = pd.DataFrame(fips, columns=levels)
+
+        return self._add_geo_columns(df, geo_df, geo_names)
 
-    def _parse_geo_single_index(self, geo_index):
-        """Parse GEOID and geometry names from a single index"""
-        
-        geo_label = geo_index.name
-        geo_code = ''.join([geo_tup[1] for geo_tup in geo_index.geo])
+    def _add_geo_columns(self, df, geo_df, geo_names):
+        """
+        Index `df` by GEOID built from the FIPS columns of `geo_df`
+
+        `geo_df` has one column per geographic level (state, county, tract,
+        block group...) in hierarchy order. The levels are added to `df` as
+        categorical columns and `geo_names` as the `geo_names` column.
+        """
 
-        return geo_code, geo_label
+        geo_df = geo_df.rename(columns=GEO_LEVEL_COLUMNS).astype(str)
+
+        geo_ids = geo_df.iloc[:, 0].str.cat(
+            [geo_df[col] for col in geo_df.columns[1:]]
+        )
+
+        df.index = pd.Index(geo_ids.to_numpy(), name="GEOID")
+        df["geo_names"] = list(geo_names)
+
+        for col in geo_df.columns:
+            df[col] = pd.Categorical(geo_df[col].to_numpy())
+
+        return df
 
     def _rename_levels(self, lst):
         """Rename levels in lst from (i.e. `census_tract` to `tract` for api call"""
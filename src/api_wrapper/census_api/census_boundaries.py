@@ -1,9 +1,173 @@
 from api_wrapper.census_api.census_api import CensusAPI
+from api_wrapper.cache import DEFAULT_CACHE_DIR, FileCache, atomic_write
+from api_wrapper.instrumentation import get_instrumentation
+from api_wrapper.geo_io import PARQUET_EXTENSIONS, write_gdf
 import geopandas as gpd
+import pandas as pd
 import os
-import requests
-import io
+import logging
+import shutil
+import tempfile
 import zipfile
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import ExitStack
+from functools import partial
+from itertools import islice
+
+logger = logging.getLogger(__name__)
+
+SHP_EXTENSIONS = (".shp", ".shx", ".dbf", ".prj", ".cpg")
+NATIONAL_LEVELS = ("county", "ttract")
+
+# level of detail: (simplification tolerance, coordinate grid size) in degrees
+LEVELS_OF_DETAIL = {
+    "high": (0.0001, 0.000001),
+    "medium": (0.001, 0.00001),
+    "low": (0.01, 0.0001),
+}
+
+
+def _read_layer(path, columns=None, bbox=None, mask=None, rows=None):
+    """
+    Read a boundary layer, filtering columns and features while reading.
+
+    `path` can be a shapefile inside a zip archive
+    (zip://archive.zip!layer.shp), a GeoParquet file or any other OGR file
+    (i.e. FlatGeobuf).
+    """
+
+    if path.lower().endswith(PARQUET_EXTENSIONS):
+        return _read_parquet_layer(path, columns, bbox, mask, rows)
+
+    read_kwargs = dict(columns=columns, bbox=bbox, mask=mask, rows=rows)
+    read_kwargs = {k: v for k, v in read_kwargs.items() if v is not None}
+
+    return gpd.read_file(path, **read_kwargs)
+
+
+def _read_parquet_layer(path, columns=None, bbox=None, mask=None, rows=None):
+    """
+    Read a GeoParquet boundary layer with the filters of `_read_layer`.
+
+    Files written by `write_gdf` are sorted spatially and keep their index,
+    rows are returned (and `rows` counted) in index order.
+    """
+
+    if columns is not None:
+        columns = list(columns) + ["geometry"]
+
+    if mask is not None:
+        bbox = (
+            tuple(mask.total_bounds)
+            if hasattr(mask, "total_bounds")
+            else mask.bounds
+        )
+
+    elif bbox is not None and hasattr(bbox, "total_bounds"):
+        bbox = tuple(bbox.total_bounds)
+
+    gdf = gpd.read_parquet(path, columns=columns, bbox=bbox)
+
+    if mask is not None:
+        mask_geom = mask.union_all() if hasattr(mask, "union_all") else mask
+        gdf = gdf[gdf.intersects(mask_geom)]
+
+    if not gdf.index.is_monotonic_increasing:
+        gdf = gdf.sort_index()
+
+    if isinstance(rows, int):
+        gdf = gdf.iloc[:rows]
+
+    elif rows is not None:
+        gdf = gdf.iloc[rows]
+
+    return gdf
+
+
+def _simplify_layer(gdf, lod):
+    """
+    Return `gdf` simplified to a level of detail of `LEVELS_OF_DETAIL`.
+
+    Polygons are simplified as a coverage, so edges shared by neighbouring
+    features stay shared (no gaps or overlaps), then coordinates are snapped
+    to the level's grid.
+    """
+
+    tolerance, grid_size = LEVELS_OF_DETAIL[lod]
+
+    gdf = gdf.copy()
+    if hasattr(gdf.geometry, "simplify_coverage"):
+        geometry = gdf.geometry.simplify_coverage(tolerance)
+    else:
+        geometry = gdf.geometry.simplify(tolerance, preserve_topology=True)
+
+    gdf.geometry = geometry.set_precision(grid_size)
+
+    return gdf
+
+
+def _load_layer(
+    path, cache_path=None, lod=None, lod_cache_path=None, read_kwargs=None
+):
+    """
+    Return the filtered layer at `path`, first converting it to GeoParquet at
+    `cache_path` when given. Module level so it can run in a process pool.
+
+    With `lod` the layer is simplified, see `_simplify_layer`. The whole
+    simplified layer is stored at `lod_cache_path` when given, otherwise only
+    the filtered features are simplified.
+
+    Cached layers are written by `write_gdf` in Hilbert order and row groups,
+    so `bbox` and `mask` reads skip row groups outside them.
+    """
+
+    read_kwargs = read_kwargs or {}
+    instrumentation = get_instrumentation()
+
+    if cache_path is not None:
+        with instrumentation.span("convert", path=cache_path):
+            write_gdf(_read_layer(path), cache_path)
+        path = cache_path
+
+    if lod is None:
+        return _read_layer(path, **read_kwargs).reset_index(drop=True)
+
+    if lod_cache_path is None:
+        gdf = _read_layer(path, **read_kwargs).reset_index(drop=True)
+        with instrumentation.span("simplify", lod=lod):
+            return _simplify_layer(gdf, lod)
+
+    with instrumentation.span("simplify", lod=lod):
+        write_gdf(_simplify_layer(_read_layer(path), lod), lod_cache_path)
+
+    return _read_layer(lod_cache_path, **read_kwargs).reset_index(drop=True)
+
+
+def _needs_processing(path, cache_path=None, lod=None, lod_cache_path=None):
+    """Return whether `_load_layer` does more than read a GeoParquet file"""
+
+    return (
+        cache_path is not None
+        or lod is not None
+        or not path.lower().endswith(PARQUET_EXTENSIONS)
+    )
+
+
+def _concat_layers(gdfs):
+    """Concatenate layers into one GeoDataFrame in the first layer's CRS"""
+
+    if len(gdfs) == 1:
+        return gdfs[0]
+
+    crs = gdfs[0].crs
+    gdfs = [gdf.to_crs(crs) if gdf.crs != crs else gdf for gdf in gdfs]
+
+    return gpd.GeoDataFrame(pd.concat(gdfs, ignore_index=True), crs=crs)
 
 
 class CensusBoundaries(CensusAPI):
@@ -19,21 +183,56 @@ class CensusBoundaries(CensusAPI):
     filepath_dict: str
         dictionary of file names and directories associated with the Tiger Line file structure.
         https://www.census.gov/geographies/mapping-files/time-series/geo/tiger-line-file.html
+    boundary_cache: FileCache
+        GeoParquet cache of downloaded layers keyed by (year, level, state_fip)
+        and of simplified layers keyed by (year, level, 'state_fip_lod').
+        None when caching is disabled.
 
     Methods
     ---------
-    get_boundaries_gdf(self, state, level)
+    get_boundaries_gdf(self, state, level, columns=None, bbox=None, mask=None,
+                       rows=None, lod=None, progress=None, max_workers=8,
+                       n_processes=None)
         Get a Geopandas GeoDataFrame of the requested boundary file.
-    download_shp(self, state_fip, level)
+    boundaries_to_file(self, filepath, state, level, compression="zstd",
+                       row_group_size=10000, **kwargs)
+        Write boundaries to a GeoParquet or FlatGeobuf file.
+    read_boundaries(self, filepath, columns=None, bbox=None, mask=None,
+                    rows=None)
+        Read boundaries written by `boundaries_to_file`.
+    download_shp(self, state_fip, level, local_path="/tmp/", progress=None)
         download shape files associated with a specific state's FIP code and level.
         The state_fip code is ignored if the level is 'county' or 'ttract'.
     """
 
-    def __init__(self, year=2018, **kwargs):
-        """Initiate CensusBoundaries object for a given year"""
+    def __init__(
+        self,
+        year=2018,
+        boundary_cache=True,
+        boundary_cache_dir=None,
+        max_boundary_cache_size=10 * 2**30,
+        **kwargs,
+    ):
+        """
+        Initiate CensusBoundaries object for a given year
+
+        Downloaded layers are converted to GeoParquet and kept in
+        `boundary_cache_dir` (default ~/.cache/api_wrapper/boundaries) up to
+        `max_boundary_cache_size` bytes. Pass `boundary_cache=False` to always
+        download.
+        """
 
         super().__init__(year=year, **kwargs)
 
+        if boundary_cache:
+            self.boundary_cache = FileCache(
+                boundary_cache_dir
+                or os.path.join(DEFAULT_CACHE_DIR, "boundaries"),
+                max_size=max_boundary_cache_size,
+            )
+        else:
+            self.boundary_cache = None
+
         self.base_url = f"https://www2.census.gov/geo/tiger/TIGER{self.year}/"
         self.filepath_dict = {
             "county": {
@@ -62,18 +261,65 @@ class CensusBoundaries(CensusAPI):
             },
         }
 
-    def get_boundaries_gdf(self, state, level):
+    def get_boundaries_gdf(
+        self,
+        state,
+        level,
+        columns=None,
+        bbox=None,
+        mask=None,
+        rows=None,
+        lod=None,
+        progress=None,
+        max_workers=8,
+        n_processes=None,
+    ):
         """
         Get a Geopandas GeoDataFrame of the requested boundary file.
 
+        The shapefile is read straight from the downloaded zip archive and
+        `columns`, `bbox`, `mask` and `rows` are applied while reading, so
+        unused attributes and features are never materialized. With the
+        boundary cache enabled the full layer is stored as GeoParquet on first
+        use and later calls read (and filter) the parquet file instead.
+
+        For several states, files are downloaded concurrently on `max_workers`
+        threads and each is parsed on a pool of `n_processes` processes as
+        soon as it arrives, then deleted. The layers are concatenated into one
+        GeoDataFrame.
+
         Parameters
         ----------
-        state: str
-            State as string capitalized Ex: 'Alabama', 'Colorado'.
+        state: str or list
+            State as string capitalized Ex: 'Alabama', 'Colorado', a list of
+            states or 'all'. Ignored for national levels ('county', 'ttract').
             TODO Allow more flexibility in user input
         level: str
             The level desired of the boundary shape file Ex: 'block', 'county', 'tract'
             TODO Allow more flexibility in user input
+        columns: list
+            Attribute columns to read Ex: ['GEOID']. Geometry is always read.
+        bbox: tuple or GeoDataFrame/GeoSeries
+            (minx, miny, maxx, maxy) in the layer's CRS, only intersecting
+            features are read.
+        mask: Geometry or GeoDataFrame/GeoSeries
+            Only features intersecting the mask are read. Can't be combined
+            with bbox.
+        rows: int or slice
+            Number of rows or slice of rows to read (per state).
+        lod: str
+            Level of detail of simplified geometries: 'high' (~10m), 'medium'
+            (~100m) or 'low' (~1km), see `LEVELS_OF_DETAIL`. None returns
+            full-resolution geometries. Simplified layers are cached next to
+            the source layer.
+        progress: callable
+            Called as progress(bytes_downloaded, total_bytes) while
+            downloading.
+            total_bytes is None when the server doesn't send a Content-Length.
+        max_workers: int
+            Maximum number of concurrent downloads.
+        n_processes: int
+            Number of processes parsing layers, defaults to the number of CPUs.
 
         Returns
         ---------
@@ -82,23 +328,187 @@ class CensusBoundaries(CensusAPI):
             shape files.
         """
 
-        state_fip = self.state_fips[state]
+        if lod is not None and lod not in LEVELS_OF_DETAIL:
+            raise ValueError(
+                f"lod must be one of {list(LEVELS_OF_DETAIL)}, not {lod!r}"
+            )
+
+        state_fips = self._get_state_fip_list(state, level)
+        read_kwargs = dict(columns=columns, bbox=bbox, mask=mask, rows=rows)
 
-        boundary_shp_files = self.download_shp(state_fip, level)
+        with get_instrumentation().span(
+            "parse", level=level, n_layers=len(state_fips)
+        ):
+            gdfs = self._load_layers(
+                state_fips,
+                level,
+                read_kwargs,
+                lod=lod,
+                progress=progress,
+                max_workers=max_workers,
+                n_processes=n_processes,
+            )
 
-        print("Converting to gdf...")
+        if self.boundary_cache is not None:
+            self.boundary_cache.evict()
 
-        i = 0
-        while i < len(boundary_shp_files):
-            shp_file = boundary_shp_files[i]
-            gdf = gpd.read_file(shp_file)
-            return gdf
+        return _concat_layers(gdfs)
 
-    def download_shp(self, state_fip, level):
+    def _load_layers(
+        self,
+        state_fips,
+        level,
+        read_kwargs,
+        lod=None,
+        progress=None,
+        max_workers=8,
+        n_processes=None,
+    ):
+        """
+        Return the filtered `level` layers of `state_fips`, see `_load_layer`.
+
+        Layers are fetched on `max_workers` threads and each one is parsed as
+        soon as it arrives: cached GeoParquet layers in this process, layers
+        left to parse, convert or simplify on a pool of `n_processes`
+        processes (in this process for a single state). Downloads are deleted
+        once parsed and no more than `max_workers + n_processes` layers are
+        fetched ahead, so disk use doesn't grow with the number of states.
+        """
+
+        load_layer = partial(_load_layer, read_kwargs=read_kwargs)
+        max_layers = max_workers + (n_processes or os.cpu_count() or 1)
+        states = iter(enumerate(state_fips))
+        gdfs = [None] * len(state_fips)
+        fetching, parsing = {}, {}
+
+        with ExitStack() as stack:
+            local_path = stack.enter_context(
+                tempfile.TemporaryDirectory(prefix="tiger_")
+            )
+            threads = stack.enter_context(
+                ThreadPoolExecutor(max_workers=max_workers)
+            )
+            processes = None
+
+            while True:
+                for n, state_fip in islice(
+                    states, max_layers - len(fetching) - len(parsing)
+                ):
+                    future = threads.submit(
+                        self._fetch_layer,
+                        state_fip,
+                        level,
+                        os.path.join(local_path, state_fip),
+                        progress,
+                        lod,
+                    )
+                    fetching[future] = n
+
+                if not (fetching or parsing):
+                    break
+
+                done, _ = wait(
+                    list(fetching) + list(parsing),
+                    return_when=FIRST_COMPLETED,
+                )
+
+                for future in done:
+                    if future in parsing:
+                        n = parsing.pop(future)
+                        gdfs[n] = future.result()
+
+                    else:
+                        n = fetching.pop(future)
+                        layer = future.result()
+
+                        if len(state_fips) > 1 and _needs_processing(*layer):
+                            # spans of the worker processes are not recorded
+                            if processes is None:
+                                processes = stack.enter_context(
+                                    ProcessPoolExecutor(
+                                        max_workers=n_processes
+                                    )
+                                )
+                            parsing[processes.submit(load_layer, *layer)] = n
+                            continue
+
+                        gdfs[n] = load_layer(*layer)
+
+                    shutil.rmtree(
+                        os.path.join(local_path, state_fips[n]),
+                        ignore_errors=True,
+                    )
+
+        return gdfs
+
+    def boundaries_to_file(
+        self,
+        filepath,
+        state,
+        level,
+        compression="zstd",
+        row_group_size=10000,
+        **kwargs,
+    ):
+        """
+        Write boundaries to a GeoParquet or FlatGeobuf file.
+
+        The format is chosen by extension (.parquet or .fgb). GeoParquet rows
+        are sorted along a Hilbert curve into compressed row groups, so bbox
+        reads with `read_boundaries` only touch the relevant row groups, see
+        `api_wrapper.geo_io.write_gdf`.
+
+        Parameters
+        ----------
+        filepath: str
+            Output filepath ending in .parquet/.geoparquet or .fgb.
+        state, level:
+            See `get_boundaries_gdf`.
+        compression: str
+            GeoParquet compression codec Ex: 'zstd', 'snappy', 'gzip', None.
+        row_group_size: int
+            Maximum number of features per GeoParquet row group.
+        kwargs:
+            Passed to `get_boundaries_gdf`, i.e. columns, bbox, lod.
+
+        Returns
+        ---------
+        filepath: str
+        """
+
+        gdf = self.get_boundaries_gdf(state, level, **kwargs)
+
+        with get_instrumentation().span("export", path=filepath):
+            return write_gdf(
+                gdf,
+                filepath,
+                compression=compression,
+                row_group_size=row_group_size,
+            )
+
+    def read_boundaries(
+        self, filepath, columns=None, bbox=None, mask=None, rows=None
+    ):
+        """
+        Read boundaries written by `boundaries_to_file` (or any GeoParquet or
+        OGR file), with the `columns`, `bbox`, `mask` and `rows` filters of
+        `get_boundaries_gdf` applied while reading.
+        """
+
+        return _read_layer(
+            filepath, columns=columns, bbox=bbox, mask=mask, rows=rows
+        )
+
+    def download_shp(
+        self, state_fip, level, local_path="/tmp/", progress=None
+    ):
         """
         Download shape files associated with a specific state's FIP code and level.
 
         The state_fip code is ignored if the level is 'county' or 'ttract'.
+        The zip file is streamed to `local_path`, only the shapefile members
+        are extracted (so memory use doesn't depend on the archive size) and
+        the zip file is deleted afterwards.
 
         Parameters
         ----------
@@ -108,6 +518,11 @@ class CensusBoundaries(CensusAPI):
         level: str
             The level desired of the boundary shape file Ex: 'block', 'county', 'tract'
             TODO Allow more flexibility in user input
+        local_path: str
+            Directory the shapefile members are extracted to.
+        progress: callable
+            Called as progress(bytes_downloaded, total_bytes) while
+            downloading.
 
         Returns
         ---------
@@ -116,11 +531,10 @@ class CensusBoundaries(CensusAPI):
         """
 
         file_path = self._get_filepath(state_fip, level)
-        local_path = "/tmp/"
 
-        zip_file = self._unzip_file(file_path, local_path)
-        print("Finding .shp files...")
-        shp_files = [file for file in zip_file.namelist() if file.endswith(".shp")]
+        members = self._unzip_file(file_path, local_path, progress=progress)
+        logger.debug("Finding .shp files")
+        shp_files = [file for file in members if file.endswith(".shp")]
 
         return [os.path.join(local_path, file) for file in shp_files]
 
@@ -132,18 +546,144 @@ class CensusBoundaries(CensusAPI):
 
         return os.path.join(self.base_url, directory, filepath)
 
-    def _unzip_file(self, file_path, local_path):
-        """Unzip a zipfile's contents to `local_path`"""
+    def _get_state_fip_list(self, state, level):
+        """Return state FIP codes of a state, list of states or 'all'"""
+
+        if level in NATIONAL_LEVELS:
+            return ["us"]
+
+        if isinstance(state, str) and state.lower() == "all":
+            return sorted(set(self.state_fips.values()))
+
+        if isinstance(state, str):
+            return [self.state_fips[state]]
+
+        return [self.state_fips[single_state] for single_state in state]
+
+    def _fetch_layer(
+        self, state_fip, level, local_path, progress=None, lod=None
+    ):
+        """
+        Return (layer_path, cache_path, lod, lod_cache_path) of a layer,
+        downloading it on a cache miss. See `_load_layer`.
+
+        cache_path is where the downloaded layer should be converted to, it is
+        None for cache hits and when caching is disabled. lod is None when no
+        simplification is left to do, lod_cache_path is where the simplified
+        layer should be stored.
+        """
+
+        if self.boundary_cache is None:
+            return (
+                self._download_layer(state_fip, level, local_path, progress),
+                None,
+                lod,
+                None,
+            )
+
+        instrumentation = get_instrumentation()
+
+        lod_cache_path = None
+        if lod is not None:
+            lod_key = (self.year, level, f"{state_fip}_{lod}")
+            cached_path = self.boundary_cache.get(lod_key)
+            instrumentation.cache("boundary_cache", cached_path is not None)
+
+            if cached_path is not None:
+                return cached_path, None, None, None
+
+            lod_cache_path = self.boundary_cache.get_path(lod_key)
+
+        key = (self.year, level, state_fip)
+        cached_path = self.boundary_cache.get(key)
+        instrumentation.cache("boundary_cache", cached_path is not None)
+
+        if cached_path is not None:
+            return cached_path, None, lod, lod_cache_path
+
+        zip_layer_path = self._download_layer(
+            state_fip, level, local_path, progress
+        )
+
+        return (
+            zip_layer_path,
+            self.boundary_cache.get_path(key),
+            lod,
+            lod_cache_path,
+        )
+
+    def _download_layer(self, state_fip, level, local_path, progress=None):
+        """Download the zip file of a level, return zip:// path of its shp"""
+
+        file_path = self._get_filepath(state_fip, level)
+
+        logger.info("Downloading %s", file_path)
+        zip_path = self._download_file(
+            file_path, local_path, progress=progress
+        )
+
+        with zipfile.ZipFile(zip_path) as z:
+            shp_file = next(
+                member for member in z.namelist() if member.endswith(".shp")
+            )
+
+        return f"zip://{zip_path}!{shp_file}"
+
+    def _download_file(self, url, local_path, progress=None, chunk_size=2**20):
+        """Stream `url` to a file in `local_path` and return its filepath"""
+
+        filepath = os.path.join(local_path, os.path.basename(url))
+
+        def write_chunks(tmp_path):
+            with self.web_api.get_response(url, stream=True) as r:
+                r.raise_for_status()
+
+                total_bytes = int(r.headers.get("Content-Length", 0)) or None
+                n_bytes = 0
+
+                with open(tmp_path, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                        n_bytes += len(chunk)
+
+                        if progress is not None:
+                            progress(n_bytes, total_bytes)
+
+        with get_instrumentation().span("download", url=url):
+            atomic_write(filepath, write_chunks)
+
+        return filepath
+
+    def _unzip_file(
+        self, file_path, local_path, progress=None, extensions=SHP_EXTENSIONS
+    ):
+        """
+        Download a zipfile and extract members ending with `extensions` to
+        `local_path`. The zipfile is deleted once its members are extracted.
+        """
+
+        logger.info("Downloading %s", file_path)
+        zip_path = self._download_file(
+            file_path, local_path, progress=progress
+        )
+
+        logger.info("Unzipping %s", zip_path)
+        try:
+            with get_instrumentation().span("unzip", path=zip_path):
+                with zipfile.ZipFile(zip_path) as z:
+                    members = [
+                        member
+                        for member in z.namelist()
+                        if member.lower().endswith(extensions)
+                    ]
+
+                    for member in members:
+                        z.extract(member, path=local_path)
 
-        url = file_path
-        print(f"Downloading {file_path}...")
-        r = requests.get(url)
-        print(f"To Zip file...")
-        z = zipfile.ZipFile(io.BytesIO(r.content))
-        print(f"Unzipping file...")
-        z.extractall(path=local_path)
+        finally:
+            os.remove(zip_path)
 
-        return z
+        return members
 
 
 if __name__ == "__main__":
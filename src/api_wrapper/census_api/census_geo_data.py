@@ -0,0 +1,235 @@
+from api_wrapper.census_api.census_api import CensusDataAPI
+from api_wrapper.census_api.census_boundaries import CensusBoundaries
+from api_wrapper.cache import DEFAULT_CACHE_DIR, FileCache
+from api_wrapper.instrumentation import get_instrumentation
+from api_wrapper.geo_io import write_gdf
+import geopandas as gpd
+import pandas as pd
+import os
+import json
+import hashlib
+
+# boundary level: (get_data geography kwargs, GEOID column of the TIGER layer)
+# ACS publishes no block level data, so blocks can't be joined
+GEO_DATA_LEVELS = {
+    "county": ({"county": "*"}, "GEOID"),
+    "tract": ({"county": "*", "census_tract": "*"}, "GEOID"),
+    "bg": ({"county": "*", "census_tract": "*", "block_group": "*"}, "GEOID"),
+}
+
+
+class CensusGeoDataAPI(CensusDataAPI):
+    """
+    API wrapper joining census data to TIGER boundaries by GEOID
+
+    Combines `CensusDataAPI.get_data` and `CensusBoundaries.get_boundaries_gdf`
+    into one GeoDataFrame. Estimates and geometries are joined on int64 GEOID
+    keys, and joined products are cached as GeoParquet so repeat requests are
+    read from disk.
+
+    Attributes
+    ----------
+    census_boundaries: CensusBoundaries
+        CensusBoundaries object for `year` sharing the pooled session.
+    geo_data_cache: FileCache
+        GeoParquet cache of joined products keyed by (year, survey, level,
+        request hash). None when caching is disabled.
+
+    Methods
+    ---------
+    get_geo_data(tables, state, level, columns=None, lod=None, max_workers=8,
+                 refresh=False)
+        Get a GeoDataFrame of `tables` joined to `level` boundaries of `state`.
+    """
+
+    def __init__(
+        self,
+        survey="acs5",
+        year=2018,
+        geo_data_cache=True,
+        geo_data_cache_dir=None,
+        max_geo_data_cache_size=2 * 2**30,
+        boundary_kwargs=None,
+        **kwargs,
+    ):
+        """
+        Initiate CensusGeoDataAPI object for a specific `survey` and `year`
+
+        Joined products are kept in `geo_data_cache_dir` (default
+        ~/.cache/api_wrapper/geo_data) up to `max_geo_data_cache_size` bytes.
+        `boundary_kwargs` are passed on to CensusBoundaries (i.e.
+        `boundary_cache_dir`), other kwargs to CensusDataAPI.
+        """
+
+        super().__init__(survey=survey, year=year, **kwargs)
+
+        self.census_boundaries = CensusBoundaries(
+            year,
+            session=self.web_api.session,
+            timeout=self.web_api.timeout,
+            cache_dir=self.cache_dir,
+            table_data_dir=self.table_data_dir,
+            fips_sheet=self.fips_sheet,
+            **(boundary_kwargs or {}),
+        )
+
+        if geo_data_cache:
+            self.geo_data_cache = FileCache(
+                geo_data_cache_dir
+                or os.path.join(DEFAULT_CACHE_DIR, "geo_data"),
+                max_size=max_geo_data_cache_size,
+            )
+        else:
+            self.geo_data_cache = None
+
+    def get_geo_data(
+        self,
+        tables,
+        state,
+        level,
+        columns=None,
+        lod=None,
+        max_workers=8,
+        refresh=False,
+    ):
+        """
+        Get a GeoDataFrame of `tables` joined to `level` boundaries of `state`.
+
+        Data is requested with `labels="attrs"` (compact numeric columns, table
+        labels in `gdf.attrs["table_labels"]`) and boundaries are read with
+        only the GEOID and `columns` attributes. Both sides are keyed by int64
+        GEOIDs
+        and joined on that index, only features with data are kept.
+
+        Parameters
+        ----------
+        tables : list
+            List of tables to be requested, see `CensusDataAPI.get_data`.
+        state : str or list
+            State name, FIP code, list of states or 'all'.
+        level : str
+            Boundary level: 'county', 'tract' or 'bg'.
+        columns : list
+            Extra boundary attribute columns Ex: ['ALAND', 'AWATER'].
+        lod : str
+            Level of detail of simplified geometries, see
+            `CensusBoundaries.get_boundaries_gdf`.
+        max_workers : int
+            Maximum number of concurrent data requests and downloads.
+        refresh : bool
+            Ignore and overwrite a cached product.
+
+        Returns
+        ---------
+        gdf : GeoDataFrame
+            Census data and boundary geometries indexed (and sorted) by
+            GEOID.
+        """
+
+        if level not in GEO_DATA_LEVELS:
+            raise ValueError(
+                f"level must be one of {list(GEO_DATA_LEVELS)}, not {level!r}"
+            )
+
+        table_label_dict = self._get_table_label_dict(tables)
+        state_fips = self._get_geo_data_state_fips(state)
+        key = self._get_geo_data_key(
+            level, state_fips, table_label_dict, columns, lod
+        )
+
+        if self.geo_data_cache is not None and not refresh:
+            cached_path = self.geo_data_cache.get(key)
+            get_instrumentation().cache(
+                "geo_data_cache", cached_path is not None
+            )
+
+            if cached_path is not None:
+                # cached products are stored in Hilbert order, see write_gdf
+                gdf = gpd.read_parquet(cached_path).sort_index()
+                gdf.attrs["table_labels"] = table_label_dict
+                return gdf
+
+        gdf = self._join_geo_data(
+            table_label_dict, state_fips, level, columns, lod, max_workers
+        )
+
+        if self.geo_data_cache is not None:
+            self.geo_data_cache.put(
+                key, lambda tmp_path: write_gdf(gdf, tmp_path)
+            )
+
+        return gdf
+
+    def _join_geo_data(
+        self, table_label_dict, state_fips, level, columns, lod, max_workers
+    ):
+        """Return boundaries of `state_fips` joined to data on int64 GEOIDs"""
+
+        geo_kwargs, geoid_col = GEO_DATA_LEVELS[level]
+        tables = [table_label_dict]
+
+        state_dfs = [
+            self.get_data(
+                tables,
+                max_workers=max_workers,
+                labels="attrs",
+                state=state_fip,
+                **geo_kwargs,
+            )
+            for state_fip in state_fips
+        ]
+        df = pd.concat(state_dfs)
+
+        # concatenating categoricals of different states gives objects
+        for col, dtype in state_dfs[0].dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype("category")
+
+        df.index = pd.Index(df.index.astype("int64"), name="geoid_key")
+
+        gdf = self.census_boundaries.get_boundaries_gdf(
+            state_fips,
+            level,
+            columns=[geoid_col] + list(columns or []),
+            lod=lod,
+            max_workers=max_workers,
+        )
+        gdf.index = pd.Index(gdf[geoid_col].astype("int64"), name="geoid_key")
+        gdf = gdf.rename(columns={geoid_col: "GEOID"})
+
+        gdf = gdf.join(df, how="inner").set_index("GEOID").sort_index()
+        gdf.attrs["table_labels"] = table_label_dict
+
+        return gdf
+
+    def _get_geo_data_state_fips(self, state):
+        """Return sorted state FIP codes of a state, list of states or 'all'"""
+
+        if isinstance(state, str) and state.lower() == "all":
+            return sorted(set(self.state_fips.values()))
+
+        states = [state] if isinstance(state, str) else list(state)
+        resolved = self.fips_resolver.resolve(states)
+
+        unmatched = resolved["state_match"] == "unmatched"
+        if unmatched.any():
+            unmatched_states = [s for s, u in zip(states, unmatched) if u]
+            raise ValueError(f"Didn't match states {unmatched_states}")
+
+        return sorted(set(resolved["state_fip"].astype(str)))
+
+    def _get_geo_data_key(
+        self, level, state_fips, table_label_dict, columns, lod
+    ):
+        """Return the geo_data_cache key of a request"""
+
+        request = [
+            self.native,
+            state_fips,
+            sorted(table_label_dict),
+            sorted(columns or []),
+            lod,
+        ]
+        digest = hashlib.sha256(json.dumps(request).encode()).hexdigest()[:16]
+
+        return (self.year, self.survey, level, digest)
@@ -0,0 +1,346 @@
+"""
+Batch resolver of free text state and county names to FIPS codes.
+
+Usage:
+
+    from api_wrapper.census_api.census_api import CensusAPI
+
+    census_api = CensusAPI(2018)
+    resolved = census_api.fips_resolver.resolve(
+        ['colorado', 'CO', 'Louisiana'],
+        ['Jefferson', 'jefferson county', 'Orleans'],
+    )
+    resolved[['state_fip', 'county_fip', 'state_match', 'county_match']]
+"""
+
+import difflib
+
+import numpy as np
+import pandas as pd
+
+STATE_ABBREVIATIONS = {
+    "AL": "Alabama",
+    "AK": "Alaska",
+    "AZ": "Arizona",
+    "AR": "Arkansas",
+    "CA": "California",
+    "CO": "Colorado",
+    "CT": "Connecticut",
+    "DE": "Delaware",
+    "DC": "District of Columbia",
+    "FL": "Florida",
+    "GA": "Georgia",
+    "HI": "Hawaii",
+    "ID": "Idaho",
+    "IL": "Illinois",
+    "IN": "Indiana",
+    "IA": "Iowa",
+    "KS": "Kansas",
+    "KY": "Kentucky",
+    "LA": "Louisiana",
+    "ME": "Maine",
+    "MD": "Maryland",
+    "MA": "Massachusetts",
+    "MI": "Michigan",
+    "MN": "Minnesota",
+    "MS": "Mississippi",
+    "MO": "Missouri",
+    "MT": "Montana",
+    "NE": "Nebraska",
+    "NV": "Nevada",
+    "NH": "New Hampshire",
+    "NJ": "New Jersey",
+    "NM": "New Mexico",
+    "NY": "New York",
+    "NC": "North Carolina",
+    "ND": "North Dakota",
+    "OH": "Ohio",
+    "OK": "Oklahoma",
+    "OR": "Oregon",
+    "PA": "Pennsylvania",
+    "RI": "Rhode Island",
+    "SC": "South Carolina",
+    "SD": "South Dakota",
+    "TN": "Tennessee",
+    "TX": "Texas",
+    "UT": "Utah",
+    "VT": "Vermont",
+    "VA": "Virginia",
+    "WA": "Washington",
+    "WV": "West Virginia",
+    "WI": "Wisconsin",
+    "WY": "Wyoming",
+    "PR": "Puerto Rico",
+}
+
+COUNTY_SUFFIX_RE = (
+    r"\s+(county|parish|borough|census area|city and borough|municipality"
+    r"|municipio)$"
+)
+
+NAME_COL = "Area Name (including legal/statistical area description)"
+STATE_COL = "State Code (FIPS)"
+COUNTY_COL = "County Code (FIPS)"
+
+
+def normalize_names(values):
+    """Casefold, drop punctuation and collapse whitespace of names"""
+
+    names = pd.Series(values, dtype=object).astype(str).str.casefold()
+    names = names.str.replace(r"[^\w\s]", " ", regex=True)
+    names = names.str.replace(r"\s+", " ", regex=True).str.strip()
+
+    return names.str.replace(r"^saint\s", "st ", regex=True)
+
+
+def normalize_county_names(values):
+    """`normalize_names` without County/Parish/Borough... suffixes"""
+
+    return normalize_names(values).str.replace(
+        COUNTY_SUFFIX_RE, "", regex=True
+    )
+
+
+class FipsResolver(object):
+    """
+    Vectorized state/county name to FIPS code resolver built on `fips_df`.
+
+    Inputs are factorized, so each distinct value is normalized and looked up
+    once and results are broadcast back with an array take. Matching is case
+    insensitive, accepts postal abbreviations and FIPS codes, and ignores
+    County/Parish/Borough style suffixes. Unmatched names can fall back to
+    fuzzy matching.
+
+    Attributes
+    ----------
+    state_names: dict
+        Dictionary with keys='state' or 'FIP code', values='FIP code'
+    county_names: dict
+        Dictionary with keys=('state FIP code', 'county' or 'FIP code'),
+        values='FIP code'
+    state_index: dict
+        Dictionary with keys=normalized state name, abbreviation or FIP code,
+        values='FIP code'
+    county_index: dict
+        Dictionary with keys=('state FIP code', normalized county name or FIP
+        code), values='FIP code'
+
+    Methods
+    ---------
+    resolve(states, counties=None, fuzzy=False, cutoff=0.85)
+        Return a DataFrame of FIPS codes and match diagnostics.
+    """
+
+    def __init__(self, fips_df):
+        """Initiate FipsResolver from a CensusAPI.fips_df all-geocodes frame"""
+
+        state_df = fips_df[fips_df["Summary Level"] == "040"]
+        county_df = fips_df[fips_df["Summary Level"] == "050"]
+
+        state_fips = {fip: fip for fip in state_df[STATE_COL]}
+        county_fips = {
+            (state, fip): fip
+            for state, fip in zip(county_df[STATE_COL], county_df[COUNTY_COL])
+        }
+
+        self.state_names = dict(
+            zip(state_df[NAME_COL], state_df[STATE_COL]), **state_fips
+        )
+        self.state_index = dict(
+            zip(normalize_names(state_df[NAME_COL]), state_df[STATE_COL])
+        )
+        self.state_index.update(state_fips)
+
+        for abbreviation, name in STATE_ABBREVIATIONS.items():
+            if name in self.state_names:
+                self.state_index[abbreviation.lower()] = self.state_names[name]
+
+        self.county_names = dict(
+            zip(
+                zip(county_df[STATE_COL], county_df[NAME_COL]),
+                county_df[COUNTY_COL],
+            )
+        )
+        self.county_names.update(county_fips)
+        self.county_index = dict(
+            zip(
+                zip(
+                    county_df[STATE_COL],
+                    normalize_county_names(county_df[NAME_COL]),
+                ),
+                county_df[COUNTY_COL],
+            )
+        )
+        self.county_index.update(county_fips)
+
+        self._county_choices = {}
+        for state_fip, county_name in self.county_index:
+            if not county_name.isdigit():
+                self._county_choices.setdefault(state_fip, []).append(
+                    county_name
+                )
+
+    def resolve(self, states, counties=None, fuzzy=False, cutoff=0.85):
+        """
+        Return a DataFrame of FIPS codes and match diagnostics.
+
+        Parameters
+        ----------
+        states: array-like
+            State names, postal abbreviations or FIP codes.
+        counties: array-like
+            County names or FIP codes aligned with `states`.
+        fuzzy: bool
+            Fall back to difflib fuzzy matching for unmatched names.
+        cutoff: float
+            Minimum fuzzy similarity ratio in [0, 1].
+
+        Returns
+        ---------
+        df: DataFrame
+            Categorical columns state_fip, state_match and, with `counties`,
+            county_fip, county_match and GEOID (state + county FIP). *_match is
+            one of 'exact', 'normalized', 'fuzzy' or 'unmatched'.
+        """
+
+        state_codes, state_uniques = pd.factorize(
+            np.asarray(states, dtype=object)
+        )
+        state_fips, state_match = self._resolve_states(
+            state_uniques, fuzzy, cutoff
+        )
+
+        df = pd.DataFrame(
+            {
+                "state_fip": self._take(state_fips, state_codes),
+                "state_match": self._take(
+                    state_match, state_codes, "unmatched"
+                ),
+            }
+        )
+
+        if counties is None:
+            return df
+
+        county_codes, county_uniques = pd.factorize(
+            np.asarray(counties, dtype=object)
+        )
+
+        # factorize (state, county) pairs as integers, -1 (missing) codes
+        # shift to 0
+        n_counties = len(county_uniques) + 1
+        pair_codes, pair_uniques = pd.factorize(
+            (state_codes.astype(np.int64) + 1) * n_counties + county_codes + 1
+        )
+        pair_states = pair_uniques // n_counties - 1
+        pair_counties = pair_uniques % n_counties - 1
+
+        county_fips, county_match = self._resolve_counties(
+            self._lookup(state_fips, pair_states),
+            self._lookup(
+                pd.Series(county_uniques, dtype=object), pair_counties
+            ),
+            fuzzy,
+            cutoff,
+        )
+        geoids = self._lookup(state_fips, pair_states) + county_fips
+
+        df["county_fip"] = self._take(county_fips, pair_codes)
+        df["county_match"] = self._take(county_match, pair_codes, "unmatched")
+        df["GEOID"] = self._take(geoids, pair_codes)
+
+        return df
+
+    def _resolve_states(self, uniques, fuzzy, cutoff):
+        """Return (state_fips, state_match) Series of unique states"""
+
+        uniques = pd.Series(uniques, dtype=object)
+
+        exact = uniques.map(self.state_names)
+        normalized = normalize_names(uniques).map(self.state_index)
+
+        fips, match = self._combine(exact, normalized)
+
+        if fuzzy:
+            choices = list(self.state_index)
+            for n in np.flatnonzero(fips.isna().to_numpy()):
+                name = normalize_names([uniques[n]])[0]
+                close = difflib.get_close_matches(
+                    name, choices, n=1, cutoff=cutoff
+                )
+                if close:
+                    fips[n] = self.state_index[close[0]]
+                    match[n] = "fuzzy"
+
+        return fips, match
+
+    def _resolve_counties(self, state_fips, counties, fuzzy, cutoff):
+        """Return (county_fips, county_match) of unique state/county pairs"""
+
+        exact = pd.Series(
+            [
+                self.county_names.get(pair)
+                for pair in zip(state_fips, counties)
+            ],
+            dtype=object,
+        )
+        normalized = pd.Series(
+            [
+                self.county_index.get(pair)
+                for pair in zip(state_fips, normalize_county_names(counties))
+            ],
+            dtype=object,
+        )
+
+        fips, match = self._combine(exact, normalized)
+
+        if fuzzy:
+            for n in np.flatnonzero(
+                (fips.isna() & counties.notna()).to_numpy()
+            ):
+                state_fip = state_fips[n]
+                name = normalize_county_names([counties[n]])[0]
+                close = difflib.get_close_matches(
+                    name,
+                    self._county_choices.get(state_fip, []),
+                    n=1,
+                    cutoff=cutoff,
+                )
+                if close:
+                    fips[n] = self.county_index[state_fip, close[0]]
+                    match[n] = "fuzzy"
+
+        return fips, match
+
+    def _combine(self, exact, normalized):
+        """Return (fips, match) of unique values, exact then normalized"""
+
+        fips = exact.where(exact.notna(), normalized).astype(object)
+        match = pd.Series(
+            np.where(
+                exact.notna(),
+                "exact",
+                np.where(normalized.notna(), "normalized", "unmatched"),
+            ),
+            dtype=object,
+        )
+
+        return fips, match
+
+    def _lookup(self, values, codes):
+        """Return `values` at `codes` as an object Series, code -1 is None"""
+
+        values = np.append(values.to_numpy(dtype=object), None)
+
+        return pd.Series(values[codes], dtype=object)
+
+    def _take(self, values, codes, missing=None):
+        """Broadcast a Series of unique values to the rows as a Categorical"""
+
+        # factorize codes missing inputs as -1, which takes the appended
+        # `missing`
+        value_codes, categories = pd.factorize(
+            np.append(values.to_numpy(dtype=object), missing)
+        )
+
+        return pd.Categorical.from_codes(value_codes[codes], categories)
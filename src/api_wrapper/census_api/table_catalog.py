@@ -0,0 +1,199 @@
+"""
+Searchable catalog of census tables built from CensusAPI.table_meta_data.
+
+Usage:
+
+    from api_wrapper.census_api.census_api import CensusDataAPI
+
+    census_data = CensusDataAPI()
+    catalog = census_data.table_catalog
+
+    table_ids = catalog.search('"median household income" white')
+    catalog.prefix('B1901')
+    catalog.browse('SEX BY AGE')
+
+    census_data.get_data(table_ids[:1], state='Colorado', county='*')
+"""
+
+import re
+import pickle
+from bisect import bisect_left
+from collections import defaultdict
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+PHRASE_RE = re.compile(r'"([^"]+)"')
+
+
+def _tokenize(text):
+    """Return lowercase alphanumeric tokens of `text`"""
+
+    return TOKEN_RE.findall(str(text).lower())
+
+
+class TableCatalog(object):
+    """
+    Inverted index over census table metadata.
+
+    Tables are indexed by their base table id (`B01001` for variables
+    `B01001_001`, `B01001_002`...) using the words of their overall category
+    and every subtitle, so results can be passed straight to
+    `CensusDataAPI.get_data`.
+
+    Attributes
+    ----------
+    titles: dict
+        Dictionary with keys='table id', values='overall category'
+        Example: {'B01001': 'SEX BY AGE'}
+    categories: dict
+        Dictionary with keys='overall category', values=list of table ids.
+
+    Methods
+    ---------
+    search(query, limit=None)
+        Return table ids matching every word and "quoted phrase" of `query`.
+    prefix(table_id_prefix)
+        Return table ids starting with `table_id_prefix`.
+    browse(category=None)
+        Return categories, or table ids of categories containing `category`.
+    save(filepath)
+        Pickle the catalog to `filepath`.
+    load(filepath)
+        Return a catalog pickled with `save`.
+    """
+
+    def __init__(self, titles, texts, index):
+        """Initiate TableCatalog from prebuilt titles, texts and index"""
+
+        self.titles = titles
+        self.texts = texts
+        self.index = index
+
+        self.categories = defaultdict(list)
+        for table_id, title in sorted(titles.items()):
+            self.categories[title].append(table_id)
+        self.categories = dict(self.categories)
+
+        self._sorted_ids = sorted(titles)
+
+    @classmethod
+    def from_table_meta_data(cls, table_meta_data):
+        """Build a catalog from `CensusAPI.table_meta_data`"""
+
+        titles = {}
+        words = defaultdict(list)
+
+        for var_id, row in zip(
+            table_meta_data.index, table_meta_data.itertuples(index=False)
+        ):
+            table_id = str(var_id).split("_")[0]
+            labels = [label for label in row if isinstance(label, str)]
+
+            if not labels:
+                continue
+
+            titles.setdefault(table_id, labels[0].strip())
+            words[table_id].extend(labels)
+
+        texts = {
+            table_id: " ".join(_tokenize(" ".join(labels)))
+            for table_id, labels in words.items()
+        }
+
+        index = defaultdict(set)
+        for table_id, text in texts.items():
+            for token in text.split():
+                index[token].add(table_id)
+            index[table_id.lower()].add(table_id)
+
+        index = {
+            token: frozenset(table_ids) for token, table_ids in index.items()
+        }
+
+        return cls(titles, texts, index)
+
+    def search(self, query, limit=None):
+        """
+        Return table ids matching every word and "quoted phrase" of `query`.
+
+        Tables whose overall category matches the query come first.
+        """
+
+        phrases = [
+            " ".join(_tokenize(phrase)) for phrase in PHRASE_RE.findall(query)
+        ]
+        tokens = _tokenize(query)
+
+        if not tokens:
+            return []
+
+        postings = sorted(
+            (self.index.get(token, frozenset()) for token in set(tokens)),
+            key=len,
+        )
+        table_ids = set(postings[0]).intersection(*postings[1:])
+
+        if phrases:
+            table_ids = {
+                table_id
+                for table_id in table_ids
+                if all(
+                    f" {phrase} " in f" {self.texts[table_id]} "
+                    for phrase in phrases
+                )
+            }
+
+        def rank(table_id):
+            title_tokens = set(_tokenize(self.titles[table_id]))
+            return (-len(title_tokens.intersection(tokens)), table_id)
+
+        table_ids = sorted(table_ids, key=rank)
+
+        return table_ids[:limit] if limit is not None else table_ids
+
+    def prefix(self, table_id_prefix):
+        """Return table ids starting with `table_id_prefix`"""
+
+        table_id_prefix = table_id_prefix.upper()
+        start = bisect_left(self._sorted_ids, table_id_prefix)
+
+        table_ids = []
+        for table_id in self._sorted_ids[start:]:
+            if not table_id.startswith(table_id_prefix):
+                break
+            table_ids.append(table_id)
+
+        return table_ids
+
+    def browse(self, category=None):
+        """Return categories, or table ids of categories matching `category`"""
+
+        if category is None:
+            return sorted(self.categories)
+
+        category = category.lower()
+
+        return [
+            table_id
+            for title, table_ids in sorted(self.categories.items())
+            if category in title.lower()
+            for table_id in table_ids
+        ]
+
+    def save(self, filepath):
+        """Pickle the catalog to `filepath`"""
+
+        with open(filepath, "wb") as f:
+            pickle.dump(
+                (self.titles, self.texts, self.index),
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+    @classmethod
+    def load(cls, filepath):
+        """Return a catalog pickled with `save`"""
+
+        with open(filepath, "rb") as f:
+            titles, texts, index = pickle.load(f)
+
+        return cls(titles, texts, index)
@@ -1,32 +1,62 @@
-import requests
 import dotenv
 import os
-from api_wrapper.base_api import API
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from api_wrapper.base_api import API, DEFAULT_TIMEOUT
+from api_wrapper.rate_limit import RateLimiter
+from api_wrapper.instrumentation import get_instrumentation
+from api_wrapper.geo_io import open_feature_writer, read_gdf, write_gdf
 import geopandas as gpd
 
+MAPBOX_ISOCHRONE_URL = "https://api.mapbox.com/isochrone/v1/mapbox"
+MAPBOX_ISOCHRONE_RATE = 300 / 60
+
 
 class GeoAPI(API):
     """
     A simple wrapper to interact with geocoding web apis
-    
+
     GeoAPI is a class built on top of the base API with geo features.
 
     Attributes
     ----------
     base_url : str
         The web API's base url.
-    
+
     Methods
     ---------
     request_to_geojson(request_str, filepath)
         Return geojson from request str. Respons json must use `features` key.
+    request_to_file(request_str, filepath, compression="zstd",
+                    row_group_size=10000)
+        Write features of a request to a GeoParquet or FlatGeobuf file.
+    requests_to_file(requests, filepath, max_workers=8, **writer_kwargs)
+        Stream features of many requests into one GeoJSONSeq or GeoParquet
+        file.
+    read_gdf(filepath, columns=None, bbox=None)
+        Read a GeoParquet, FlatGeobuf or GeoJSON file into a GeoDataFrame.
 
     """
 
-    def __init__(self, base_url):
+    def __init__(
+        self,
+        base_url,
+        session=None,
+        timeout=DEFAULT_TIMEOUT,
+        cache=None,
+        rate_limiter=None,
+        instrumentation=None,
+    ):
         """Initiate GeoAPI instance with base_url of web api"""
 
-        super().__init__(base_url)
+        super().__init__(
+            base_url,
+            session=session,
+            timeout=timeout,
+            cache=cache,
+            rate_limiter=rate_limiter,
+            instrumentation=instrumentation,
+        )
 
     def request_to_geojson(self, request_str, filepath):
         """Return geojson from request str. Response json must use `features` key."""
@@ -37,17 +67,149 @@ class GeoAPI(API):
         gdf = gpd.GeoDataFrame.from_features(features)
         gdf.to_file(filepath, driver="GeoJSON")
 
+    def request_to_file(
+        self, request_str, filepath, compression="zstd", row_group_size=10000
+    ):
+        """
+        Write features of a request to a GeoParquet or FlatGeobuf file.
+
+        The format is chosen by extension (.parquet or .fgb), see
+        `api_wrapper.geo_io.write_gdf`. Both read back much faster than GeoJSON
+        and support bbox reads with `read_gdf`.
+        """
+
+        json = self.get_json(request_str)
+        features = json["features"]
+
+        gdf = gpd.GeoDataFrame.from_features(features, crs="EPSG:4326")
+
+        return write_gdf(
+            gdf,
+            filepath,
+            compression=compression,
+            row_group_size=row_group_size,
+        )
+
+    def requests_to_file(
+        self, requests, filepath, max_workers=8, **writer_kwargs
+    ):
+        """
+        Stream features of many requests into one GeoJSONSeq or GeoParquet
+        file.
+
+        Responses are requested concurrently and their features appended as
+        they arrive (see `api_wrapper.geo_io`), so memory stays flat however
+        many requests are written. A failed request does not abort the file.
+
+        Parameters
+        ----------
+        requests: iterable
+            Request strings or (request_str, properties) tuples, `properties`
+            is a dict added to every feature of the response.
+        filepath: str
+            Output filepath, the format is chosen by extension
+            (.geojsonl/.ndjson or .parquet).
+        max_workers: int
+            Maximum number of requests in flight.
+        writer_kwargs:
+            Passed to the writer, i.e. batch_size=5000, compression='snappy'.
+
+        Returns
+        ---------
+        failures: list
+            List of (request_str, error) of requests without features.
+        """
+
+        def get_features(request):
+            request_str, properties = (
+                (request, None) if isinstance(request, str) else request
+            )
+
+            try:
+                json = self.get_json(request_str)
+
+                if "features" not in json:
+                    raise ValueError(
+                        json.get("message", "No features in response")
+                    )
+
+            except Exception as error:
+                return request_str, properties, None, error
+
+            return request_str, properties, json["features"], None
+
+        failures = []
+
+        with open_feature_writer(filepath, **writer_kwargs) as writer:
+            for request_str, properties, features, error in iter_bounded(
+                get_features, requests, max_workers
+            ):
+                if error is not None:
+                    failures.append((request_str, error))
+                else:
+                    writer.write(features, properties)
+
+        return failures
+
+    @staticmethod
+    def read_gdf(filepath, columns=None, bbox=None):
+        """
+        Read a GeoParquet, FlatGeobuf or GeoJSON file into a GeoDataFrame.
+
+        With `bbox` (minx, miny, maxx, maxy) only intersecting features are
+        read, see `api_wrapper.geo_io.read_gdf`.
+        """
+
+        return read_gdf(filepath, columns=columns, bbox=bbox)
+
+
+def iter_bounded(func, items, max_workers=8):
+    """
+    Yield func(item) for every item in order, computed concurrently.
+
+    Unlike `ThreadPoolExecutor.map` items are consumed lazily and at most
+    2 * `max_workers` results are held at once, so streams of any length run
+    in constant memory.
+    """
+
+    window = deque()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for item in items:
+            if len(window) >= 2 * max_workers:
+                yield window.popleft().result()
+
+            window.append(executor.submit(func, item))
+
+        while window:
+            yield window.popleft().result()
+
+
+IsoResult = namedtuple("IsoResult", ["origin", "json", "error"])
+IsoResult.__doc__ = """Result of one origin of `MapboxAPI.iso_batch`
+
+`error` is None on success
+"""
+
 
 class MapboxAPI(object):
     """
     Wrapper for Mapbox API.
-    
+
     Attributes
     ----------
     iso_api : GeopAPI Instance
         GeoAPI Object with Mapbox's isochrone web api base_url
     access_token: str
         User's API key
+    iso_cache: IsochroneCache
+        Cache of isochrones served for nearby origins, see `api_wrapper.cache`.
+        None disables it.
+    rate_limiter: RateLimiter
+        Rate limiter of isochrone requests, see `api_wrapper.rate_limit`.
+    instrumentation: Instrumentation
+        Recorder of requests and isochrone cache hits, None reports to the
+        process wide one (see `api_wrapper.instrumentation`).
 
     Methods
     ---------
@@ -55,16 +217,53 @@ class MapboxAPI(object):
         Return request string for Mapbox isochrones
     get_iso_json(self, request_str):
         Return json from isochrone request string
+    get_iso(lng, lat, travel_type="driving",
+            contours_minutes=("10", "20", "30"), polygons="true")
+        Return isochrone json of an origin, from `iso_cache` when possible
     iso_to_geojson(filepath, lng, lat, travel_type="driving", contours_minutes=("10", "20", "30"), polygons="true")
         Return geojson from isochrone request kwargs
+    iso_batch(origins, max_workers=8, **defaults)
+        Return isochrone json for many origins, requested concurrently
+    iso_batch_to_file(origins, filepath, max_workers=8, **defaults)
+        Stream isochrones of many origins into one GeoJSONSeq/GeoParquet file
 
     """
 
-    def __init__(self, key):
-        """Initiate MapboxAPI object with API key"""
-
-        self.iso_api = GeoAPI("https://api.mapbox.com/isochrone/v1/mapbox")
+    def __init__(
+        self,
+        key,
+        session=None,
+        timeout=DEFAULT_TIMEOUT,
+        cache=None,
+        iso_cache=None,
+        rate_limit=MAPBOX_ISOCHRONE_RATE,
+        rate_limiter=None,
+        instrumentation=None,
+    ):
+        """
+        Initiate MapboxAPI object with API key
+
+        Isochrone requests are limited to `rate_limit` per second (Mapbox's
+        default quota is 300 per minute) and adapt to the quota Mapbox reports
+        in its X-Rate-Limit-* headers. Pass a shared `rate_limiter` to limit
+        several MapboxAPI objects together, or `rate_limit=None` to disable.
+        """
+
+        if rate_limiter is None and rate_limit:
+            rate_limiter = RateLimiter({MAPBOX_ISOCHRONE_URL: rate_limit})
+
+        self.rate_limiter = rate_limiter
+        self.instrumentation = instrumentation
+        self.iso_api = GeoAPI(
+            MAPBOX_ISOCHRONE_URL,
+            session=session,
+            timeout=timeout,
+            cache=cache,
+            rate_limiter=rate_limiter,
+            instrumentation=instrumentation,
+        )
         self.access_token = key
+        self.iso_cache = iso_cache
 
     def get_iso_request_str(
         self,
@@ -95,6 +294,48 @@ class MapboxAPI(object):
 
         return json
 
+    def get_iso(
+        self,
+        lng,
+        lat,
+        travel_type="driving",
+        contours_minutes=("10", "20", "30"),
+        polygons="true",
+    ):
+        """
+        Return isochrone json of an origin, from `iso_cache` when possible
+
+        With `iso_cache` the origin is snapped to the cache's grid and the
+        isochrone of a cached origin within its tolerance is returned instead
+        of a new request. Concurrent requests of nearby origins wait for each
+        other, so only one of them is sent.
+        """
+
+        if self.iso_cache is None:
+            request_str = self.get_iso_request_str(
+                lng, lat, travel_type, contours_minutes, polygons
+            )
+            return self.get_iso_json(request_str)
+
+        lng, lat = self.iso_cache.snap(lng, lat)
+        profile = f"{travel_type}/{','.join(contours_minutes)}/{polygons}"
+        instrumentation = self.instrumentation or get_instrumentation()
+
+        with self.iso_cache.lock(lng, lat, profile):
+            json = self.iso_cache.get(lng, lat, profile)
+            instrumentation.cache("isochrone_cache", json is not None)
+
+            if json is None:
+                request_str = self.get_iso_request_str(
+                    str(lng), str(lat), travel_type, contours_minutes, polygons
+                )
+                json = self.get_iso_json(request_str)
+
+                if "features" in json:
+                    self.iso_cache.set(lng, lat, profile, json)
+
+        return json
+
     def iso_to_geojson(
         self,
         filepath,
@@ -112,6 +353,159 @@ class MapboxAPI(object):
 
         self.iso_api.request_to_geojson(request_str, filepath)
 
+    def iso_batch(
+        self,
+        origins,
+        max_workers=8,
+        travel_type="driving",
+        contours_minutes=("10", "20", "30"),
+        polygons="true",
+    ):
+        """
+        Return isochrone json for many origins, requested concurrently.
+
+        A failed origin does not abort the batch, its `IsoResult.error` holds
+        the exception instead. Origins near already requested ones are served
+        from `iso_cache` when it is set. Size the session's pool to at least
+        `max_workers` (see `base_api.make_session`) so connections are reused.
+
+        Parameters
+        ----------
+        origins: iterable
+            (lng, lat) tuples or dicts with `lng`, `lat` and optionally
+            `travel_type`, `contours_minutes` and `polygons` keys.
+        max_workers: int
+            Maximum number of requests in flight.
+        travel_type, contours_minutes, polygons:
+            Defaults for origins that don't set their own.
+
+        Returns
+        ---------
+        results: list
+            List of IsoResult(origin, json, error) in the order of `origins`.
+        """
+
+        defaults = dict(
+            travel_type=travel_type,
+            contours_minutes=contours_minutes,
+            polygons=polygons,
+        )
+
+        results = list(self._iter_iso_results(origins, max_workers, defaults))
+
+        return results
+
+    def iso_batch_to_file(
+        self,
+        origins,
+        filepath,
+        max_workers=8,
+        travel_type="driving",
+        contours_minutes=("10", "20", "30"),
+        polygons="true",
+        **writer_kwargs,
+    ):
+        """
+        Stream isochrones of many origins into one GeoJSONSeq/GeoParquet file.
+
+        Isochrones are requested like `iso_batch` and their features appended
+        to `filepath` as they arrive (see `api_wrapper.geo_io`), so memory
+        stays flat for any number of origins. Every feature gets the source
+        attributes `origin_id` (position in `origins`), `origin_lng`,
+        `origin_lat` and `travel_type` next to Mapbox's `contour`.
+
+        Parameters
+        ----------
+        origins: iterable
+            (lng, lat) tuples or dicts, see `iso_batch`.
+        filepath: str
+            Output filepath, the format is chosen by extension
+            (.geojsonl/.ndjson or .parquet).
+        max_workers: int
+            Maximum number of requests in flight.
+        travel_type, contours_minutes, polygons:
+            Defaults for origins that don't set their own.
+        writer_kwargs:
+            Passed to the writer, i.e. batch_size=5000, compression='snappy'.
+
+        Returns
+        ---------
+        failures: list
+            List of IsoResult(origin, None, error) of failed origins.
+        """
+
+        defaults = dict(
+            travel_type=travel_type,
+            contours_minutes=contours_minutes,
+            polygons=polygons,
+        )
+
+        failures = []
+
+        with open_feature_writer(filepath, **writer_kwargs) as writer:
+            results = self._iter_iso_results(origins, max_workers, defaults)
+
+            for origin_id, result in enumerate(results):
+                if result.error is not None:
+                    failures.append(result)
+                    continue
+
+                iso_kwargs = self._parse_origin(result.origin, defaults)
+                properties = dict(
+                    origin_id=origin_id,
+                    origin_lng=float(iso_kwargs["lng"]),
+                    origin_lat=float(iso_kwargs["lat"]),
+                    travel_type=iso_kwargs["travel_type"],
+                )
+
+                writer.write(result.json["features"], properties)
+
+        return failures
+
+    def _iter_iso_results(self, origins, max_workers, defaults):
+        """Yield IsoResult of every origin in order, see `iter_bounded`"""
+
+        return iter_bounded(
+            lambda origin: self._get_iso_result(origin, defaults),
+            origins,
+            max_workers,
+        )
+
+    def _get_iso_result(self, origin, defaults):
+        """Return IsoResult for a single origin of `iso_batch`"""
+
+        try:
+            iso_kwargs = self._parse_origin(origin, defaults)
+            json = self.get_iso(**iso_kwargs)
+
+            if "features" not in json:
+                raise ValueError(
+                    json.get("message", "No features in response")
+                )
+
+        except Exception as error:
+            return IsoResult(origin, None, error)
+
+        return IsoResult(origin, json, None)
+
+    def _parse_origin(self, origin, defaults):
+        """Return get_iso_request_str kwargs from an origin tuple or dict"""
+
+        iso_kwargs = dict(defaults)
+
+        if isinstance(origin, dict):
+            iso_kwargs.update(origin)
+        else:
+            iso_kwargs["lng"], iso_kwargs["lat"] = origin
+
+        iso_kwargs["lng"] = str(iso_kwargs["lng"])
+        iso_kwargs["lat"] = str(iso_kwargs["lat"])
+        iso_kwargs["contours_minutes"] = [
+            str(minutes) for minutes in iso_kwargs["contours_minutes"]
+        ]
+
+        return iso_kwargs
+
 
 if __name__ == "__main__":
 
@@ -0,0 +1,531 @@
+"""
+Fast geo file formats: GeoDataFrame export/import, streaming feature writers.
+
+`write_gdf` / `read_gdf` store GeoDataFrames as GeoParquet (compressed, rows
+in Hilbert curve order with a bbox covering column) or FlatGeobuf (packed
+spatial index), so bbox reads only touch the relevant row groups or features.
+
+Streaming writers append GeoJSON features from many api responses to one file
+as they arrive, so memory stays flat however many responses are written:
+GeoJSONSeq writes one feature per line, GeoParquet buffers `batch_size`
+features and writes them as a row group.
+
+Usage:
+
+    from api_wrapper.geo_io import open_feature_writer, read_gdf, write_gdf
+
+    write_gdf(gdf, 'tracts.parquet', compression='zstd')
+    gdf = read_gdf('tracts.parquet', bbox=(-105.3, 39.6, -104.8, 39.9))
+
+    with open_feature_writer('isochrones.parquet') as writer:
+        for origin, json in responses:
+            writer.write(json['features'], properties={'origin_id': origin.id})
+"""
+
+import os
+import json
+import shutil
+import logging
+import tempfile
+from abc import ABC, abstractmethod
+
+import numpy as np
+import shapely
+import geopandas as gpd
+from shapely.geometry import shape
+
+from api_wrapper.cache import atomic_write
+
+logger = logging.getLogger(__name__)
+
+GEOJSONSEQ_EXTENSIONS = (
+    ".geojsonl",
+    ".geojsons",
+    ".geojsonseq",
+    ".jsonl",
+    ".ndjson",
+)
+PARQUET_EXTENSIONS = (".parquet", ".geoparquet")
+FLATGEOBUF_EXTENSIONS = (".fgb",)
+
+
+def write_gdf(
+    gdf, filepath, compression="zstd", row_group_size=10000, spatial_sort=True
+):
+    """
+    Write `gdf` to a GeoParquet or FlatGeobuf file chosen by its extension.
+
+    GeoParquet rows are sorted along a Hilbert curve and written in row groups
+    of `row_group_size` with a bbox covering column, so `read_gdf(bbox=...)`
+    skips row groups outside the bbox. FlatGeobuf files get a packed Hilbert
+    R-tree index (unless some geometries are missing, which the index can't
+    hold) and are not compressed. The file is written atomically.
+
+    Parameters
+    ----------
+    gdf: GeoDataFrame
+        Data to write, the index is kept.
+    filepath: str
+        Output filepath ending in .parquet/.geoparquet or .fgb.
+    compression: str
+        GeoParquet compression codec Ex: 'zstd', 'snappy', 'gzip', None.
+    row_group_size: int
+        Maximum number of rows per GeoParquet row group.
+    spatial_sort: bool
+        Sort GeoParquet rows in Hilbert curve order, False keeps the row order.
+
+    Returns
+    ---------
+    filepath: str
+    """
+
+    ext = os.path.splitext(filepath)[1].lower()
+
+    if ext in PARQUET_EXTENSIONS:
+        if spatial_sort:
+            gdf = _sort_spatially(gdf)
+
+        def write_func(tmp_path):
+            gdf.to_parquet(
+                tmp_path,
+                compression=compression,
+                row_group_size=row_group_size,
+                write_covering_bbox=True,
+            )
+
+    elif ext in FLATGEOBUF_EXTENSIONS:
+        spatial_index = "NO" if gdf.geometry.isna().any() else "YES"
+
+        if spatial_index == "NO":
+            logger.warning(
+                "Writing %s without spatial index, it has missing geometries",
+                filepath,
+            )
+
+        def write_func(tmp_path):
+            gdf.to_file(
+                tmp_path,
+                driver="FlatGeobuf",
+                engine="pyogrio",
+                SPATIAL_INDEX=spatial_index,
+            )
+
+    else:
+        raise ValueError(
+            f"Can't write {ext!r} files, use one of "
+            f"{PARQUET_EXTENSIONS + FLATGEOBUF_EXTENSIONS}"
+        )
+
+    return atomic_write(filepath, write_func)
+
+
+def read_gdf(filepath, columns=None, bbox=None):
+    """
+    Read a GeoParquet, FlatGeobuf (or any other OGR) file into a GeoDataFrame.
+
+    With `bbox` (minx, miny, maxx, maxy) only intersecting features are read,
+    using GeoParquet bbox covering statistics or the FlatGeobuf index.
+    `columns` limits the attribute columns read, geometry is always read.
+    """
+
+    ext = os.path.splitext(filepath)[1].lower()
+
+    if ext in PARQUET_EXTENSIONS:
+        if columns is not None:
+            columns = list(columns) + ["geometry"]
+
+        return gpd.read_parquet(filepath, columns=columns, bbox=bbox)
+
+    read_kwargs = dict(columns=columns, bbox=bbox)
+    read_kwargs = {k: v for k, v in read_kwargs.items() if v is not None}
+
+    return gpd.read_file(filepath, **read_kwargs)
+
+
+def open_feature_writer(filepath, **kwargs):
+    """
+    Return a feature writer for `filepath` chosen by its extension.
+
+    GeoJSONSeq for .geojsonl/.geojsons/.geojsonseq/.jsonl/.ndjson and
+    GeoParquet for .parquet/.geoparquet. kwargs go to the writer.
+    FlatGeobuf can't be appended to, write GeoParquet and convert instead.
+    """
+
+    ext = os.path.splitext(filepath)[1].lower()
+
+    if ext in GEOJSONSEQ_EXTENSIONS:
+        return GeoJSONSeqWriter(filepath, **kwargs)
+
+    if ext in PARQUET_EXTENSIONS:
+        return GeoParquetWriter(filepath, **kwargs)
+
+    raise ValueError(
+        f"No streaming writer for {ext!r} files, use one of "
+        f"{GEOJSONSEQ_EXTENSIONS + PARQUET_EXTENSIONS}"
+    )
+
+
+class FeatureWriter(ABC):
+    """
+    Base class of streaming feature writers.
+
+    Writers are context managers; the output is written to a temporary file
+    and moved to `filepath` on a clean exit, so a failed job never leaves a
+    truncated file behind.
+
+    Attributes
+    ----------
+    filepath: str
+        Output filepath.
+    n_features: int
+        Number of features written so far.
+
+    Methods
+    ---------
+    write(features, properties=None)
+        Append GeoJSON features, adding `properties` to each of them.
+    close()
+        Flush and move the output to `filepath`.
+    """
+
+    def __init__(self, filepath):
+        """Initiate FeatureWriter writing to `filepath`"""
+
+        self.filepath = filepath
+        self.n_features = 0
+        self._tmp_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        if exc_type is None:
+            self.close()
+        else:
+            self._abort()
+
+    @abstractmethod
+    def write(self, features, properties=None):
+        """Append GeoJSON features, adding `properties` to each of them"""
+
+    @abstractmethod
+    def close(self):
+        """Flush and move the output to `filepath`"""
+
+    def _abort(self):
+        """Drop the partial output"""
+
+        if self._tmp_path is not None and os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def _merge_properties(self, feature, properties):
+        """Return properties of `feature` updated with `properties`"""
+
+        feature_properties = dict(feature.get("properties") or {})
+
+        if properties:
+            feature_properties.update(properties)
+
+        return feature_properties
+
+
+class GeoJSONSeqWriter(FeatureWriter):
+    """
+    Newline delimited GeoJSON (GeoJSONSeq) writer.
+
+    Every feature is serialized and written immediately, readable with
+    `geopandas.read_file(filepath)` or line by line.
+    """
+
+    def __init__(self, filepath):
+        """Initiate GeoJSONSeqWriter writing to `filepath`"""
+
+        super().__init__(filepath)
+
+        self._tmp_path = _get_tmp_path(filepath)
+        self._file = open(self._tmp_path, "w")
+
+    def write(self, features, properties=None):
+        """Append GeoJSON features, adding `properties` to each of them"""
+
+        lines = [
+            json.dumps(
+                {
+                    "type": "Feature",
+                    "properties": self._merge_properties(feature, properties),
+                    "geometry": feature.get("geometry"),
+                },
+                separators=(",", ":"),
+            )
+            for feature in features
+        ]
+
+        if lines:
+            self._file.write("\n".join(lines) + "\n")
+
+        self.n_features += len(lines)
+
+    def close(self):
+        """Flush and move the output to `filepath`"""
+
+        if self._file.closed:
+            return
+
+        self._file.close()
+        os.replace(self._tmp_path, self.filepath)
+
+    def _abort(self):
+        """Drop the partial output"""
+
+        self._file.close()
+        super()._abort()
+
+
+class GeoParquetWriter(FeatureWriter):
+    """
+    GeoParquet writer appending one row group per `batch_size` features.
+
+    Geometries are stored as WKB in OGC:CRS84 (lng/lat) with a bbox covering
+    column, so readers can skip row groups outside a bounding box.
+
+    Every batch is spooled to a temporary part file with the property types
+    of that batch. On close the part schemas are unified (int and float
+    become float, all-null columns take the type of later values, properties
+    missing from a batch are null) and the parts are copied into `filepath`
+    one row group at a time, so memory stays bounded by `batch_size`.
+    Conflicting types (i.e. str and int) or lossy casts raise instead of
+    silently changing values. 'geometry' and 'bbox' properties are reserved
+    and dropped.
+
+    Attributes
+    ----------
+    batch_size: int
+        Number of features per row group.
+    compression: str
+        Parquet compression codec Ex: 'zstd', 'snappy', 'gzip', None.
+    """
+
+    def __init__(self, filepath, batch_size=10000, compression="zstd"):
+        """Initiate GeoParquetWriter writing to `filepath`"""
+
+        super().__init__(filepath)
+
+        self.batch_size = batch_size
+        self.compression = compression
+
+        self._tmp_path = _get_tmp_path(filepath)
+        self._parts_dir = None
+        self._part_paths = []
+        self._rows = []
+        self._geometries = []
+        self._geometry_types = set()
+        self._bbox = [np.inf, np.inf, -np.inf, -np.inf]
+
+    def write(self, features, properties=None):
+        """Append GeoJSON features, adding `properties` to each of them"""
+
+        for feature in features:
+            row = self._merge_properties(feature, properties)
+            row.pop("geometry", None)
+            row.pop("bbox", None)
+
+            geometry = feature.get("geometry")
+            self._rows.append(row)
+            self._geometries.append(shape(geometry) if geometry else None)
+
+        self.n_features += len(features)
+
+        if len(self._rows) >= self.batch_size:
+            self._flush()
+
+    def close(self):
+        """Merge the spooled batches and move the output to `filepath`"""
+
+        import pyarrow.parquet as pq
+
+        if self._tmp_path is None:
+            return
+
+        if self._rows or not self._part_paths:
+            self._flush()
+
+        try:
+            schema = self._get_schema(
+                [pq.read_schema(path) for path in self._part_paths]
+            )
+
+            with pq.ParquetWriter(
+                self._tmp_path, schema, compression=self.compression
+            ) as writer:
+                for path in self._part_paths:
+                    table = _conform_table(pq.read_table(path), schema)
+                    writer.write_table(
+                        table, row_group_size=len(table) or None
+                    )
+
+            os.replace(self._tmp_path, self.filepath)
+
+        except BaseException:
+            self._abort()
+            raise
+
+        self._tmp_path = None
+        self._remove_parts()
+
+    def _abort(self):
+        """Drop the partial output"""
+
+        self._remove_parts()
+        super()._abort()
+
+    def _remove_parts(self):
+        """Delete the spooled part files"""
+
+        if self._parts_dir is not None:
+            shutil.rmtree(self._parts_dir, ignore_errors=True)
+            self._parts_dir = None
+
+    def _flush(self):
+        """Spool buffered features to a part file"""
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        geometries = np.array(self._geometries, dtype=object)
+        bounds = shapely.bounds(geometries)
+
+        self._geometry_types.update(
+            geometry.geom_type
+            for geometry in geometries
+            if geometry is not None
+        )
+        if len(bounds) and not np.isnan(bounds).all():
+            self._bbox = [
+                min(self._bbox[0], np.nanmin(bounds[:, 0])),
+                min(self._bbox[1], np.nanmin(bounds[:, 1])),
+                max(self._bbox[2], np.nanmax(bounds[:, 2])),
+                max(self._bbox[3], np.nanmax(bounds[:, 3])),
+            ]
+
+        # a struct array infers the keys and types of all rows, not the first
+        properties = pa.array(
+            self._rows, type=None if self._rows else pa.struct([])
+        )
+        table = pa.Table.from_struct_array(properties)
+
+        table = table.append_column(
+            "geometry", pa.array(shapely.to_wkb(geometries), pa.binary())
+        )
+        table = table.append_column(
+            "bbox",
+            pa.StructArray.from_arrays(
+                [pa.array(bounds[:, n], pa.float64()) for n in range(4)],
+                names=["xmin", "ymin", "xmax", "ymax"],
+            ),
+        )
+
+        if self._parts_dir is None:
+            self._parts_dir = tempfile.mkdtemp(
+                dir=os.path.dirname(self._tmp_path), prefix=".tmp_"
+            )
+
+        part_path = os.path.join(
+            self._parts_dir, f"{len(self._part_paths):06d}.parquet"
+        )
+        pq.write_table(table, part_path, compression=None)
+        self._part_paths.append(part_path)
+
+        self._rows = []
+        self._geometries = []
+
+    def _get_schema(self, schemas):
+        """Return the unified schema of the parts with the 'geo' metadata"""
+
+        import pyarrow as pa
+
+        schema = pa.unify_schemas(schemas, promote_options="permissive")
+        fields = [
+            field for field in schema if field.name not in ("geometry", "bbox")
+        ]
+        fields += [schema.field("geometry"), schema.field("bbox")]
+
+        geo_metadata = json.dumps(self._get_geo_metadata())
+
+        return pa.schema(fields, metadata={"geo": geo_metadata})
+
+    def _get_geo_metadata(self):
+        """Return the GeoParquet 1.1 'geo' metadata of the file"""
+
+        column = {
+            "encoding": "WKB",
+            "geometry_types": sorted(self._geometry_types),
+            "covering": {
+                "bbox": {
+                    "xmin": ["bbox", "xmin"],
+                    "ymin": ["bbox", "ymin"],
+                    "xmax": ["bbox", "xmax"],
+                    "ymax": ["bbox", "ymax"],
+                }
+            },
+        }
+
+        if np.isfinite(self._bbox).all():
+            column["bbox"] = [float(value) for value in self._bbox]
+
+        return {
+            "version": "1.1.0",
+            "primary_column": "geometry",
+            "columns": {"geometry": column},
+        }
+
+
+def _conform_table(table, schema):
+    """
+    Return `table` with the columns of `schema`, missing ones null, cast
+    safely so lossy conversions raise.
+    """
+
+    import pyarrow as pa
+
+    columns = [
+        (
+            table[field.name]
+            if field.name in table.column_names
+            else pa.nulls(len(table), field.type)
+        )
+        for field in schema
+    ]
+
+    return pa.Table.from_arrays(columns, names=schema.names).cast(
+        schema, safe=True
+    )
+
+
+def _sort_spatially(gdf):
+    """Return `gdf` sorted along a Hilbert curve, missing geometries last"""
+
+    geometry = gdf.geometry
+    valid = ~(geometry.isna() | geometry.is_empty).to_numpy()
+
+    if valid.sum() < 2:
+        return gdf
+
+    distances = np.full(len(gdf), np.iinfo(np.int64).max, dtype=np.int64)
+    distances[valid] = geometry[valid].hilbert_distance()
+
+    return gdf.iloc[np.argsort(distances, kind="stable")]
+
+
+def _get_tmp_path(filepath):
+    """Return a new temporary file next to `filepath`"""
+
+    directory = os.path.dirname(os.path.abspath(filepath))
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=".tmp_", suffix=os.path.splitext(filepath)[1]
+    )
+    os.close(fd)
+
+    return tmp_path
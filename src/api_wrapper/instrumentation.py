@@ -0,0 +1,238 @@
+"""
+Request metrics and stage timings of the api wrappers.
+
+Instrumentation is off by default (`Instrumentation` records nothing). Install
+a `MetricsRecorder` to collect per-endpoint latency histograms, bytes, status
+codes, retries and cache hits/misses plus span timings of pipeline stages
+(download, unzip, parse, convert...).
+
+Usage:
+
+    from api_wrapper.instrumentation import (
+        MetricsRecorder,
+        set_instrumentation,
+    )
+
+    recorder = set_instrumentation(MetricsRecorder())
+    census_boundaries.get_boundaries_gdf('Colorado', 'tract')
+
+    recorder.snapshot()
+    recorder.export(lambda metrics: statsd_client.send(metrics))
+    recorder.to_json('metrics.json')
+"""
+
+import json
+import time
+import bisect
+import logging
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# upper bounds in seconds of the latency histogram buckets (last one is +inf)
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    float("inf"),
+)
+
+
+def get_endpoint(url):
+    """Return 'host/path' of a url i.e. 'api.mapbox.com/isochrone/v1/mapbox'"""
+
+    _, netloc, path, _, _ = urlsplit(url)
+
+    return netloc + path.rstrip("/")
+
+
+class Instrumentation(object):
+    """
+    No-op instrumentation, the default.
+
+    Subclasses override the record methods. Callers check `enabled` before
+    doing any timing work, so disabled instrumentation costs an attribute
+    lookup per request.
+
+    Methods
+    ---------
+    request(endpoint, seconds, status, n_bytes=0, retries=0)
+        Record a completed request.
+    cache(name, hit)
+        Record a cache hit or miss.
+    span(name, **tags)
+        Context manager timing a stage.
+    """
+
+    enabled = False
+
+    def request(self, endpoint, seconds, status, n_bytes=0, retries=0):
+        """Record a completed request"""
+
+    def cache(self, name, hit):
+        """Record a cache hit or miss"""
+
+    def span(self, name, **tags):
+        """Context manager timing a stage"""
+
+        return nullcontext()
+
+
+class MetricsRecorder(Instrumentation):
+    """
+    Thread safe in-memory recorder of request metrics and spans.
+
+    Attributes
+    ----------
+    log_spans: bool
+        Also log every finished span at DEBUG level.
+
+    Methods
+    ---------
+    snapshot()
+        Return a json serializable dict of all metrics.
+    export(sink)
+        Call `sink(snapshot())`, i.e. to push to a metrics backend.
+    to_json(filepath)
+        Write `snapshot()` to a json file.
+    reset()
+        Drop all recorded metrics.
+    """
+
+    enabled = True
+
+    def __init__(self, log_spans=False):
+        """Initiate an empty MetricsRecorder"""
+
+        self.log_spans = log_spans
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop all recorded metrics"""
+
+        with self._lock:
+            self._requests = defaultdict(
+                lambda: dict(
+                    count=0,
+                    seconds=0.0,
+                    bytes=0,
+                    retries=0,
+                    statuses=Counter(),
+                    histogram=[0] * len(LATENCY_BUCKETS),
+                )
+            )
+            self._caches = defaultdict(Counter)
+            self._spans = defaultdict(
+                lambda: dict(count=0, seconds=0.0, max_seconds=0.0)
+            )
+
+    def request(self, endpoint, seconds, status, n_bytes=0, retries=0):
+        """Record a completed request"""
+
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+
+        with self._lock:
+            metrics = self._requests[endpoint]
+            metrics["count"] += 1
+            metrics["seconds"] += seconds
+            metrics["bytes"] += n_bytes
+            metrics["retries"] += retries
+            metrics["statuses"][status] += 1
+            metrics["histogram"][bucket] += 1
+
+    def cache(self, name, hit):
+        """Record a cache hit or miss"""
+
+        with self._lock:
+            self._caches[name]["hits" if hit else "misses"] += 1
+
+    @contextmanager
+    def span(self, name, **tags):
+        """Context manager timing a stage"""
+
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+
+            with self._lock:
+                metrics = self._spans[name]
+                metrics["count"] += 1
+                metrics["seconds"] += seconds
+                metrics["max_seconds"] = max(metrics["max_seconds"], seconds)
+
+            if self.log_spans:
+                logger.debug("%s took %.3fs %s", name, seconds, tags)
+
+    def snapshot(self):
+        """Return a json serializable dict of all metrics"""
+
+        with self._lock:
+            requests = {
+                endpoint: dict(
+                    metrics,
+                    statuses={
+                        str(k): v for k, v in metrics["statuses"].items()
+                    },
+                    histogram=dict(
+                        zip(map(str, LATENCY_BUCKETS), metrics["histogram"])
+                    ),
+                    mean_seconds=metrics["seconds"] / metrics["count"],
+                )
+                for endpoint, metrics in self._requests.items()
+            }
+            caches = {
+                name: dict(counts) for name, counts in self._caches.items()
+            }
+            spans = {
+                name: dict(metrics) for name, metrics in self._spans.items()
+            }
+
+        return dict(requests=requests, caches=caches, spans=spans)
+
+    def export(self, sink):
+        """Call `sink(snapshot())`, i.e. to push to a metrics backend"""
+
+        return sink(self.snapshot())
+
+    def to_json(self, filepath):
+        """Write `snapshot()` to a json file"""
+
+        with open(filepath, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+_instrumentation = Instrumentation()
+_instrumentation_lock = threading.Lock()
+
+
+def get_instrumentation():
+    """Return the process wide instrumentation used by all API instances"""
+
+    return _instrumentation
+
+
+def set_instrumentation(instrumentation):
+    """Replace the process wide instrumentation and return it"""
+
+    global _instrumentation
+
+    with _instrumentation_lock:
+        _instrumentation = instrumentation or Instrumentation()
+
+    return _instrumentation
@@ -0,0 +1,280 @@
+"""
+Token bucket rate limiting of api requests per host or endpoint.
+
+Usage:
+
+    from api_wrapper.base_api import API
+    from api_wrapper.rate_limit import RateLimiter
+
+    rate_limiter = RateLimiter({'https://api.mapbox.com/isochrone': 300 / 60})
+    mapbox_api = API(
+        'https://api.mapbox.com/isochrone/v1/mapbox', rate_limiter=rate_limiter
+    )
+"""
+
+import time
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+# (limit, interval, reset) header names, first match wins
+RATE_LIMIT_HEADERS = [
+    ("X-Rate-Limit-Limit", "X-Rate-Limit-Interval", "X-Rate-Limit-Reset"),
+    ("RateLimit-Limit", None, "RateLimit-Reset"),
+    ("X-RateLimit-Limit", None, "X-RateLimit-Reset"),
+]
+
+
+class TokenBucket(object):
+    """
+    Thread safe token bucket spacing calls `1 / rate` seconds apart.
+
+    Callers reserve a token under a lock and sleep outside of it, so waiting
+    threads and async tasks are served in arrival order and the sustained rate
+    stays at `rate` without bursts above `capacity`.
+
+    Attributes
+    ----------
+    rate: float
+        Tokens added per second.
+    capacity: float
+        Maximum number of tokens, i.e. the largest burst.
+
+    Methods
+    ---------
+    acquire()
+        Block until a token is available.
+    acquire_async()
+        Coroutine waiting until a token is available.
+    pause(seconds)
+        Hand out no tokens for `seconds` (i.e. from a Retry-After header).
+    set_rate(rate)
+        Change the refill rate.
+    """
+
+    def __init__(self, rate, capacity=1):
+        """Initiate a full TokenBucket refilled with `rate` tokens/second"""
+
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+
+        self._tokens = self.capacity
+        # refills start here, it is in the future while paused
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, return the seconds waited"""
+
+        wait = self._reserve()
+
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+    async def acquire_async(self):
+        """Wait until a token is available without blocking the event loop"""
+
+        wait = self._reserve()
+
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        return wait
+
+    def pause(self, seconds):
+        """Hand out no tokens for `seconds`, drop tokens saved meanwhile"""
+
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = max(self._updated, time.monotonic() + seconds)
+
+    def set_rate(self, rate):
+        """Change the refill rate (tokens per second)"""
+
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+
+    def _reserve(self):
+        """Take a token and return the seconds until it may be used"""
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            self._tokens -= 1
+            wait = max(0.0, self._updated - now) + max(
+                0.0, -self._tokens / self.rate
+            )
+
+        return wait
+
+    def _refill(self, now):
+        """Add tokens for the time since the last refill"""
+
+        if now > self._updated:
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+
+
+class RateLimiter(object):
+    """
+    Token buckets per host or endpoint that adapt to rate-limit headers.
+
+    A request url uses the bucket of the longest matching prefix of `rates`,
+    otherwise a bucket of its host with `default_rate` (None: not limited).
+    Responses update the buckets: `Retry-After` pauses a bucket and
+    limit/interval headers (i.e. Mapbox's X-Rate-Limit-*) set its rate, so the
+    sustained request rate follows the provider's quota.
+
+    Attributes
+    ----------
+    rates: dict
+        Dictionary with keys=url prefix or host, values=requests per second.
+        Example: {'https://api.mapbox.com/isochrone': 5}
+    default_rate: float
+        Requests per second of hosts without an entry in `rates`.
+    retry_after: float
+        Seconds a bucket pauses after a 429 without a Retry-After header.
+
+    Methods
+    ---------
+    acquire(url)
+        Block until a request to `url` may be sent.
+    acquire_async(url)
+        Coroutine waiting until a request to `url` may be sent.
+    update(response, url=None)
+        Adapt the bucket of `url` (default `response.url`) to the response.
+    """
+
+    def __init__(self, rates=None, default_rate=None, retry_after=1.0):
+        """Initiate RateLimiter with requests per second per url prefix"""
+
+        self.rates = dict(rates or {})
+        self.default_rate = default_rate
+        self.retry_after = retry_after
+
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url):
+        """Return the TokenBucket of `url` or None when it isn't limited"""
+
+        prefixes = [prefix for prefix in self.rates if url.startswith(prefix)]
+        key = max(prefixes, key=len) if prefixes else urlsplit(url).netloc
+
+        with self._lock:
+            if key not in self._buckets:
+                rate = self.rates.get(key, self.default_rate)
+                self._buckets[key] = TokenBucket(rate) if rate else None
+
+            return self._buckets[key]
+
+    def acquire(self, url):
+        """Block until a request to `url` may be sent"""
+
+        bucket = self.bucket(url)
+
+        return bucket.acquire() if bucket is not None else 0.0
+
+    async def acquire_async(self, url):
+        """Wait until a request to `url` may be sent"""
+
+        bucket = self.bucket(url)
+
+        return await bucket.acquire_async() if bucket is not None else 0.0
+
+    def update(self, response, url=None):
+        """
+        Adapt the bucket of `url` (default `response.url`) to the response.
+
+        Returns the seconds the bucket was paused for (0 when not paused).
+        """
+
+        bucket = self.bucket(url or response.url)
+
+        if bucket is None:
+            return 0.0
+
+        headers = response.headers
+        rate = self._get_rate(headers)
+
+        if rate:
+            bucket.set_rate(rate)
+
+        if response.status_code not in (429, 503):
+            return 0.0
+
+        pause = self._get_retry_after(headers)
+
+        if pause is None:
+            pause = self._get_reset(headers)
+
+        if pause is None:
+            pause = self.retry_after if response.status_code == 429 else 0.0
+
+        bucket.pause(pause)
+
+        return pause
+
+    def _get_rate(self, headers):
+        """Return requests per second from limit/interval headers or None"""
+
+        for limit_header, interval_header, _ in RATE_LIMIT_HEADERS:
+            if interval_header is None:
+                continue
+
+            try:
+                limit = float(headers[limit_header])
+                interval = float(headers[interval_header])
+            except (KeyError, ValueError):
+                continue
+
+            if limit > 0 and interval > 0:
+                return limit / interval
+
+        return None
+
+    def _get_retry_after(self, headers):
+        """Return seconds of a Retry-After header (delay or date) or None"""
+
+        retry_after = headers.get("Retry-After")
+
+        if retry_after is None:
+            return None
+
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+
+        try:
+            return max(
+                0.0,
+                parsedate_to_datetime(retry_after).timestamp() - time.time(),
+            )
+        except (TypeError, ValueError):
+            return None
+
+    def _get_reset(self, headers):
+        """Return seconds until a reset header (delay or unix time) or None"""
+
+        for _, _, reset_header in RATE_LIMIT_HEADERS:
+            try:
+                reset = float(headers[reset_header])
+            except (KeyError, ValueError):
+                continue
+
+            # large values are unix timestamps, small ones delays in seconds
+            if reset > 1e9:
+                reset -= time.time()
+
+            return max(0.0, reset)
+
+        return None
@@ -0,0 +1,81 @@
+import pytest
+
+from api_wrapper.base_api import get_shared_session, set_shared_session
+from benchmarks.fixture_server import FixtureServer, make_fixture_session
+
+HIERARCHIES_DICT = {
+    "state": ["state"],
+    "county": ["state", "county"],
+    "census_tract": ["state", "county", "census_tract"],
+    "block_group": ["state", "county", "census_tract", "block_group"],
+    "all_counties": ["county"],
+}
+
+
+@pytest.fixture(scope="session")
+def fixture_server():
+    with FixtureServer() as server:
+        yield server
+
+
+@pytest.fixture
+def fixture_session(fixture_server):
+    """Route the shared session of every API to the fixture server"""
+
+    set_shared_session(make_fixture_session(fixture_server.url))
+    yield
+    set_shared_session(None)
+
+
+@pytest.fixture
+def request_urls(fixture_session):
+    """Urls requested through the shared session"""
+
+    urls = []
+
+    def record(response, *args, **kwargs):
+        urls.append(response.url)
+
+    get_shared_session().hooks["response"].append(record)
+
+    return urls
+
+
+@pytest.fixture
+def census_data(fixture_session, tmp_path):
+    from api_wrapper.census_api.census_api import CensusDataAPI
+
+    census_data = CensusDataAPI("acs5", 2018, cache_dir=str(tmp_path))
+    # the geo_hierarchies csv is project data outside this repo
+    census_data.hierarchies_dict = dict(HIERARCHIES_DICT)
+
+    return census_data
+
+
+@pytest.fixture
+def census_boundaries(fixture_session, tmp_path):
+    from api_wrapper.census_api.census_boundaries import CensusBoundaries
+
+    return CensusBoundaries(
+        2018,
+        cache_dir=str(tmp_path / "meta"),
+        boundary_cache_dir=str(tmp_path / "boundaries"),
+    )
+
+
+@pytest.fixture
+def census_geo_data(fixture_session, tmp_path):
+    from api_wrapper.census_api.census_geo_data import CensusGeoDataAPI
+
+    census_geo_data = CensusGeoDataAPI(
+        "acs5",
+        2018,
+        cache_dir=str(tmp_path / "meta"),
+        geo_data_cache_dir=str(tmp_path / "geo_data"),
+        boundary_kwargs=dict(
+            boundary_cache_dir=str(tmp_path / "boundaries")
+        ),
+    )
+    census_geo_data.hierarchies_dict = dict(HIERARCHIES_DICT)
+
+    return census_geo_data
@@ -0,0 +1,118 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from api_wrapper.base_api import (
+    API,
+    DEFAULT_TIMEOUT,
+    get_shared_session,
+    make_session,
+    set_shared_session,
+)
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answer 503 to the first `n_failures` requests, then 200"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+
+        with server.lock:
+            server.n_requests += 1
+            server.client_ports.add(self.client_address[1])
+            failed = server.n_requests <= server.n_failures
+
+        body = b'{"ok": false}' if failed else b'{"ok": true}'
+        self.send_response(503 if failed else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def flaky_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.n_requests = 0
+    server.client_ports = set()
+    server.n_failures = 2
+    server.url = f"http://127.0.0.1:{server.server_port}"
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_make_session_pools_and_retries():
+    session = make_session(
+        pool_maxsize=16,
+        host_pool_sizes={"https://api.mapbox.com": 32},
+        retries=4,
+    )
+
+    adapter = session.get_adapter("https://api.census.gov/data")
+    mapbox_adapter = session.get_adapter("https://api.mapbox.com/isochrone")
+
+    assert adapter._pool_maxsize == 16
+    assert mapbox_adapter._pool_maxsize == 32
+    assert adapter.max_retries.total == 4
+    assert 503 in adapter.max_retries.status_forcelist
+    assert "POST" not in adapter.max_retries.allowed_methods
+
+
+def test_make_session_retries_5xx(flaky_server):
+    session = make_session(backoff_factor=0)
+
+    response = session.get(flaky_server.url)
+
+    assert response.status_code == 200
+    assert flaky_server.n_requests == 3
+
+
+def test_make_session_returns_last_5xx_without_raising(flaky_server):
+    session = make_session(retries=1, backoff_factor=0)
+
+    assert session.get(flaky_server.url).status_code == 503
+    assert flaky_server.n_requests == 2
+
+
+def test_make_session_keeps_connections_alive(flaky_server):
+    flaky_server.n_failures = 0
+    session = make_session()
+
+    for _ in range(5):
+        session.get(flaky_server.url).raise_for_status()
+
+    assert flaky_server.n_requests == 5
+    assert len(flaky_server.client_ports) == 1
+
+
+def test_api_uses_the_shared_session():
+    session = make_session()
+    set_shared_session(session)
+
+    try:
+        assert get_shared_session() is session
+        assert API("https://api.census.gov").session is session
+        assert API("https://api.census.gov").timeout == DEFAULT_TIMEOUT
+    finally:
+        set_shared_session(None)
+
+    assert get_shared_session() is not session
+
+
+def test_api_get_json(flaky_server):
+    flaky_server.n_failures = 0
+    api = API(flaky_server.url, session=make_session())
+
+    assert api.get_json(api.get_request_str({"/data": None})) == {"ok": True}
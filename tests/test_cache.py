@@ -0,0 +1,184 @@
+import math
+import random
+import threading
+import time
+
+import pytest
+
+from api_wrapper.cache import (
+    METRES_PER_DEGREE_LAT,
+    METRES_PER_DEGREE_LNG,
+    IsochroneCache,
+    ResponseCache,
+)
+
+URL = "https://api.mapbox.com/isochrone/v1/mapbox/driving/-105.0,39.7"
+
+
+def test_response_cache_normalize_sorts_query_and_drops_tokens(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+
+    assert cache.normalize(f"{URL}?polygons=true&contours_minutes=10") == (
+        cache.normalize(f"{URL}?&contours_minutes=10&polygons=true")
+    )
+    assert "secret" not in cache.normalize(
+        f"{URL}?contours_minutes=10&access_token=secret"
+    )
+
+
+def test_response_cache_ignores_access_token(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+
+    cache.set(f"{URL}?contours_minutes=10&access_token=a", {"n": 1})
+
+    assert cache.get(f"{URL}?access_token=b&contours_minutes=10") == {"n": 1}
+    assert cache.get(f"{URL}?contours_minutes=20") is None
+
+
+def test_response_cache_expires_entries(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=0.05)
+
+    cache.set(URL, {"n": 1})
+    assert cache.get(URL) == {"n": 1}
+
+    time.sleep(0.1)
+    assert cache.get(URL) is None
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    body_size = len('{"n":1}')
+    cache = ResponseCache(str(tmp_path), max_size=2 * body_size)
+
+    cache.set(f"{URL}?n=1", {"n": 1})
+    time.sleep(0.01)
+    cache.set(f"{URL}?n=2", {"n": 2})
+    time.sleep(0.01)
+    cache.get(f"{URL}?n=1")
+    time.sleep(0.01)
+    cache.set(f"{URL}?n=3", {"n": 3})
+
+    assert cache.get(f"{URL}?n=1") == {"n": 1}
+    assert cache.get(f"{URL}?n=2") is None
+    assert cache.get(f"{URL}?n=3") == {"n": 3}
+
+
+def test_response_cache_persists_and_clears(tmp_path):
+    ResponseCache(str(tmp_path)).set(URL, {"n": 1})
+
+    cache = ResponseCache(str(tmp_path))
+    assert cache.get(URL) == {"n": 1}
+
+    cache.clear()
+    assert cache.get(URL) is None
+
+
+def test_response_cache_tracks_total_size(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=0.05)
+
+    cache.set(f"{URL}?n=1", {"n": 1})
+    cache.set(f"{URL}?n=1", {"n": 10})
+    cache.set(f"{URL}?n=2", {"n": 2})
+    assert cache._total_size == len('{"n":10}') + len('{"n":2}')
+    assert ResponseCache(str(tmp_path))._total_size == cache._total_size
+
+    time.sleep(0.1)
+    cache.get(f"{URL}?n=1")
+    assert cache._total_size == len('{"n":2}')
+
+
+def test_isochrone_cache_serves_origins_within_tolerance(tmp_path):
+    cache = IsochroneCache(str(tmp_path), tolerance=25)
+    d_lat = 10 / METRES_PER_DEGREE_LAT
+
+    cache.set(-105.0, 39.7, "driving", {"n": 1})
+
+    assert cache.get(-105.0, 39.7 + d_lat, "driving") == {"n": 1}
+    assert cache.get(-105.0, 39.7 + 3 * d_lat, "driving") is None
+    assert cache.get(-105.0, 39.7, "walking") is None
+
+
+def test_isochrone_cache_lock_serializes_origins_across_cell_edges(
+    tmp_path,
+):
+    cache = IsochroneCache(str(tmp_path), tolerance=25)
+    _, d_lat = cache._tolerance_degrees(39.7)
+    # two origins 2 metres apart on either side of a tolerance cell edge
+    edge_lat = (round(39.7 / d_lat) + 0.5) * d_lat
+    offset = 1 / METRES_PER_DEGREE_LAT
+    acquired = threading.Event()
+
+    def lock_neighbour():
+        with cache.lock(-105.0, edge_lat + offset, "driving"):
+            acquired.set()
+
+    with cache.lock(-105.0, edge_lat - offset, "driving"):
+        thread = threading.Thread(target=lock_neighbour)
+        thread.start()
+        assert not acquired.wait(0.1)
+
+    thread.join(1)
+    assert acquired.is_set()
+
+
+@pytest.mark.parametrize("lng, lat", [(-160, 60), (170, 60), (179, -75)])
+def test_isochrone_cache_lock_stripes_overlap_within_tolerance(
+    tmp_path, lng, lat
+):
+    cache = IsochroneCache(str(tmp_path), tolerance=25)
+    rand = random.Random(0)
+
+    for _ in range(2000):
+        lng_a = lng + rand.uniform(-0.01, 0.01)
+        lat_a = lat + rand.uniform(-0.01, 0.01)
+        # an origin up to 25 metres away, at another latitude
+        angle, distance = rand.uniform(0, 2 * math.pi), rand.uniform(0, 25)
+        lat_b = lat_a + distance * math.sin(angle) / METRES_PER_DEGREE_LAT
+        lng_b = lng_a + distance * math.cos(angle) / (
+            METRES_PER_DEGREE_LNG * math.cos(math.radians(lat_a))
+        )
+
+        assert set(cache._lock_stripes(lng_a, lat_a, "driving")) & set(
+            cache._lock_stripes(lng_b, lat_b, "driving")
+        )
+
+
+def test_isochrone_cache_evicts_least_recently_used(tmp_path):
+    body_size = len('{"n":1}')
+    cache = IsochroneCache(str(tmp_path), max_size=2 * body_size)
+
+    cache.set(-105.0, 39.7, "driving", {"n": 1})
+    time.sleep(0.01)
+    cache.set(-104.0, 39.7, "driving", {"n": 2})
+    time.sleep(0.01)
+    cache.get(-105.0, 39.7, "driving")
+    time.sleep(0.01)
+    cache.set(-103.0, 39.7, "driving", {"n": 3})
+
+    assert cache.get(-105.0, 39.7, "driving") == {"n": 1}
+    assert cache.get(-104.0, 39.7, "driving") is None
+    assert cache.get(-103.0, 39.7, "driving") == {"n": 3}
+    assert cache._total_size == 2 * body_size
+
+
+def test_isochrone_cache_total_size_survives_reopen(tmp_path):
+    cache = IsochroneCache(str(tmp_path))
+    cache.set(-105.0, 39.7, "driving", {"n": 1})
+    cache.set(-104.0, 39.7, "driving", {"n": 2})
+
+    assert IsochroneCache(str(tmp_path))._total_size == cache._total_size
+
+    cache.clear()
+    assert cache._total_size == 0
+
+
+def test_isochrone_cache_expires_entries(tmp_path):
+    cache = IsochroneCache(str(tmp_path), ttl=0.05)
+
+    cache.set(-105.0, 39.7, "driving", {"n": 1})
+    time.sleep(0.1)
+    assert cache.get(-105.0, 39.7, "driving") is None
+
+    # expired entries are deleted on the next expiry pass
+    cache._n_sets = 0
+    cache.set(-104.0, 39.7, "driving", {"n": 2})
+    assert cache._total_size == len('{"n":2}')
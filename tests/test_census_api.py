@@ -0,0 +1,326 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import censusdata
+import numpy as np
+import pandas as pd
+import pytest
+
+from api_wrapper.census_api.census_api import (
+    CensusAPI,
+    CensusDataAPI,
+    lazy_property,
+)
+
+TABLES = {"B01000_001E": "Total population", "B01000_002E": "Subtitle"}
+
+
+def test_metadata_is_cached_as_parquet(request_urls, tmp_path):
+    census_api = CensusAPI(2018, cache_dir=str(tmp_path))
+    table_meta_data = census_api.table_meta_data
+    fips_df = census_api.fips_df
+
+    assert len(request_urls) == 2
+    assert {"table_meta_data.parquet", "fips_df.parquet"} <= set(
+        os.listdir(tmp_path)
+    )
+
+    cached_api = CensusAPI(2018, cache_dir=str(tmp_path))
+
+    pd.testing.assert_frame_equal(cached_api.table_meta_data, table_meta_data)
+    pd.testing.assert_frame_equal(cached_api.fips_df, fips_df)
+    assert cached_api.state_fips["Colorado"] == "08"
+    assert len(request_urls) == 2
+
+
+def test_refresh_downloads_metadata_again(request_urls, tmp_path):
+    census_api = CensusAPI(2018, cache_dir=str(tmp_path))
+    census_api.fips_df
+    census_api.state_fips
+
+    census_api.refresh()
+
+    assert "fips_df.parquet" not in os.listdir(tmp_path)
+    assert "state_fips" not in vars(census_api)
+    assert census_api.state_fips["Colorado"] == "08"
+    assert len(request_urls) == 2
+
+    CensusAPI(2018, cache_dir=str(tmp_path), refresh=True).fips_df
+    assert len(request_urls) == 3
+
+
+def test_metadata_sources_get_their_own_cache_files(fixture_server, tmp_path):
+    fips_sheet = (
+        f"{fixture_server.url}/programs-surveys/popest/geographies/2018/"
+        "all-geocodes-v2018.xlsx"
+    )
+
+    census_api = CensusAPI(
+        2018, cache_dir=str(tmp_path), fips_sheet=fips_sheet
+    )
+
+    assert census_api.state_fips["Colorado"] == "08"
+    assert os.listdir(tmp_path) != ["fips_df.parquet"]
+    assert os.listdir(tmp_path)[0].startswith("fips_df_")
+
+
+def test_census_api_construction_is_lazy(request_urls, tmp_path):
+    census_api = CensusAPI(2018, cache_dir=str(tmp_path))
+
+    assert request_urls == []
+
+    census_api.state_fips
+
+    assert len(request_urls) == 1
+    assert "all-geocodes" in request_urls[0]
+    assert "table_meta_data" not in vars(census_api)
+
+
+def test_lazy_properties_are_computed_once_across_threads(
+    request_urls, tmp_path
+):
+    census_api = CensusAPI(2018, cache_dir=str(tmp_path))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        resolvers = list(
+            executor.map(lambda _: census_api.fips_resolver, range(8))
+        )
+
+    assert all(resolver is resolvers[0] for resolver in resolvers)
+    assert len(request_urls) == 1
+
+
+def test_lazy_property_names():
+    assert {"fips_df", "state_fips", "table_catalog", "paths"} <= (
+        lazy_property.names(CensusAPI)
+    )
+
+
+def test_compact_df(census_data):
+    df = pd.DataFrame(
+        {
+            "B01000_001E": ["10", "-666666666", "300"],
+            "B01000_002E": [1.5, -999999999, 2.25],
+            "B01000_003E": [70000, 80000, 90000],
+            "geo_names": ["a", "b", "a"],
+        }
+    )
+
+    df = census_data._compact_df(
+        df, ["B01000_001E", "B01000_002E", "B01000_003E"]
+    )
+
+    assert str(df["B01000_001E"].dtype) == "Int16"
+    assert df["B01000_001E"].isna().tolist() == [False, True, False]
+    assert df["B01000_002E"].dtype == np.float32
+    assert np.isnan(df["B01000_002E"][1])
+    assert str(df["B01000_003E"].dtype) == "Int32"
+    assert df["geo_names"].dtype == "category"
+
+
+@pytest.mark.parametrize("state", ["08", "Colorado", "colorado", "CO"])
+def test_get_geo_shards_per_county(census_data, state):
+    kwargs = dict(state=state, county="*", census_tract="*")
+
+    shards = census_data._get_geo_shards(kwargs)
+
+    assert [shard["county"] for shard in shards] == [
+        "001",
+        "003",
+        "005",
+        "007",
+        "009",
+    ]
+    assert {shard["state"] for shard in shards} == {"08"}
+    assert all(shard["census_tract"] == "*" for shard in shards)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(state="08", county="*"),
+        dict(state="08", county="001", census_tract="*"),
+        dict(state="*", county="*", census_tract="*"),
+    ],
+)
+def test_get_geo_shards_unsharded(census_data, kwargs):
+    assert census_data._get_geo_shards(kwargs) == [kwargs]
+
+
+def test_get_geo_shards_state_without_counties(census_data):
+    with pytest.raises(ValueError, match="No counties found"):
+        census_data._get_geo_shards(
+            dict(state="Narnia", county="*", census_tract="*")
+        )
+
+
+def test_parse_hierarchy(census_data):
+    hierarchy = census_data._parse_hierarchy(
+        dict(state="colorado", county="County 003 County")
+    )
+
+    assert hierarchy == [("state", "08"), ("county", "003")]
+
+
+def test_parse_hierarchy_without_match(census_data):
+    with pytest.raises(ValueError, match="No geographic hierarchy"):
+        census_data._parse_hierarchy(dict(state="08", place="*"))
+
+
+def test_get_data_state(census_data):
+    df = census_data.get_data([TABLES], labels="attrs", state="Colorado")
+
+    assert len(df) == 1
+    assert df.attrs["table_labels"] == TABLES
+
+
+def test_get_data_sharded_tracts(census_data):
+    df = census_data.get_data(
+        [TABLES], state="CO", county="*", census_tract="*"
+    )
+
+    # a table labels row and 40 tracts in each of 5 counties
+    assert len(df) == 1 + 5 * 40
+    assert df.iloc[0].loc["B01000_001E"] == "Total population"
+
+
+def test_get_data_labels_columns(census_data):
+    df = census_data.get_data(
+        [TABLES], labels="columns", state="08", county="*"
+    )
+
+    assert len(df) == 5
+    assert ("B01000_001E", "Total population") in df.columns
+
+
+def test_parse_geo_index(census_data):
+    index = [
+        censusdata.censusgeo(
+            [
+                ("state", "08"),
+                ("county", county),
+                ("tract", "000100"),
+                ("block group", block_group),
+            ],
+            name=f"Block Group {block_group}, County {county}",
+        )
+        for county in ("001", "003")
+        for block_group in "12"
+    ]
+    df = pd.DataFrame({"B01000_001E": range(4)}, index=index)
+
+    df = census_data._parse_geo_index(df)
+
+    assert df.index.name == "GEOID"
+    assert df.index.tolist() == [
+        "080010001001",
+        "080010001002",
+        "080030001001",
+        "080030001002",
+    ]
+    assert df["geo_names"].tolist()[0] == "Block Group 1, County 001"
+    assert df["county"].tolist() == ["001", "001", "003", "003"]
+    assert df["block_group"].dtype == "category"
+    assert df["state"].cat.categories.tolist() == ["08"]
+    assert df["B01000_001E"].tolist() == [0, 1, 2, 3]
+
+
+def test_parse_geo_index_empty(census_data):
+    df = pd.DataFrame({"B01000_001E": []})
+
+    assert census_data._parse_geo_index(df) is df
+
+
+@pytest.fixture
+def censustable_calls(monkeypatch):
+    """Base table ids requested from `censusdata.censustable`"""
+
+    calls = []
+
+    def censustable(survey, year, base_table_id):
+        calls.append(base_table_id)
+        return {
+            f"{base_table_id}_001E": {
+                "concept": f"Concept {base_table_id}",
+                "label": "Estimate!!Total",
+            }
+        }
+
+    monkeypatch.setattr(censusdata, "censustable", censustable)
+
+    return calls
+
+
+def test_prefetch_tables_persists_table_variables(
+    censustable_calls, census_data
+):
+    census_data.prefetch_tables(["age", "B01001", "B19013"])
+
+    assert sorted(censustable_calls) == ["B01001", "B19013"]
+    assert os.path.isfile(census_data._get_table_variables_file())
+
+    census_api = CensusDataAPI("acs5", 2018, cache_dir=census_data.cache_dir)
+    census_api.prefetch_tables(["agg_HI", "B19013", "B01001"])
+
+    assert sorted(census_api.table_variables) == [
+        "B01001",
+        "B19013",
+        "B19025",
+    ]
+    assert censustable_calls[2:] == ["B19025"]
+
+
+def test_parse_table_str_uses_table_variables(censustable_calls, census_data):
+    census_data.prefetch_tables(["med_HI"])
+
+    assert census_data._parse_table_str("med_HI") == {
+        "B19013_001E": "Concept B19013!!Estimate!!Total",
+        "B19013_001M": "MOE!!Concept B19013!!Estimate!!Total",
+    }
+    assert censustable_calls == ["B19013"]
+
+
+def test_get_data_options(census_data):
+    census_data.key = "secret"
+    hierarchy = [("state", "08"), ("county", "001"), ("block group", "*")]
+
+    options = census_data._get_data_options(["B01000_001E"], hierarchy)
+
+    assert options == {
+        "/2018/acs/acs5": None,
+        "?get": "NAME,B01000_001E",
+        "&for": "block%20group:*",
+        "&in": "state:08%20county:001",
+        "&key": "secret",
+    }
+
+
+def test_parse_data_json(census_data):
+    data_json = [
+        ["NAME", "B01000_001E", "B01000_002E", "state", "county", "tract"],
+        ["Tract 1", "12", "3.5", "08", "001", "000100"],
+        ["Tract 2", None, "-666666666", "08", "003", "000200"],
+    ]
+
+    df = census_data._parse_data_json(
+        data_json, ["B01000_001E", "B01000_002E"]
+    )
+
+    assert df.index.name == "GEOID"
+    assert df.index.tolist() == ["08001000100", "08003000200"]
+    assert df["geo_names"].tolist() == ["Tract 1", "Tract 2"]
+    assert df["B01000_001E"].tolist()[0] == 12
+    assert np.isnan(df["B01000_001E"].tolist()[1])
+    assert df["B01000_002E"].tolist() == [3.5, -666666666]
+    assert df["tract"].dtype == "category"
+
+
+def test_native_get_data_requests_json_endpoint(request_urls, census_data):
+    df = census_data.get_data(
+        [TABLES], state="08", county="001", census_tract="*"
+    )
+
+    assert len(df) == 1 + 40
+    assert len(request_urls) == 1
+    assert "/data/2018/acs/acs5?get=NAME,B01000_001E" in request_urls[0]
+    assert "for=tract:*&in=state:08%20county:001" in request_urls[0]
@@ -0,0 +1,175 @@
+import os
+
+import pytest
+import pyarrow.parquet as pq
+import shapely
+
+from api_wrapper.census_api.census_boundaries import CensusBoundaries
+
+# interior of the first tract of county 001, see FixtureData.tiger_zip
+FIRST_TRACT_BBOX = (-109.96, 35.02, -109.94, 35.04)
+FIRST_TRACT_GEOID = "08001000000"
+
+
+@pytest.fixture(params=[True, False], ids=["cached", "uncached"])
+def boundaries(request, fixture_session, tmp_path):
+    return CensusBoundaries(
+        2018,
+        cache_dir=str(tmp_path / "meta"),
+        boundary_cache=request.param,
+        boundary_cache_dir=str(tmp_path / "boundaries"),
+    )
+
+
+def test_get_boundaries_gdf(boundaries):
+    gdf = boundaries.get_boundaries_gdf("Colorado", "tract")
+
+    assert len(gdf) == 5 * 40
+    assert gdf.crs.to_epsg() == 4269
+    assert set(gdf["STATEFP"]) == {"08"}
+
+
+def test_get_boundaries_gdf_columns(boundaries):
+    gdf = boundaries.get_boundaries_gdf(
+        "Colorado", "tract", columns=["GEOID"]
+    )
+
+    assert list(gdf.columns) == ["GEOID", "geometry"]
+
+
+@pytest.mark.parametrize(
+    "read_kwargs",
+    [
+        dict(bbox=FIRST_TRACT_BBOX),
+        dict(mask=shapely.box(*FIRST_TRACT_BBOX)),
+    ],
+    ids=["bbox", "mask"],
+)
+def test_get_boundaries_gdf_bbox_and_mask(boundaries, read_kwargs):
+    gdf = boundaries.get_boundaries_gdf("Colorado", "tract", **read_kwargs)
+
+    assert gdf["GEOID"].tolist() == [FIRST_TRACT_GEOID]
+
+
+def test_get_boundaries_gdf_rows(boundaries):
+    gdf = boundaries.get_boundaries_gdf("Colorado", "tract", rows=5)
+
+    assert len(gdf) == 5
+
+
+def test_get_boundaries_gdf_lod(boundaries):
+    gdf = boundaries.get_boundaries_gdf("Colorado", "tract", rows=5)
+    low_gdf = boundaries.get_boundaries_gdf(
+        "Colorado", "tract", rows=5, lod="low"
+    )
+
+    assert low_gdf["GEOID"].tolist() == gdf["GEOID"].tolist()
+    assert (
+        shapely.get_num_coordinates(low_gdf.geometry.values).sum()
+        < shapely.get_num_coordinates(gdf.geometry.values).sum()
+    )
+
+    with pytest.raises(ValueError, match="lod must be one of"):
+        boundaries.get_boundaries_gdf("Colorado", "tract", lod="ultra")
+
+
+def test_get_boundaries_gdf_several_states(boundaries):
+    for _ in range(2):
+        gdf = boundaries.get_boundaries_gdf(
+            ["Colorado", "Texas"], "tract", columns=["STATEFP"]
+        )
+
+        assert gdf["STATEFP"].value_counts().to_dict() == {
+            "08": 200,
+            "48": 200,
+        }
+
+
+def test_boundary_cache_is_reused(census_boundaries, tmp_path):
+    census_boundaries.get_boundaries_gdf("Colorado", "tract")
+    cache_files = os.listdir(tmp_path / "boundaries")
+
+    gdf = census_boundaries.get_boundaries_gdf(
+        "Colorado", "tract", bbox=FIRST_TRACT_BBOX
+    )
+
+    assert cache_files
+    assert os.listdir(tmp_path / "boundaries") == cache_files
+    assert gdf["GEOID"].tolist() == [FIRST_TRACT_GEOID]
+
+
+@pytest.mark.parametrize("ext", [".parquet", ".fgb"])
+def test_boundaries_to_file_and_read_boundaries(
+    census_boundaries, tmp_path, ext
+):
+    filepath = str(tmp_path / f"tracts{ext}")
+
+    assert (
+        census_boundaries.boundaries_to_file(filepath, "Colorado", "tract")
+        == filepath
+    )
+
+    assert len(census_boundaries.read_boundaries(filepath)) == 200
+    assert census_boundaries.read_boundaries(
+        filepath, columns=["GEOID"], bbox=FIRST_TRACT_BBOX
+    )["GEOID"].tolist() == [FIRST_TRACT_GEOID]
+    assert len(census_boundaries.read_boundaries(filepath, rows=3)) == 3
+
+
+def test_download_shp_deletes_zip(census_boundaries, tmp_path):
+    local_path = str(tmp_path / "shp")
+    os.makedirs(local_path)
+
+    shp_files = census_boundaries.download_shp("08", "tract", local_path)
+
+    assert shp_files == [os.path.join(local_path, "tl_2018_08_tract.shp")]
+    assert os.path.exists(shp_files[0])
+    assert not any(file.endswith(".zip") for file in os.listdir(local_path))
+
+
+def test_boundary_cache_is_sorted_spatially(fixture_session, tmp_path):
+    cached, uncached = (
+        CensusBoundaries(
+            2018,
+            cache_dir=str(tmp_path / "meta"),
+            boundary_cache=boundary_cache,
+            boundary_cache_dir=str(tmp_path / "boundaries"),
+        )
+        for boundary_cache in (True, False)
+    )
+
+    gdf = cached.get_boundaries_gdf("Colorado", "tract", rows=50)
+    cache_path = cached.boundary_cache.get((2018, "tract", "08"))
+    stored = pq.read_table(cache_path)
+
+    # rows are stored in Hilbert order with a bbox covering column, but read
+    # back in the order of the source layer
+    assert "bbox" in stored.column_names
+    assert stored["GEOID"].to_pylist()[:50] != gdf["GEOID"].tolist()
+    assert gdf.equals(
+        uncached.get_boundaries_gdf("Colorado", "tract", rows=50)
+    )
+
+
+def test_load_layers_bounds_downloads_on_disk(census_boundaries, monkeypatch):
+    n_on_disk = []
+    fetch_layer = census_boundaries._fetch_layer
+
+    def record_fetch_layer(state_fip, level, local_path, *args):
+        n_on_disk.append(len(os.listdir(os.path.dirname(local_path))))
+        return fetch_layer(state_fip, level, local_path, *args)
+
+    monkeypatch.setattr(census_boundaries, "_fetch_layer", record_fetch_layer)
+
+    gdfs = census_boundaries._load_layers(
+        ["08", "22", "36", "48"],
+        "tract",
+        {},
+        max_workers=1,
+        n_processes=1,
+    )
+
+    assert [len(gdf) for gdf in gdfs] == [200] * 4
+    # one layer fetching, one parsing: downloads are deleted once parsed
+    assert len(n_on_disk) == 4
+    assert max(n_on_disk) <= 1
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+from geopandas.testing import assert_geodataframe_equal
+
+TABLES = {"B01000_001E": "Total population"}
+
+
+@pytest.mark.parametrize(
+    "level, n_rows, geoid_length",
+    [("county", 5, 5), ("tract", 200, 11), ("bg", 600, 12)],
+)
+def test_get_geo_data_levels(census_geo_data, level, n_rows, geoid_length):
+    gdf = census_geo_data.get_geo_data([TABLES], "Colorado", level)
+
+    assert len(gdf) == n_rows
+    assert set(gdf.index.str.len()) == {geoid_length}
+
+
+@pytest.mark.parametrize("state", ["Colorado", ["Colorado", "Texas"]])
+def test_get_geo_data_keeps_categoricals(census_geo_data, state):
+    gdf = census_geo_data.get_geo_data([TABLES], state, "county")
+
+    assert gdf["geo_names"].dtype == "category"
+    assert gdf["state"].dtype == "category"
+    assert gdf["county"].dtype == "category"
+
+
+def test_get_geo_data_reads_cached_product(census_geo_data, request_urls):
+    gdf = census_geo_data.get_geo_data([TABLES], "Colorado", "tract")
+    n_requests = len(request_urls)
+
+    cached_gdf = census_geo_data.get_geo_data([TABLES], "Colorado", "tract")
+
+    assert len(request_urls) == n_requests
+    assert os.listdir(census_geo_data.geo_data_cache.cache_dir)
+    assert cached_gdf.attrs["table_labels"] == TABLES
+    assert_geodataframe_equal(cached_gdf, gdf)
+
+
+def test_get_geo_data_refresh(census_geo_data, request_urls):
+    census_geo_data.get_geo_data([TABLES], "Colorado", "county")
+    n_requests = len(request_urls)
+
+    census_geo_data.get_geo_data([TABLES], "Colorado", "county", refresh=True)
+
+    assert len(request_urls) > n_requests
+
+
+def test_get_geo_data_columns(census_geo_data):
+    gdf = census_geo_data.get_geo_data(
+        [TABLES], "08", "county", columns=["ALAND"]
+    )
+
+    assert gdf.attrs["table_labels"] == TABLES
+    assert gdf.index.name == "GEOID"
+    assert gdf.index.is_monotonic_increasing
+    assert {"ALAND", "B01000_001E", "geometry"} <= set(gdf.columns)
+    assert "AWATER" not in gdf.columns
+
+
+def test_get_geo_data_invalid_level(census_geo_data):
+    with pytest.raises(ValueError, match="level must be one of"):
+        census_geo_data.get_geo_data([TABLES], "Colorado", "block")
+
+
+def test_get_geo_data_unmatched_state(census_geo_data):
+    with pytest.raises(ValueError, match="Didn't match states"):
+        census_geo_data.get_geo_data([TABLES], ["Colorado", "Atlantis"], "bg")
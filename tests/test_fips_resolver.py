@@ -0,0 +1,66 @@
+import pytest
+
+
+@pytest.fixture
+def fips_resolver(census_data):
+    return census_data.fips_resolver
+
+
+@pytest.mark.parametrize(
+    "state, state_fip, state_match",
+    [
+        ("Colorado", "08", "exact"),
+        ("colorado", "08", "normalized"),
+        ("CO", "08", "normalized"),
+        ("08", "08", "exact"),
+        ("New York", "36", "exact"),
+    ],
+)
+def test_resolve_states(fips_resolver, state, state_fip, state_match):
+    resolved = fips_resolver.resolve([state]).iloc[0]
+
+    assert resolved["state_fip"] == state_fip
+    assert resolved["state_match"] == state_match
+
+
+def test_resolve_unmatched_state(fips_resolver):
+    resolved = fips_resolver.resolve(["Narnia"], ["County 001 County"])
+
+    assert resolved["state_match"].tolist() == ["unmatched"]
+    assert resolved["county_match"].tolist() == ["unmatched"]
+    assert resolved["GEOID"].isna().all()
+
+
+def test_resolve_counties(fips_resolver):
+    resolved = fips_resolver.resolve(
+        ["Colorado", "colorado", "Texas", "Colorado"],
+        ["County 001 County", "county 003", "County 005", "County 999"],
+    )
+
+    assert resolved["county_fip"].tolist()[:3] == ["001", "003", "005"]
+    assert resolved["county_match"].tolist() == [
+        "exact",
+        "normalized",
+        "normalized",
+        "unmatched",
+    ]
+    assert resolved["GEOID"].tolist()[:3] == ["08001", "08003", "48005"]
+
+
+def test_resolve_fuzzy_counties(fips_resolver):
+    states, counties = ["Colorado"], ["Conty 003"]
+
+    assert fips_resolver.resolve(states, counties)["county_match"][0] == (
+        "unmatched"
+    )
+
+    resolved = fips_resolver.resolve(states, counties, fuzzy=True).iloc[0]
+
+    assert resolved["county_fip"] == "003"
+    assert resolved["county_match"] == "fuzzy"
+
+
+def test_resolve_returns_categorical_columns(fips_resolver):
+    resolved = fips_resolver.resolve(["Colorado"] * 3, ["County 001"] * 3)
+
+    assert (resolved.dtypes == "category").all()
@@ -0,0 +1,128 @@
+import itertools
+
+import pytest
+
+from api_wrapper.cache import IsochroneCache
+from api_wrapper.geo_api import GeoAPI, MapboxAPI, iter_bounded
+from api_wrapper.instrumentation import MetricsRecorder, get_instrumentation
+
+
+@pytest.fixture
+def mapbox_api(fixture_session):
+    return MapboxAPI("token", rate_limit=None)
+
+
+def test_iso_batch_returns_results_in_origin_order(mapbox_api):
+    origins = [(-105.0 + n * 0.01, 39.7) for n in range(20)]
+
+    results = mapbox_api.iso_batch(origins, max_workers=4)
+
+    assert [result.origin for result in results] == origins
+    assert all(result.error is None for result in results)
+    for (lng, _), result in zip(origins, results):
+        ring = result.json["features"][0]["geometry"]["coordinates"][0]
+        assert sum(x for x, _ in ring[:4]) / 4 == pytest.approx(lng)
+
+
+def test_iso_batch_origin_options(mapbox_api):
+    results = mapbox_api.iso_batch(
+        [
+            (-105.0, 39.7),
+            {"lng": -104.9, "lat": 39.7, "contours_minutes": [5]},
+        ],
+        contours_minutes=("10", "20"),
+    )
+
+    assert [
+        [f["properties"]["contour"] for f in result.json["features"]]
+        for result in results
+    ] == [[10, 20], [5]]
+
+
+def test_iso_batch_isolates_failures(mapbox_api):
+    results = mapbox_api.iso_batch(
+        [(-105.0, 39.7), ("east", "north"), {"lng": -104.9}]
+    )
+
+    assert results[0].error is None
+    assert isinstance(results[1].error, ValueError)
+    assert isinstance(results[2].error, KeyError)
+    assert results[1].json is None
+
+
+@pytest.mark.parametrize("ext", [".geojsonl", ".parquet"])
+def test_iso_batch_to_file(mapbox_api, tmp_path, ext):
+    filepath = str(tmp_path / f"isochrones{ext}")
+    origins = [(-105.0, 39.7), ("east", "north"), (-104.9, 39.8)]
+
+    failures = mapbox_api.iso_batch_to_file(
+        origins, filepath, max_workers=2, contours_minutes=("10", "20")
+    )
+
+    gdf = GeoAPI.read_gdf(filepath).sort_values(["origin_id", "contour"])
+
+    assert [failure.origin for failure in failures] == [("east", "north")]
+    assert gdf["origin_id"].tolist() == [0, 0, 2, 2]
+    assert gdf["origin_lng"].tolist() == [-105.0, -105.0, -104.9, -104.9]
+    assert gdf["origin_lat"].tolist() == [39.7, 39.7, 39.8, 39.8]
+    assert set(gdf["travel_type"]) == {"driving"}
+    assert gdf["contour"].tolist() == [10, 20, 10, 20]
+
+
+def test_requests_to_file(mapbox_api, tmp_path):
+    filepath = str(tmp_path / "isochrones.geojsonl")
+    origins = [("-105", "39.7"), ("east", "north"), ("-104.9", "39.8")]
+    request_strs = [
+        mapbox_api.get_iso_request_str(lng, lat, contours_minutes=["10"])
+        for lng, lat in origins
+    ]
+
+    failures = mapbox_api.iso_api.requests_to_file(
+        [
+            (request_strs[0], {"name": "first"}),
+            request_strs[1],
+            (request_strs[2], {"name": "third"}),
+        ],
+        filepath,
+    )
+
+    gdf = GeoAPI.read_gdf(filepath).sort_values("name")
+
+    assert [request_str for request_str, _ in failures] == [request_strs[1]]
+    assert gdf["name"].tolist() == ["first", "third"]
+    assert gdf["contour"].tolist() == [10, 10]
+
+
+def test_iter_bounded_consumes_items_lazily():
+    consumed = []
+
+    def items():
+        for n in itertools.count():
+            consumed.append(n)
+            yield n
+
+    results = iter_bounded(lambda n: n * 2, items(), max_workers=2)
+
+    assert list(itertools.islice(results, 10)) == list(range(0, 20, 2))
+    assert len(consumed) <= 10 + 2 * 2
+
+
+def test_get_iso_reports_cache_events_to_own_instrumentation(
+    fixture_session, tmp_path
+):
+    recorder = MetricsRecorder()
+    mapbox_api = MapboxAPI(
+        "token",
+        iso_cache=IsochroneCache(str(tmp_path)),
+        rate_limit=None,
+        instrumentation=recorder,
+    )
+
+    first = mapbox_api.get_iso(-105.0, 39.7)
+    second = mapbox_api.get_iso(-105.0, 39.7)
+
+    snapshot = recorder.snapshot()
+    assert first == second
+    assert snapshot["caches"]["isochrone_cache"] == {"hits": 1, "misses": 1}
+    assert sum(m["count"] for m in snapshot["requests"].values()) == 1
+    assert not get_instrumentation().enabled
@@ -0,0 +1,105 @@
+import os
+
+import geopandas as gpd
+import pyarrow as pa
+import pytest
+
+from api_wrapper.geo_io import (
+    FeatureWriter,
+    GeoJSONSeqWriter,
+    GeoParquetWriter,
+)
+
+
+def point_feature(**properties):
+    return {
+        "type": "Feature",
+        "properties": properties,
+        "geometry": {"type": "Point", "coordinates": [-105.0, 39.7]},
+    }
+
+
+def test_geoparquet_writer_promotes_int_to_float(tmp_path):
+    filepath = str(tmp_path / "out.parquet")
+
+    with GeoParquetWriter(filepath, batch_size=1) as writer:
+        writer.write([point_feature(v=1)])
+        writer.write([point_feature(v=1.5)])
+
+    assert gpd.read_parquet(filepath)["v"].tolist() == [1.0, 1.5]
+
+
+def test_geoparquet_writer_types_all_null_first_batch(tmp_path):
+    filepath = str(tmp_path / "out.parquet")
+
+    with GeoParquetWriter(filepath, batch_size=1) as writer:
+        writer.write([point_feature(v=None)])
+        writer.write([point_feature(v="a", extra=2)])
+
+    gdf = gpd.read_parquet(filepath)
+
+    assert gdf["v"].isna().tolist() == [True, False]
+    assert gdf["v"].iloc[1] == "a"
+    assert gdf["extra"].iloc[1] == 2
+
+
+def test_geoparquet_writer_conflicting_types_raise_and_leave_no_file(tmp_path):
+    filepath = str(tmp_path / "out.parquet")
+
+    with pytest.raises(pa.ArrowTypeError):
+        with GeoParquetWriter(filepath, batch_size=1) as writer:
+            writer.write([point_feature(v=1)])
+            writer.write([point_feature(v="a")])
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_geoparquet_writer_keeps_properties_missing_from_first_row(tmp_path):
+    filepath = str(tmp_path / "out.parquet")
+
+    with GeoParquetWriter(filepath) as writer:
+        writer.write([point_feature(a=1), point_feature(a=2, b="x")])
+
+    assert gpd.read_parquet(filepath)["b"].tolist()[1] == "x"
+
+
+def test_geoparquet_writer_row_groups_and_bbox_read(tmp_path):
+    import pyarrow.parquet as pq
+
+    filepath = str(tmp_path / "out.parquet")
+
+    with GeoParquetWriter(filepath, batch_size=2) as writer:
+        for n in range(5):
+            writer.write([point_feature(n=n)], properties={"origin_id": n})
+
+    assert writer.n_features == 5
+    assert pq.ParquetFile(filepath).num_row_groups == 3
+
+    gdf = gpd.read_parquet(filepath, bbox=(-106, 39, -104, 40))
+    assert gdf["origin_id"].tolist() == [0, 1, 2, 3, 4]
+    assert gdf.crs.equals("OGC:CRS84")
+
+
+def test_geoparquet_writer_without_features(tmp_path):
+    filepath = str(tmp_path / "out.parquet")
+
+    with GeoParquetWriter(filepath):
+        pass
+
+    assert len(gpd.read_parquet(filepath)) == 0
+
+
+def test_geojsonseq_writer_adds_properties(tmp_path):
+    filepath = str(tmp_path / "out.geojsonl")
+
+    with GeoJSONSeqWriter(filepath) as writer:
+        writer.write([point_feature(contour=10)], properties={"origin_id": 3})
+
+    gdf = gpd.read_file(filepath)
+
+    assert gdf[["contour", "origin_id"]].values.tolist() == [[10, 3]]
+
+
+def test_feature_writer_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        FeatureWriter(str(tmp_path / "out.geojsonl"))
@@ -0,0 +1,136 @@
+import json
+import logging
+
+import pytest
+
+from api_wrapper.base_api import API
+from api_wrapper.cache import ResponseCache
+from api_wrapper.instrumentation import (
+    Instrumentation,
+    MetricsRecorder,
+    get_endpoint,
+    get_instrumentation,
+    set_instrumentation,
+)
+
+BASE_URL = "https://api.census.gov/data/2018/acs/acs5"
+ENDPOINT = "api.census.gov/data/2018/acs/acs5"
+REQUEST_STR = BASE_URL + "?get=NAME&for=state:08"
+
+
+@pytest.fixture
+def recorder():
+    """MetricsRecorder installed as the process wide instrumentation"""
+
+    recorder = set_instrumentation(MetricsRecorder())
+    yield recorder
+    set_instrumentation(None)
+
+
+def test_get_endpoint():
+    url = "https://api.mapbox.com/isochrone/v1/mapbox/driving?a=b"
+
+    assert get_endpoint(url) == "api.mapbox.com/isochrone/v1/mapbox/driving"
+    assert get_endpoint(BASE_URL + "/") == ENDPOINT
+
+
+def test_instrumentation_is_off_by_default():
+    instrumentation = get_instrumentation()
+
+    assert type(instrumentation) is Instrumentation
+    assert not instrumentation.enabled
+
+    with instrumentation.span("parse"):
+        pass
+
+
+def test_set_instrumentation(recorder):
+    assert get_instrumentation() is recorder
+
+    assert type(set_instrumentation(None)) is Instrumentation
+    assert not get_instrumentation().enabled
+
+
+def test_recorder_records_requests(fixture_session, recorder):
+    api = API(BASE_URL)
+
+    api.get_response(REQUEST_STR)
+    api.get_response(BASE_URL + "/missing")
+
+    metrics = recorder.snapshot()["requests"][ENDPOINT]
+
+    assert metrics["count"] == 2
+    assert metrics["statuses"] == {"200": 1, "404": 1}
+    assert metrics["bytes"] > 0
+    assert sum(metrics["histogram"].values()) == 2
+    assert metrics["mean_seconds"] == metrics["seconds"] / 2
+
+
+def test_api_instrumentation_overrides_the_process_wide_one(fixture_session):
+    recorder = MetricsRecorder()
+    api = API(BASE_URL, instrumentation=recorder)
+
+    api.get_response(REQUEST_STR)
+
+    assert recorder.snapshot()["requests"][ENDPOINT]["count"] == 1
+    assert not get_instrumentation().enabled
+
+
+def test_recorder_records_cache_hits(fixture_session, recorder, tmp_path):
+    api = API(BASE_URL, cache=ResponseCache(cache_dir=str(tmp_path)))
+
+    api.get_json(REQUEST_STR)
+    api.get_json(REQUEST_STR)
+    api.get_json(REQUEST_STR)
+
+    snapshot = recorder.snapshot()
+
+    assert snapshot["caches"][ENDPOINT] == {"hits": 2, "misses": 1}
+    assert snapshot["requests"][ENDPOINT]["count"] == 1
+
+
+def test_recorder_spans(recorder, caplog):
+    recorder.log_spans = True
+
+    with caplog.at_level(logging.DEBUG, logger="api_wrapper.instrumentation"):
+        with recorder.span("unzip", state="08"):
+            pass
+
+        with pytest.raises(RuntimeError):
+            with recorder.span("unzip"):
+                raise RuntimeError
+
+    spans = recorder.snapshot()["spans"]
+
+    assert spans["unzip"]["count"] == 2
+    assert spans["unzip"]["max_seconds"] <= spans["unzip"]["seconds"]
+    assert "unzip took" in caplog.records[0].getMessage()
+    assert "'state': '08'" in caplog.records[0].getMessage()
+
+
+def test_recorder_export_and_reset(recorder, tmp_path):
+    recorder.cache("boundaries", True)
+
+    filepath = tmp_path / "metrics.json"
+    recorder.to_json(str(filepath))
+
+    with open(filepath) as f:
+        assert json.load(f) == recorder.export(lambda metrics: metrics)
+
+    recorder.reset()
+
+    assert recorder.snapshot() == dict(requests={}, caches={}, spans={})
+
+
+def test_request_urls_are_logged_with_secrets_redacted(caplog):
+    api = API(BASE_URL)
+
+    with caplog.at_level(logging.DEBUG, logger="api_wrapper.base_api"):
+        request_str = api.get_request_str(
+            {"?get": "NAME", "&key": "census-key", "&access_token": "token"}
+        )
+
+    assert "key=census-key" in request_str
+    assert caplog.records[-1].getMessage() == (
+        BASE_URL + "?get=NAME&key=***&access_token=***"
+    )
@@ -0,0 +1,159 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+from api_wrapper.base_api import API
+from api_wrapper.rate_limit import RateLimiter, TokenBucket
+from benchmarks.fixture_server import (
+    FixtureData,
+    FixtureServer,
+    make_fixture_session,
+)
+
+ISO_URL = "https://api.mapbox.com/isochrone/v1/mapbox/driving/-105.0,39.7"
+
+
+def make_response(status_code, url=ISO_URL, **headers):
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = url
+    response.headers.update({k: str(v) for k, v in headers.items()})
+
+    return response
+
+
+def test_token_bucket_spaces_tokens():
+    bucket = TokenBucket(rate=50)
+
+    start = time.monotonic()
+    waits = [bucket.acquire() for _ in range(6)]
+
+    assert waits[0] == 0
+    assert time.monotonic() - start == pytest.approx(0.1, abs=0.05)
+
+
+def test_token_bucket_bursts_up_to_capacity():
+    bucket = TokenBucket(rate=1, capacity=3)
+
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket._reserve() == pytest.approx(1, abs=0.05)
+
+
+def test_token_bucket_pause_and_set_rate():
+    bucket = TokenBucket(rate=1000)
+
+    bucket.pause(0.2)
+    assert bucket._reserve() == pytest.approx(0.2, abs=0.05)
+
+    bucket = TokenBucket(rate=1000)
+    bucket.acquire()
+    bucket.set_rate(2)
+    assert bucket._reserve() == pytest.approx(0.5, abs=0.05)
+
+
+def test_token_bucket_acquire_async():
+    bucket = TokenBucket(rate=50)
+
+    async def acquire_all():
+        return await asyncio.gather(
+            *[bucket.acquire_async() for _ in range(3)]
+        )
+
+    waits = asyncio.run(acquire_all())
+
+    assert sorted(waits) == pytest.approx([0, 0.02, 0.04], abs=0.01)
+
+
+def test_rate_limiter_buckets_by_longest_prefix_then_host():
+    rate_limiter = RateLimiter(
+        rates={
+            "https://api.mapbox.com": 10,
+            "https://api.mapbox.com/isochrone": 5,
+        }
+    )
+
+    iso_bucket = rate_limiter.bucket(ISO_URL)
+    assert iso_bucket.rate == 5
+    assert rate_limiter.bucket(ISO_URL + "?polygons=true") is iso_bucket
+    assert rate_limiter.bucket("https://api.mapbox.com/geocoding").rate == 10
+    assert rate_limiter.bucket("https://api.census.gov/data") is None
+    assert rate_limiter.acquire("https://api.census.gov/data") == 0
+
+
+def test_rate_limiter_update_sets_rate_from_headers():
+    rate_limiter = RateLimiter(default_rate=100)
+
+    pause = rate_limiter.update(
+        make_response(
+            200, **{"X-Rate-Limit-Limit": 300, "X-Rate-Limit-Interval": 60}
+        )
+    )
+
+    assert pause == 0
+    assert rate_limiter.bucket(ISO_URL).rate == 5
+
+
+@pytest.mark.parametrize(
+    "status_code, headers, expected",
+    [
+        (429, {"Retry-After": 2}, 2),
+        (429, {"X-Rate-Limit-Reset": 3}, 3),
+        (429, {}, 1.5),
+        (503, {}, 0),
+        (503, {"Retry-After": 4}, 4),
+    ],
+)
+def test_rate_limiter_update_pauses(status_code, headers, expected):
+    rate_limiter = RateLimiter(default_rate=100, retry_after=1.5)
+
+    pause = rate_limiter.update(make_response(status_code, **headers))
+
+    assert pause == pytest.approx(expected, abs=0.01)
+    assert rate_limiter.bucket(ISO_URL)._reserve() == pytest.approx(
+        expected, abs=0.05
+    )
+
+
+def test_api_retries_429s_of_the_fixture_quota():
+    fixture_data = FixtureData(iso_quota=(5, 1))
+
+    with FixtureServer(fixture_data) as server:
+        rate_limiter = RateLimiter(default_rate=100)
+        api = API(
+            "https://api.mapbox.com",
+            session=make_fixture_session(server.url),
+            rate_limiter=rate_limiter,
+        )
+        request_str = (
+            f"{ISO_URL}?contours_minutes=10"
+            f"&access_token={FixtureData.RATE_LIMITED_TOKEN}"
+        )
+
+        statuses = [
+            api.get_response(request_str).status_code for _ in range(8)
+        ]
+
+    assert statuses == [200] * 8
+    assert rate_limiter.bucket(ISO_URL).rate == 5
+
+
+def test_api_returns_the_last_429_readable():
+    fixture_data = FixtureData(iso_quota=(0, 1))
+
+    with FixtureServer(fixture_data) as server:
+        api = API(
+            "https://api.mapbox.com",
+            session=make_fixture_session(server.url),
+            rate_limiter=RateLimiter(default_rate=100, retry_after=0),
+            max_rate_limit_retries=0,
+        )
+        request_str = (
+            f"{ISO_URL}?contours_minutes=10"
+            f"&access_token={FixtureData.RATE_LIMITED_TOKEN}"
+        )
+
+        with api.get_response(request_str, stream=True) as response:
+            assert response.status_code == 429
+            assert b"Too Many Requests" in response.raw.read()
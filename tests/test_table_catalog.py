@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+from api_wrapper.census_api.table_catalog import TableCatalog
+
+
+@pytest.fixture
+def catalog():
+    table_meta_data = pd.DataFrame(
+        [
+            ("SEX BY AGE", "Total:"),
+            ("SEX BY AGE", "Male:"),
+            ("MEDIAN HOUSEHOLD INCOME", "Median household income"),
+            ("MEDIAN AGE BY SEX", "Median age --!!Total:"),
+            ("ALLOCATION OF CITIZENSHIP", "Sex and age allocated"),
+        ],
+        index=[
+            "B01001_001",
+            "B01001_002",
+            "B19013_001",
+            "B01002_001",
+            "B99051_001",
+        ],
+        columns=["overall_category", "subtitle_0"],
+    )
+
+    return TableCatalog.from_table_meta_data(table_meta_data)
+
+
+def test_search_matches_every_word(catalog):
+    assert catalog.search("median income") == ["B19013"]
+    assert catalog.search("median") == ["B01002", "B19013"]
+    assert catalog.search("nothing like this") == []
+    assert catalog.search("") == []
+
+
+def test_search_ranks_title_matches_first(catalog):
+    assert catalog.search("sex age") == ["B01001", "B01002", "B99051"]
+    assert catalog.search("sex age", limit=1) == ["B01001"]
+
+
+def test_search_quoted_phrases(catalog):
+    assert catalog.search('"sex by age"') == ["B01001"]
+    assert catalog.search('"age by sex"') == ["B01002"]
+
+
+def test_search_table_ids(catalog):
+    assert catalog.search("b19013") == ["B19013"]
+
+
+def test_prefix(catalog):
+    assert catalog.prefix("B01") == ["B01001", "B01002"]
+    assert catalog.prefix("b19") == ["B19013"]
+    assert catalog.prefix("C") == []
+
+
+def test_browse(catalog):
+    assert catalog.browse()[0] == "ALLOCATION OF CITIZENSHIP"
+    assert catalog.browse("sex") == ["B01002", "B01001"]
+
+
+def test_save_and_load(catalog, tmp_path):
+    filepath = str(tmp_path / "catalog.pickle")
+
+    catalog.save(filepath)
+    loaded = TableCatalog.load(filepath)
+
+    assert loaded.titles == catalog.titles
+    assert loaded.search("sex age") == catalog.search("sex age")
+
+
+def test_census_api_table_catalog(census_data):
+    catalog = census_data.table_catalog
+
+    assert catalog.prefix("B01")[:2] == ["B01000", "B01001"]
+    assert catalog.search('"table b01000"') == ["B01000"]